@@ -0,0 +1,10 @@
+import os
+import tempfile
+
+# Benchmarks run against local stand-ins only, so the settings omnigram requires get harmless defaults
+os.environ.setdefault("TG_TOKEN", "123456:benchmark")
+os.environ.setdefault("TG_GROUP_MC", "-1001")
+os.environ.setdefault("TG_TOPIC_MC_CONSOLE", "2")
+os.environ.setdefault("TG_TOPIC_MC_MINECRAFT_CHAT", "3")
+os.environ.setdefault("ADM_SUDO", "0")
+os.environ.setdefault("DB_NAME", os.path.join(tempfile.mkdtemp(prefix="omnigram-bench-"), "omnigram"))
@@ -0,0 +1,79 @@
+import asyncio
+import itertools
+import time
+from collections import Counter
+from typing import TYPE_CHECKING, Any
+
+from aiogram import Bot
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.enums import ParseMode
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+
+class FakeBotApi:
+    """
+    In-process stand-in for the Telegram Bot API server, answering every method the bot uses
+    """
+
+    _server: "TestServer | None" = None
+
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency = latency
+        self.calls: "Counter[str]" = Counter()
+        # (monotonic_ns at arrival, text) of every sent or edited message
+        self.received: "list[tuple[int, str]]" = []
+        self._message_ids = itertools.count(1_000_000)
+        self._results: "dict[str, Callable[[dict[str, Any]], Any]]" = {
+            "getme": lambda _: {"id": 1, "is_bot": True, "first_name": "omnigram", "username": "omnigram_bot"},
+            "sendmessage": self._message,
+            "editmessagetext": self._message,
+            "senddocument": self._message,
+            "getchatadministrators": lambda _: [],
+        }
+
+    @property
+    def base_url(self) -> str:
+        if self._server is None:
+            raise RuntimeError("Fake Bot API is not started")
+        return str(self._server.make_url("")).rstrip("/")
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_route("POST", "/bot{token}/{method}", self._handle)
+        self._server = TestServer(app)
+        await self._server.start_server()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            await self._server.close()
+
+    def bot(self, token: str = "123456:benchmark") -> "Bot":
+        session = AiohttpSession(api=TelegramAPIServer.from_base(self.base_url))
+        return Bot(token=token, session=session, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+
+    async def _handle(self, request: "web.Request") -> "web.Response":
+        method = request.match_info["method"].lower()
+        self.calls[method] += 1
+        data = dict(await request.post())
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        result = self._results.get(method, lambda _: True)(data)
+        return web.json_response({"ok": True, "result": result})
+
+    def _message(self, data: "dict[str, Any]") -> "dict[str, Any]":
+        self.received.append((time.monotonic_ns(), str(data.get("text", ""))))
+        message = {
+            "message_id": int(data.get("message_id") or next(self._message_ids)),
+            "date": int(time.time()),
+            "chat": {"id": int(data["chat_id"]), "type": "supergroup"},
+            "text": data.get("text", ""),
+        }
+        if "message_thread_id" in data:
+            message["message_thread_id"] = int(data["message_thread_id"])
+        return message
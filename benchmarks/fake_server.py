@@ -0,0 +1,125 @@
+"""
+Scripted stand-in for a Minecraft server process, printing realistic log traffic at a configurable rate.
+
+    python -m benchmarks.fake_server --lines 100000 --rate 5000 --chat 0.3 --join 0.05
+
+Chat lines carry a "bench-<monotonic_ns>" marker so the relay latency can be measured on the receiving side.
+The process answers "list" on stdin like a real server and exits on "stop" or after the last line.
+"""
+
+import argparse
+import random
+import sys
+import threading
+import time
+
+NOISE = (
+    "[Server thread/INFO]: Saving chunks for level 'ServerLevel[world]'/minecraft:overworld",
+    "[Worker-Main-3/INFO]: Preparing spawn area: 87%",
+    "[Server thread/INFO]: Villager axw['Villager'/1843, l='ServerLevel[world]', x=12.5, y=64.0, z=-3.5] died",
+    "[Server thread/WARN]: Mismatch in destroy block pos: BlockPos{x=102, y=63, z=-40}",
+    "[Netty Epoll Server IO #2/INFO]: [STDOUT]: Loaded 124 recipes",
+    "[Server thread/INFO]: Named entity Wolf['Rex'/512, l='ServerLevel[world]', x=5.0, y=70.0, z=8.0] died",
+)
+
+
+def stamp() -> str:
+    return time.strftime("[%H:%M:%S]")
+
+
+class FakeServer:
+    def __init__(self, players: int, max_players: int) -> None:
+        self.players = [f"Player{number}" for number in range(players)]
+        self.online: "set[str]" = set(self.players[: players // 2])
+        self.max_players = max_players
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+
+    def emit(self, line: str) -> None:
+        with self.lock:
+            sys.stdout.write(f"{stamp()} {line}\n")
+
+    def chat(self) -> str:
+        player = random.choice(self.players)
+        return f"[Server thread/INFO]: [Not Secure] <{player}> bench-{time.monotonic_ns()} hello <&> world"
+
+    def join(self) -> str:
+        player = random.choice(self.players)
+        self.online.add(player)
+        return (
+            f"[Server thread/INFO]: {player}[/127.0.0.1:{random.randint(40000, 60000)}] logged in with entity id "
+            f"{random.randint(1, 10_000)} at (1.5, 64.0, -2.5)"
+        )
+
+    def leave(self) -> str:
+        player = random.choice(self.players)
+        self.online.discard(player)
+        return f"[Server thread/INFO]: {player} left the game"
+
+    def list_reply(self) -> str:
+        return (
+            f"[Server thread/INFO]: There are {len(self.online)} of a max of {self.max_players} players online: "
+            f"{', '.join(sorted(self.online))}"
+        )
+
+    def serve_stdin(self) -> None:
+        for line in sys.stdin:
+            command = line.strip()
+            if command == "list":
+                self.emit(self.list_reply())
+            elif command == "stop":
+                self.emit("[Server thread/INFO]: Stopping server")
+                self.stopped.set()
+                return
+            elif command.startswith("tellraw"):
+                continue
+        self.stopped.set()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=10_000, help="lines to print before exiting")
+    parser.add_argument("--rate", type=float, default=0, help="lines per second, 0 for as fast as possible")
+    parser.add_argument("--chat", type=float, default=0.2, help="share of chat lines")
+    parser.add_argument("--join", type=float, default=0.02, help="share of join lines")
+    parser.add_argument("--leave", type=float, default=0.02, help="share of leave lines")
+    parser.add_argument("--list", type=float, default=0.01, help="share of unsolicited list replies")
+    parser.add_argument("--players", type=int, default=40)
+    parser.add_argument("--max-players", type=int, default=100)
+    parser.add_argument("--startup", type=float, default=0.0, help="seconds before the Done line")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    server = FakeServer(players=args.players, max_players=args.max_players)
+    threading.Thread(target=server.serve_stdin, daemon=True).start()
+
+    server.emit("[Server thread/INFO]: Starting minecraft server version 1.21.4")
+    time.sleep(args.startup)
+    server.emit(f'[Server thread/INFO]: Done ({args.startup:.3f}s)! For help, type "help"')
+    sys.stdout.flush()
+
+    kinds = (server.chat, server.join, server.leave, server.list_reply, lambda: random.choice(NOISE))
+    weights = (
+        args.chat,
+        args.join,
+        args.leave,
+        args.list,
+        max(0.0, 1 - args.chat - args.join - args.leave - args.list),
+    )
+    started = time.monotonic()
+    batch = max(1, int(args.rate / 100)) if args.rate else 1000
+    for sent in range(0, args.lines, batch):
+        if server.stopped.is_set():
+            break
+        for kind in random.choices(kinds, weights=weights, k=min(batch, args.lines - sent)):
+            server.emit(kind())
+        sys.stdout.flush()
+        if args.rate:
+            delay = started + (sent + batch) / args.rate - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+"""
+Load-tests the hot paths against a scripted Minecraft server and an in-process Bot API, comparing with a baseline.
+
+    python -m benchmarks.suite
+    python -m benchmarks.suite --lines 200000 --check
+    python -m benchmarks.suite --save-baseline
+
+Scenarios:
+    read_stream  - log lines per second through MinecraftServer._read_stream, from parsing to dispatch
+    sessions     - the same for a log of joins and leaves only, and the lines per second until the last player
+                   session is in the database
+    relay        - latency from a chat line being printed to the relayed text reaching the Bot API
+    inbound      - Telegram messages per second through the chat relay into tellraw commands
+    save_delete  - rows per second through TelegramHandler._save_messages and the message writer,
+                   then messages per second through TelegramHandler.delete_messages
+    webhook      - updates per second through the webhook application, see benchmarks.webhook
+    import_time  - cold import of omnigram.server from python -X importtime, in a bare environment without a
+                   .env, so an import reading the config or opening the database fails the scenario
+
+Metrics ending in "_per_second" regress when they drop, ones ending in "_ms" or "_mb" when they grow.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import re
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from aiogram.types import Message
+
+from omnigram.config import config
+from omnigram.database import MessageWriter, create_schema
+from omnigram.minecraft import MinecraftRegistry, MinecraftServer
+from omnigram.minecraft.chat_relay import ChatRelay
+from omnigram.minecraft.log_archive import LogArchive
+from omnigram.minecraft.transport import Transport
+from omnigram.telegram import TelegramHandler
+from omnigram.timers import TimerService
+
+from . import webhook
+from .fake_bot_api import FakeBotApi
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+
+BASELINE = Path(__file__).parent / "data" / "baseline.json"
+ROOT = Path(__file__).parent.parent
+MARKER = re.compile(r"bench-(\d+)")
+
+
+class Harness:
+    """
+    Fake Bot API plus a telegram handler and a minecraft server wired to it the way serve() wires them
+    """
+
+    def __init__(self, api_latency: float = 0.0) -> None:
+        self.api = FakeBotApi(latency=api_latency)
+
+    async def __aenter__(self) -> "Harness":
+        await self.api.start()
+        await asyncio.to_thread(create_schema)
+        self.message_writer = MessageWriter()
+        await self.message_writer.start()
+        self.timers = TimerService()
+        self.telegram_handler = TelegramHandler(
+            minecraft_registry=MinecraftRegistry.from_config(timers=self.timers),
+            message_writer=self.message_writer,
+            timers=self.timers,
+            bot=self.api.bot(),
+        )
+        self.minecraft_server = next(iter(self.telegram_handler.minecraft_registry))
+        self.archive_directory = tempfile.TemporaryDirectory()
+        self.minecraft_server.log_archive = LogArchive(
+            server=self.minecraft_server.name, root=Path(self.archive_directory.name)
+        )
+        self.minecraft_server.log_archive.start()
+        return self
+
+    async def __aexit__(self, *_: object) -> None:
+        await self.minecraft_server.players.stop()
+        await asyncio.to_thread(self.minecraft_server.log_archive.stop)
+        self.archive_directory.cleanup()
+        await self.telegram_handler.outbox.stop(timeout=5)
+        await self.timers.stop()
+        await self.message_writer.stop()
+        await self.telegram_handler.bot.session.close()
+        await self.api.close()
+
+    async def feed(self, *arguments: str) -> float:
+        """
+        Piping a fake server run through MinecraftServer._read_stream, returning the seconds it took.
+        """
+        process = await asyncio.create_subprocess_exec(
+            sys.executable,
+            "-m",
+            "benchmarks.fake_server",
+            *arguments,
+            cwd=ROOT,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+        )
+        assert process.stdout is not None
+        started = time.perf_counter()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            await self.minecraft_server._read_stream(process.stdout)
+        elapsed = time.perf_counter() - started
+        await process.wait()
+        return elapsed
+
+
+class RecordingTransport(Transport):
+    """
+    Transport of a server that is always up, keeping the commands
+    """
+
+    def __init__(self) -> None:
+        self.commands: "list[str]" = []
+
+    @property
+    def connected(self) -> bool:
+        return True
+
+    async def send(self, command: str) -> bool:
+        self.commands.append(command)
+        return True
+
+
+def percentile(values: "list[float]", share: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def read_stream(lines: int) -> "dict[str, float]":
+    async with Harness() as harness:
+        elapsed = await harness.feed("--lines", str(lines), "--chat", "0.2", "--join", "0.05", "--leave", "0.05")
+    return {"lines": lines, "lines_per_second": lines / elapsed}
+
+
+async def sessions(lines: int) -> "dict[str, float]":
+    async with Harness() as harness:
+        elapsed = await harness.feed(
+            "--lines", str(lines), "--chat", "0", "--join", "0.45", "--leave", "0.45", "--list", "0"
+        )
+        started = time.perf_counter()
+        await harness.minecraft_server.players.flush()
+        flushed = time.perf_counter() - started
+    return {"lines": lines, "lines_per_second": lines / elapsed, "written_per_second": lines / (elapsed + flushed)}
+
+
+async def relay(rate: float, seconds: float) -> "dict[str, float]":
+    lines = int(rate * seconds)
+    async with Harness() as harness:
+        await harness.feed("--lines", str(lines), "--rate", str(rate), "--chat", "0.5", "--join", "0", "--leave", "0")
+        await harness.telegram_handler.outbox.stop()
+        latencies = [
+            (received - int(sent)) / 1e6 for received, text in harness.api.received for sent in MARKER.findall(text)
+        ]
+    return {
+        "relayed": len(latencies),
+        "api_messages": len(harness.api.received),
+        "latency_p50_ms": percentile(latencies, 0.50),
+        "latency_p95_ms": percentile(latencies, 0.95),
+        "latency_p99_ms": percentile(latencies, 0.99),
+        "latency_mean_ms": statistics.fmean(latencies) if latencies else 0.0,
+    }
+
+
+async def inbound(count: int) -> "dict[str, float]":
+    transport = RecordingTransport()
+    timers = TimerService()
+    server = MinecraftServer(timers=timers, transport=transport)
+    server.chat_relay = ChatRelay(server=server, queue_size=count, coalesce_window=0)
+    started = time.perf_counter()
+    for number in range(count):
+        server.send_message_to_minecraft(
+            user=f"user {number % 20}", text=f'message "{number}" with\na line break', reply_to="Steve"
+        )
+    while server.chat_relay.pending:
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - started
+    await server.chat_relay.stop()
+    await timers.stop()
+    return {
+        "messages": count,
+        "messages_per_second": count / elapsed,
+        "commands": len(transport.commands),
+    }
+
+
+def build_messages(count: int) -> "list[Message]":
+    now = int(datetime.now(UTC).timestamp())
+    return [
+        Message.model_validate(
+            {
+                "message_id": number,
+                "date": now,
+                "chat": {"id": config.telegram.group_mc, "type": "supergroup"},
+                "from": {"id": 42, "is_bot": False, "first_name": "Steve"},
+                "message_thread_id": config.telegram.topic_mc_console,
+                "text": f"console line {number}",
+            }
+        )
+        for number in range(1, count + 1)
+    ]
+
+
+async def save_and_delete(count: int) -> "dict[str, float]":
+    messages = build_messages(count)
+    async with Harness() as harness:
+        started = time.perf_counter()
+        for offset in range(0, count, 50):
+            harness.telegram_handler._save_messages(*messages[offset : offset + 50])
+        await harness.message_writer.flush()
+        saved = time.perf_counter()
+        await harness.telegram_handler.delete_messages()
+        deleted = time.perf_counter()
+        delete_calls = harness.api.calls["deletemessages"] + harness.api.calls["deletemessage"]
+    return {
+        "rows": count,
+        "save_rows_per_second": count / (saved - started),
+        "delete_messages_per_second": count / (deleted - saved),
+        "delete_api_calls": delete_calls,
+    }
+
+
+def import_time(runs: int) -> "dict[str, float]":
+    """
+    Best of a few cold imports, the total and the share of the omnigram modules themselves.
+    """
+    totals, own = [], []
+    modules = 0
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as directory:
+            completed = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", "import omnigram.server"],
+                cwd=directory,
+                env={"PATH": os.environ.get("PATH", ""), "PYTHONPATH": str(ROOT)},
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+        # import time: self [us] | cumulative | imported package
+        rows = [
+            line.removeprefix("import time:").split("|")
+            for line in completed.stderr.splitlines()
+            if line.startswith("import time:") and "[us]" not in line
+        ]
+        totals.append(sum(int(row[1]) for row in rows if not row[2].startswith("  ")) / 1000)
+        own.append(sum(int(row[0]) for row in rows if row[2].strip().startswith("omnigram")) / 1000)
+        modules = len(rows)
+    return {"modules": modules, "import_total_ms": min(totals), "import_omnigram_ms": min(own)}
+
+
+async def run(args: "argparse.Namespace") -> "dict[str, dict[str, float]]":
+    scenarios: "dict[str, Callable[[], Awaitable[dict[str, float]]]]" = {
+        "read_stream": lambda: read_stream(lines=args.lines),
+        "sessions": lambda: sessions(lines=args.session_lines),
+        "relay": lambda: relay(rate=args.relay_rate, seconds=args.relay_seconds),
+        "inbound": lambda: inbound(count=args.inbound),
+        "save_delete": lambda: save_and_delete(count=args.rows),
+        "webhook": lambda: webhook.run(updates_count=args.updates, concurrency=50),
+        "import_time": lambda: asyncio.to_thread(import_time, runs=args.import_runs),
+    }
+    results = {}
+    for name, scenario in scenarios.items():
+        if args.only and name not in args.only:
+            continue
+        result = await scenario()
+        result["peak_rss_mb"] = peak_rss_mb()
+        results[name] = result
+    return results
+
+
+def compare(
+    results: "dict[str, dict[str, float]]", baseline: "dict[str, dict[str, float]]", tolerance: float
+) -> "list[str]":
+    """
+    Printing every metric next to its baseline, returning the regressed ones.
+    """
+    regressions = []
+    for scenario, metrics in results.items():
+        print(f"{scenario}:")
+        for name, value in metrics.items():
+            expected = baseline.get(scenario, {}).get(name)
+            if expected is None or not expected:
+                print(f"  {name:<28} {value:>14.2f}")
+                continue
+            change = (value - expected) / expected
+            if name.endswith("_per_second"):
+                regressed = change < -tolerance
+            elif name.endswith(("_ms", "_mb")):
+                regressed = change > tolerance
+            else:
+                regressed = False
+            mark = "  REGRESSION" if regressed else ""
+            print(f"  {name:<28} {value:>14.2f}   baseline {expected:>14.2f}   {change:+7.1%}{mark}")
+            if regressed:
+                regressions.append(f"{scenario}.{name}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=50_000, help="log lines for read_stream")
+    parser.add_argument("--session-lines", type=int, default=20_000, help="log lines for sessions")
+    parser.add_argument("--relay-rate", type=float, default=40, help="log lines per second for relay")
+    parser.add_argument("--relay-seconds", type=float, default=5)
+    parser.add_argument("--inbound", type=int, default=20_000, help="Telegram messages for inbound")
+    parser.add_argument("--rows", type=int, default=5_000, help="messages for save_delete")
+    parser.add_argument("--updates", type=int, default=2_000, help="updates for webhook")
+    parser.add_argument("--import-runs", type=int, default=5, help="cold imports for import_time, the best counts")
+    parser.add_argument("--only", nargs="*", help="scenarios to run")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative change")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--check", action="store_true", help="exit with 1 on a regression")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    baseline: "dict[str, Any]" = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    regressions = compare(results, baseline, args.tolerance)
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps({**baseline, **results}, indent=2) + "\n")
+        print(f"Baseline saved to {args.baseline}")
+    elif regressions:
+        print("Regressed:", ", ".join(regressions))
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
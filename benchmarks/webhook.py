@@ -0,0 +1,100 @@
+"""
+Replays recorded Update payloads into the webhook application to measure throughput without the network.
+
+    python -m benchmarks.webhook --updates 5000 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import time
+from pathlib import Path
+from typing import Any
+
+from aiogram import Dispatcher
+from aiohttp.test_utils import TestClient, TestServer
+
+from omnigram.config import config
+from omnigram.database import MessageWriter, create_schema
+from omnigram.minecraft import MinecraftRegistry
+from omnigram.server.webhook import build_webhook_app, webhook_secret
+from omnigram.telegram import TelegramHandler
+from omnigram.timers import TimerService
+
+from .fake_bot_api import FakeBotApi
+
+UPDATES = Path(__file__).parent / "data" / "updates.json"
+
+
+def load_updates(count: int) -> "list[dict[str, Any]]":
+    recorded = json.loads(UPDATES.read_text())
+    updates = []
+    for number, update in zip(range(1, count + 1), itertools.cycle(recorded), strict=False):
+        update = json.loads(json.dumps(update))
+        update["update_id"] = number
+        update["message"]["message_id"] = number
+        updates.append(update)
+    return updates
+
+
+async def run(updates_count: int, concurrency: int) -> "dict[str, float]":
+    api = FakeBotApi()
+    await api.start()
+    bot = api.bot()
+    await asyncio.to_thread(create_schema)
+    message_writer = MessageWriter()
+    await message_writer.start()
+    timers = TimerService()
+    telegram_handler = TelegramHandler(
+        minecraft_registry=MinecraftRegistry.from_config(timers=timers),
+        message_writer=message_writer,
+        timers=timers,
+        bot=bot,
+    )
+    dispatcher = Dispatcher()
+    telegram_handler.register(dispatcher=dispatcher)
+    app, request_handler = build_webhook_app(dispatcher=dispatcher, bot=bot, secret_token=webhook_secret())
+    client = TestClient(TestServer(app))
+    await client.start_server()
+
+    headers = {"X-Telegram-Bot-Api-Secret-Token": webhook_secret()}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def post(update: "dict[str, Any]") -> None:
+        async with semaphore:
+            response = await client.post(config.telegram.webhook_path, json=update, headers=headers)
+            response.raise_for_status()
+
+    updates = load_updates(updates_count)
+    started = time.perf_counter()
+    await asyncio.gather(*(post(update) for update in updates))
+    accepted = time.perf_counter()
+    while request_handler.pending:
+        await asyncio.sleep(0.001)
+    processed = time.perf_counter()
+
+    await telegram_handler.outbox.stop()
+    await timers.stop()
+    await message_writer.stop()
+    await client.close()
+    await api.close()
+    return {
+        "updates": updates_count,
+        "accepted_per_second": updates_count / (accepted - started),
+        "processed_per_second": updates_count / (processed - started),
+        "api_calls": sum(api.calls.values()),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    result = asyncio.run(run(updates_count=args.updates, concurrency=args.concurrency))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,3 @@
-from .config import Config
+from .config import Config, config, get_config
 
-config = Config()
-
-__all__ = ["config"]
+__all__ = ["Config", "config", "get_config"]
@@ -1,9 +1,11 @@
 from typing import ClassVar
 
-from pydantic_settings import BaseSettings, SettingsConfigDict
+from pydantic_settings import SettingsConfigDict
 
+from .base import EnvSettings
 
-class AdminSettings(BaseSettings):
+
+class AdminSettings(EnvSettings):
     sudo: int
 
     model_config: ClassVar[SettingsConfigDict] = SettingsConfigDict(
@@ -0,0 +1,43 @@
+import os
+from collections.abc import Mapping
+from functools import lru_cache
+
+from dotenv import dotenv_values
+from pydantic_settings import BaseSettings, DotEnvSettingsSource, PydanticBaseSettingsSource
+
+
+@lru_cache
+def _read_env_file(path: str) -> "Mapping[str, str | None]":
+    if not os.path.isfile(path):
+        return {}
+    return {key.lower(): value for key, value in dotenv_values(path).items()}
+
+
+class _SharedDotEnvSource(DotEnvSettingsSource):
+    """
+    .env source reading each file once per process instead of once per settings section
+    """
+
+    def _load_env_vars(self) -> "Mapping[str, str | None]":
+        files = [self.env_file] if isinstance(self.env_file, (str, os.PathLike)) else self.env_file or []
+        values: "dict[str, str | None]" = {}
+        for file in files:
+            values.update(_read_env_file(os.fspath(file)))
+        return values
+
+
+class EnvSettings(BaseSettings):
+    """
+    Base of the config sections
+    """
+
+    @classmethod
+    def settings_customise_sources(
+        cls,
+        settings_cls: "type[BaseSettings]",
+        init_settings: "PydanticBaseSettingsSource",
+        env_settings: "PydanticBaseSettingsSource",
+        dotenv_settings: "PydanticBaseSettingsSource",
+        file_secret_settings: "PydanticBaseSettingsSource",
+    ) -> "tuple[PydanticBaseSettingsSource, ...]":
+        return init_settings, env_settings, _SharedDotEnvSource(settings_cls), file_secret_settings
@@ -1,13 +1,43 @@
-from pydantic_settings import BaseSettings
+from functools import lru_cache
+from typing import cast
+
+from pydantic import BaseModel, Field
 
 from .admin import AdminSettings
 from .database import DatabaseSettings
+from .metrics import MetricsSettings
 from .minecraft import MinecraftSettings
 from .telegram import TelegramSettings
 
 
-class Config(BaseSettings):
-    telegram: TelegramSettings = TelegramSettings()  # type: ignore
-    minecraft: MinecraftSettings = MinecraftSettings()  # type: ignore
-    admin: AdminSettings = AdminSettings()  # type: ignore
-    database: DatabaseSettings = DatabaseSettings()  # type: ignore
+class Config(BaseModel):
+    telegram: TelegramSettings = Field(default_factory=TelegramSettings)  # type: ignore
+    minecraft: MinecraftSettings = Field(default_factory=MinecraftSettings)  # type: ignore
+    admin: AdminSettings = Field(default_factory=AdminSettings)  # type: ignore
+    database: DatabaseSettings = Field(default_factory=DatabaseSettings)  # type: ignore
+    metrics: MetricsSettings = Field(default_factory=MetricsSettings)  # type: ignore
+
+
+@lru_cache
+def get_config() -> "Config":
+    """
+    Parsing the environment and .env once, on first use.
+
+    :return: the config
+    """
+    return Config()
+
+
+class _LazyConfig:
+    """
+    Stand-in for the config until something reads it, so importing a module has no side effects
+    """
+
+    def __getattr__(self, name: str) -> object:
+        return getattr(get_config(), name)
+
+    def __repr__(self) -> str:
+        return repr(get_config())
+
+
+config = cast(Config, _LazyConfig())
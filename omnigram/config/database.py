@@ -1,10 +1,27 @@
-from typing import ClassVar
+from typing import ClassVar, Literal
 
-from pydantic_settings import BaseSettings, SettingsConfigDict
+from pydantic_settings import SettingsConfigDict
 
+from .base import EnvSettings
 
-class DatabaseSettings(BaseSettings):
+
+class DatabaseSettings(EnvSettings):
     name: str = ""
+    batch_size: int = 100
+    flush_interval: float = 0.5
+    # Attempts of a failed batch write, e.g. on "database is locked", the delay doubling after each
+    write_attempts: int = 5
+    write_retry_delay: float = 0.5
+    search_page_size: int = 5
+    journal_mode: str = "WAL"
+    synchronous: str = "NORMAL"
+    cache_size_kib: int = 16384
+    busy_timeout_ms: int = 5000
+    retention_days: int = 0
+    retention_mode: Literal["delete", "archive"] = "delete"
+    retention_batch_size: int = 1000
+    maintenance_interval: float = 3600
+    vacuum_pages: int = 2000
 
     model_config: ClassVar[SettingsConfigDict] = SettingsConfigDict(
         env_prefix="DB_",
@@ -0,0 +1,18 @@
+from typing import ClassVar
+
+from pydantic_settings import SettingsConfigDict
+
+from .base import EnvSettings
+
+
+class MetricsSettings(EnvSettings):
+    enabled: bool = False
+    host: str = "127.0.0.1"
+    port: int = 9100
+    loop_lag_interval: float = 0.5
+
+    model_config: ClassVar[SettingsConfigDict] = SettingsConfigDict(
+        env_prefix="METRICS_",
+        env_file=".env",
+        extra="ignore",
+    )
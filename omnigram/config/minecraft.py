@@ -1,14 +1,143 @@
-from typing import ClassVar
+from typing import ClassVar, Literal
 
-from pydantic_settings import BaseSettings, SettingsConfigDict
+from pydantic import BaseModel
+from pydantic_settings import SettingsConfigDict
 
+from .base import EnvSettings
 
-class MinecraftSettings(BaseSettings):
+
+class ServerSettings(BaseModel):
     path: str = ""
     target: str = ""
+    transport: Literal["stdin", "rcon"] = "stdin"
+    rcon_host: str = "127.0.0.1"
+    rcon_port: int = 25575
+    rcon_password: str = ""
+    topic_console: int | None = None
+    topic_chat: int | None = None
+    # World directories relative to path, e.g. ["world", "world_nether", "world_the_end"] for Paper
+    worlds: list[str] = ["world"]
+    # Snapshot directory, "<path>/backups" when empty
+    backup_path: str = ""
+    # Port players connect to, watched for connection attempts while the server hibernates
+    game_port: int = 25565
+    # cgroup v2 directory of the server processes, writable by the bot, frozen with cgroup.freeze when set
+    hibernate_cgroup: str = ""
+
+
+class MinecraftSettings(EnvSettings):
+    path: str = ""
+    target: str = ""
+    launch_timeout: float = 300
+    command_timeout: float = 5
+    transport: Literal["stdin", "rcon"] = "stdin"
+    rcon_host: str = "127.0.0.1"
+    rcon_port: int = 25575
+    rcon_password: str = ""
+    rcon_reconnect_delay: float = 30
+    worlds: list[str] = ["world"]
+    backup_path: str = ""
+    backup_on_suspend: bool = True
+    backup_workers: int = 4
+    # Read rate limit of a backup in MB/s, 0 disables it
+    backup_rate_mb: float = 50
+    backup_keep_last: int = 5
+    # Besides the last snapshots, the newest snapshot of each of the last days is kept
+    backup_keep_daily: int = 7
+    backup_save_timeout: float = 60
+    idle_suspend_delay: float = 300
+    # What the idle timer does to an empty server: stop it, or freeze it for a near-instant resume
+    idle_strategy: Literal["stop", "hibernate"] = "stop"
+    game_port: int = 25565
+    hibernate_cgroup: str = ""
+    # Seconds between checks for connection attempts to a hibernated server
+    hibernate_poll_interval: float = 1.0
+    # Learning when players come from the join history: launching ahead of them and stretching the idle delay
+    activity_forecast: bool = True
+    activity_weeks: int = 8
+    # History needed before the forecast is trusted
+    activity_min_weeks: float = 2
+    # Chance of players in the coming hour for a launch ahead of them, and how early it starts
+    prewarm_threshold: float = 0.5
+    prewarm_lead: float = 600
+    # The idle delay is scaled between these factors by the chance of players within the horizon
+    idle_delay_min_factor: float = 0.5
+    idle_delay_max_factor: float = 3.0
+    idle_return_horizon: float = 3600
+    log_queue_size: int = 1000
+    log_low_watermark: float = 0.5
+    log_sample_every: int = 10
+    log_line_limit: int = 65536
+    log_reader_restarts: int = 5
+    # Deadlines of the stop stages: the stop command, then SIGTERM, then SIGKILL
+    stop_timeout: float = 60
+    term_timeout: float = 15
+    kill_timeout: float = 5
+    restart_on_crash: bool = True
+    restart_delay: float = 5
+    restart_max_delay: float = 300
+    restart_attempts: int = 5
+    # Uptime after which a crash counts as the first one again
+    restart_stable_after: float = 600
+    health_interval: float = 30
+    health_history: int = 240
+    # Paper-style tps and mspt commands, stopped for the run after the first unanswered query
+    health_tick_queries: bool = True
+    # Consecutive samples past a threshold before an alert, and within it before the recovery notice
+    health_alert_samples: int = 2
+    health_tps_alert: float = 15.0
+    health_mspt_alert: float = 50.0
+    health_lag_alert_ms: int = 2000
+    # CPU percent of one core and resident memory of the server process tree, 0 disables the alert
+    health_cpu_alert: float = 0
+    health_memory_alert_mb: int = 0
+    log_archive: bool = True
+    # Archive directory, "<log_archive_path>/<server>" when set and "<path>/log-archive" otherwise
+    log_archive_path: str = ""
+    log_archive_block_kb: int = 64
+    # Lines become searchable at most this long after they were read
+    log_archive_flush_interval: float = 5
+    log_archive_segment_mb: int = 64
+    # Total size of the archive of a server, the oldest segments are removed past it
+    log_archive_max_mb: int = 1024
+    log_archive_queue_size: int = 10000
+    # Most lines a /logs query returns
+    log_archive_query_limit: int = 100000
+    # Telegram messages waiting for the chat relay, further ones are dropped and counted
+    relay_queue_size: int = 500
+    # Messages arriving within the window are written as one multi-line tellraw
+    relay_coalesce_window: float = 0.5
+    # Longest tellraw command in bytes, RCON accepts requests up to 1446
+    relay_command_limit: int = 1400
+    relay_message_limit: int = 256
+    # JSON object of named servers, e.g. MC_SERVERS='{"survival": {"path": "...", "target": "...", "topic_console": 2}}'
+    servers: dict[str, ServerSettings] = {}
 
     model_config: ClassVar[SettingsConfigDict] = SettingsConfigDict(
         env_prefix="MC_",
         env_file=".env",
         extra="ignore",
     )
+
+    def server_settings(self) -> dict[str, ServerSettings]:
+        """
+        Named servers to manage, a single "default" server built from the flat settings if none are listed.
+
+        :return: server settings by name
+        """
+        if self.servers:
+            return self.servers
+        return {
+            "default": ServerSettings(
+                path=self.path,
+                target=self.target,
+                transport=self.transport,
+                rcon_host=self.rcon_host,
+                rcon_port=self.rcon_port,
+                rcon_password=self.rcon_password,
+                worlds=self.worlds,
+                backup_path=self.backup_path,
+                game_port=self.game_port,
+                hibernate_cgroup=self.hibernate_cgroup,
+            )
+        }
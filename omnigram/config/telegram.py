@@ -1,13 +1,34 @@
-from typing import ClassVar
+from typing import ClassVar, Literal
 
-from pydantic_settings import BaseSettings, SettingsConfigDict
+from pydantic_settings import SettingsConfigDict
 
+from .base import EnvSettings
 
-class TelegramSettings(BaseSettings):
+
+class TelegramSettings(EnvSettings):
     token: str = ""
+    mode: Literal["polling", "webhook"] = "polling"
+    webhook_url: str = ""
+    webhook_path: str = "/webhook"
+    webhook_secret: str = ""
+    webhook_host: str = "0.0.0.0"
+    webhook_port: int = 8080
+    webhook_concurrency: int = 16
     group_mc: int
     topic_mc_console: int
     topic_mc_minecraft_chat: int
+    delete_chunk_size: int = 1000
+    delete_concurrency: int = 4
+    delete_retries: int = 3
+    send_rate_per_minute: int = 20
+    send_burst: int = 5
+    send_coalesce_window: float = 0.5
+    admin_cache_ttl: float = 600
+    console_tail: bool = False
+    console_tail_interval: float = 5.0
+    console_tail_buffer: int = 500
+    console_tail_include: list[str] = []
+    console_tail_exclude: list[str] = []
 
     model_config: ClassVar[SettingsConfigDict] = SettingsConfigDict(
         env_prefix="TG_",
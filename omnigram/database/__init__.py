@@ -1,3 +1,44 @@
-from .config import MessageModel, get_session
+from .config import MessageModel, create_schema
+from .maintenance import StorageMaintenance
+from .repository import (
+    HIGHLIGHT_END,
+    HIGHLIGHT_START,
+    SearchPage,
+    SearchResult,
+    fetch_undeleted_messages,
+    mark_messages_deleted,
+    search_messages,
+)
+from .sessions import (
+    PlayerStats,
+    Playtime,
+    SessionEvent,
+    fetch_active_hours,
+    fetch_player_stats,
+    record_session_events,
+)
+from .timers import load_timer_dues, save_timer_due
+from .writer import MessageRow, MessageWriter
 
-__all__ = ["MessageModel", "get_session"]
+__all__ = [
+    "HIGHLIGHT_END",
+    "HIGHLIGHT_START",
+    "MessageModel",
+    "MessageRow",
+    "MessageWriter",
+    "PlayerStats",
+    "Playtime",
+    "SearchPage",
+    "SearchResult",
+    "SessionEvent",
+    "StorageMaintenance",
+    "create_schema",
+    "fetch_active_hours",
+    "fetch_player_stats",
+    "fetch_undeleted_messages",
+    "load_timer_dues",
+    "mark_messages_deleted",
+    "record_session_events",
+    "save_timer_due",
+    "search_messages",
+]
@@ -1,27 +1,69 @@
-from datetime import datetime
-from typing import TYPE_CHECKING
+from datetime import UTC, datetime
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any
 
 from sqlalchemy import (
     Boolean,
     Column,
+    Date,
     DateTime,
+    Float,
+    Index,
     Integer,
     String,
     create_engine,
+    event,
+    text,
 )
 from sqlalchemy.orm import DeclarativeBase, sessionmaker
 
 from omnigram.config import config
 
 if TYPE_CHECKING:
-    from typing import Generator
-
+    from sqlalchemy import Engine
     from sqlalchemy.orm.session import Session
 
-engine = create_engine(
-    f"sqlite:///{config.database.name}.db",
-)
-SyncSession: "sessionmaker[Session]" = sessionmaker(bind=engine)
+
+@lru_cache
+def get_engine() -> "Engine":
+    """
+    The database engine, created on first use.
+
+    :return: engine
+    """
+    engine = create_engine(f"sqlite:///{config.database.name}.db")
+    event.listen(engine, "connect", _set_pragmas)
+    return engine
+
+
+@lru_cache
+def _session_factory() -> "sessionmaker[Session]":
+    return sessionmaker(bind=get_engine())
+
+
+def open_session() -> "Session":
+    """
+    A new session of the database, every unit of work opens its own.
+
+    :return: session
+    """
+    return _session_factory()()
+
+
+def _set_pragmas(dbapi_connection: "Any", _: "Any") -> None:
+    cursor = dbapi_connection.cursor()
+    # Only takes effect on a new database, existing ones are converted once by create_schema
+    cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    cursor.execute(f"PRAGMA journal_mode = {config.database.journal_mode}")
+    cursor.execute(f"PRAGMA synchronous = {config.database.synchronous}")
+    cursor.execute(f"PRAGMA cache_size = -{config.database.cache_size_kib}")
+    cursor.execute(f"PRAGMA busy_timeout = {config.database.busy_timeout_ms}")
+    cursor.execute("PRAGMA temp_store = MEMORY")
+    cursor.close()
+
+
+def utcnow() -> datetime:
+    return datetime.now(UTC)
 
 
 class Base(DeclarativeBase):
@@ -35,19 +77,137 @@ class MessageModel(Base):
     chat_id = Column(Integer)
     user_id = Column(Integer, nullable=True)
     text = Column(String)
-    timestamp = Column(DateTime, default=datetime.now())
+    timestamp = Column(DateTime, default=utcnow)
     deleted = Column(Boolean, default=False)
 
+    __table_args__ = (
+        Index("ix_message_chat_deleted_timestamp", "chat_id", "deleted", "timestamp"),
+        Index("ix_message_timestamp", "timestamp"),
+    )
+
+
+class PlayerEventModel(Base):
+    __tablename__ = "player_event"
+
+    id = Column(Integer, primary_key=True)
+    server = Column(String)
+    player = Column(String)
+    kind = Column(String)
+    timestamp = Column(DateTime, default=utcnow)
+
+    __table_args__ = (Index("ix_player_event_server_player_timestamp", "server", "player", "timestamp"),)
+
+
+class PlayerDailyModel(Base):
+    """
+    Playtime rollup per server, UTC day and player, updated as sessions close
+    """
+
+    __tablename__ = "player_daily"
+
+    server = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    player = Column(String, primary_key=True)
+    seconds = Column(Float, default=0.0)
+    sessions = Column(Integer, default=0)
+
+
+class ServerDailyModel(Base):
+    """
+    Peak concurrency rollup per server and UTC day, updated on joins
+    """
+
+    __tablename__ = "server_daily"
+
+    server = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    peak_online = Column(Integer, default=0)
+
+
+class ServerHourlyModel(Base):
+    """
+    Join count rollup per server and UTC hour, the activity history the launch forecast learns from
+    """
+
+    __tablename__ = "server_hourly"
+
+    server = Column(String, primary_key=True)
+    hour = Column(DateTime, primary_key=True)
+    joins = Column(Integer, default=0)
+
+
+class TimerJobModel(Base):
+    """
+    Next run of a persisted timer job, so a run missed while the bot was down is made up on start
+    """
+
+    __tablename__ = "timer_job"
+
+    name = Column(String, primary_key=True)
+    due = Column(DateTime)
+
+
+# The hourly rollup started after the join events, those recorded earlier are counted once
+HOURLY_BACKFILL = """
+    INSERT OR IGNORE INTO server_hourly (server, hour, joins)
+    SELECT server, strftime('%Y-%m-%d %H:00:00.000000', timestamp), count(*)
+    FROM player_event
+    WHERE kind = 'join'
+    GROUP BY server, strftime('%Y-%m-%d %H:00:00.000000', timestamp)
+"""
+
+# External content FTS5 index over message.text, kept in sync by triggers, so the text is stored only once
+SEARCH_SCHEMA = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS message_fts USING fts5(
+        text, content='message', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS message_fts_insert AFTER INSERT ON message BEGIN
+        INSERT INTO message_fts(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS message_fts_delete AFTER DELETE ON message BEGIN
+        INSERT INTO message_fts(message_fts, rowid, text) VALUES ('delete', old.id, old.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS message_fts_update AFTER UPDATE OF text ON message BEGIN
+        INSERT INTO message_fts(message_fts, rowid, text) VALUES ('delete', old.id, old.text);
+        INSERT INTO message_fts(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+)
 
-Base.metadata.create_all(engine)
 
+def create_schema() -> None:
+    """
+    Creating missing tables, indexes and the full-text index, backfilling the latter and the hourly activity
+    rollup on first creation.
+    A database created without incremental auto-vacuum is converted once with a full VACUUM.
+    Run once on startup, before anything touches the database.
 
-def get_session() -> "Generator[Session]":
-    with SyncSession() as session:
-        try:
-            yield session
-        except Exception as e:
-            session.rollback()
-            print(e)
-        finally:
-            session.close()
+    :return: None
+    """
+    engine = get_engine()
+    with engine.connect() as connection:
+        hourly = connection.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'server_hourly'")).first()
+    Base.metadata.create_all(engine)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        if connection.exec_driver_sql("PRAGMA auto_vacuum").scalar() != 2:
+            print("Database: enabling incremental auto-vacuum, running a one-time VACUUM")
+            connection.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+            connection.exec_driver_sql("VACUUM")
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+        exists = connection.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'message_fts'")).first()
+        for statement in SEARCH_SCHEMA:
+            connection.execute(text(statement))
+        if exists is None:
+            connection.execute(text("INSERT INTO message_fts(message_fts) VALUES ('rebuild')"))
+        if hourly is None:
+            connection.execute(text(HOURLY_BACKFILL))
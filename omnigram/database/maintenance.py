@@ -0,0 +1,140 @@
+import asyncio
+import os
+import time
+from datetime import UTC, datetime, timedelta
+from typing import TYPE_CHECKING, Literal
+
+from sqlalchemy import create_engine, delete, select
+from sqlalchemy.dialects.sqlite import insert
+
+from omnigram.config import config
+from omnigram.metrics import metrics
+
+from .config import Base, MessageModel, get_engine, open_session
+
+if TYPE_CHECKING:
+    from asyncio import Task
+
+    from sqlalchemy import Engine
+
+
+class StorageMaintenance:
+    """
+    Periodic retention, incremental vacuum and WAL checkpoints keeping the message database small
+    """
+
+    _task: "Task | None" = None
+    _archive_engine: "Engine | None" = None
+
+    def __init__(
+        self,
+        retention_days: int | None = None,
+        mode: 'Literal["delete", "archive"] | None' = None,
+        batch_size: int | None = None,
+        interval: float | None = None,
+        vacuum_pages: int | None = None,
+    ) -> None:
+        self.retention_days = retention_days if retention_days is not None else config.database.retention_days
+        self.mode = mode or config.database.retention_mode
+        self.batch_size = batch_size or config.database.retention_batch_size
+        self.interval = interval or config.database.maintenance_interval
+        self.vacuum_pages = vacuum_pages if vacuum_pages is not None else config.database.vacuum_pages
+        metrics.db_file_bytes.set_function(self.file_size)
+
+    async def start(self) -> None:
+        """
+        Starting the periodic maintenance task.
+
+        :return: None
+        """
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        """
+        Stopping the periodic maintenance task, a batch in progress is finished first.
+
+        :return: None
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._archive_engine is not None:
+            self._archive_engine.dispose()
+            self._archive_engine = None
+
+    async def run(self) -> int:
+        """
+        Pruning rows past the retention period batch by batch, then compacting the file.
+
+        :return: number of pruned rows
+        """
+        started = time.perf_counter()
+        pruned = 0
+        if self.retention_days > 0:
+            cutoff = datetime.now(UTC) - timedelta(days=self.retention_days)
+            while True:
+                # Every batch is its own short transaction, so the message writer is never blocked for long
+                count = await asyncio.to_thread(self._prune_batch, cutoff)
+                pruned += count
+                metrics.db_pruned_rows.labels(self.mode).inc(count)
+                if count < self.batch_size:
+                    break
+        await asyncio.to_thread(self._compact)
+        metrics.db_maintenance_seconds.observe(time.perf_counter() - started)
+        return pruned
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                pruned = await self.run()
+                if pruned:
+                    print(f"Database maintenance: {self.mode} {pruned} rows older than {self.retention_days} days")
+            except Exception as e:
+                print("Database maintenance:", e)
+            await asyncio.sleep(self.interval)
+
+    def _prune_batch(self, cutoff: datetime) -> int:
+        table = MessageModel.__table__
+        with open_session() as session, session.begin():
+            statement = (
+                select(table).where(table.c.timestamp < cutoff).order_by(table.c.timestamp).limit(self.batch_size)
+            )
+            rows = [dict(row._mapping) for row in session.execute(statement)]
+            if not rows:
+                return 0
+            if self.mode == "archive":
+                # Written before the rows are deleted and idempotent, so a crash in between loses nothing
+                self._archive(rows)
+            session.execute(delete(MessageModel).where(table.c.id.in_([row["id"] for row in rows])))
+        return len(rows)
+
+    def _archive(self, rows: "list[dict]") -> None:
+        if self._archive_engine is None:
+            self._archive_engine = create_engine(f"sqlite:///{config.database.name}-archive.db")
+            Base.metadata.create_all(self._archive_engine)
+        statement = insert(MessageModel).on_conflict_do_nothing(index_elements=[MessageModel.id])
+        with self._archive_engine.begin() as connection:
+            connection.execute(statement, rows)
+
+    def _compact(self) -> None:
+        connection = get_engine().raw_connection()
+        try:
+            sqlite = connection.driver_connection
+            if sqlite is None:
+                return
+            # executescript steps each pragma to completion, a plain execute frees a single page
+            sqlite.executescript(
+                f"PRAGMA incremental_vacuum({self.vacuum_pages});PRAGMA wal_checkpoint(TRUNCATE);PRAGMA optimize;"
+            )
+        finally:
+            connection.close()
+
+    @staticmethod
+    def file_size() -> float:
+        path = f"{config.database.name}.db"
+        return sum(os.path.getsize(name) for name in (path, f"{path}-wal") if os.path.exists(name))
@@ -0,0 +1,133 @@
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import TYPE_CHECKING
+
+from sqlalchemy import Float, String, column, select, text, update
+
+from .config import MessageModel, open_session
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+# Snippet highlight markers, control characters never met in chat text so callers can swap them for markup
+HIGHLIGHT_START = "\x02"
+HIGHLIGHT_END = "\x03"
+
+_TERM = re.compile(r"[^\s\"]+\*?")
+
+_SEARCH = f"""
+    SELECT message.id, message.chat_id, message.user_id, message.timestamp,
+           snippet(message_fts, 0, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}', '…', 16) AS snippet,
+           message_fts.rank AS rank
+    FROM message_fts JOIN message ON message.id = message_fts.rowid
+    WHERE message_fts MATCH :query AND (:chat_id IS NULL OR message.chat_id = :chat_id)
+    ORDER BY message_fts.rank
+    LIMIT :limit OFFSET :offset
+"""
+
+
+@dataclass(frozen=True, slots=True)
+class SearchResult:
+    id: int
+    chat_id: int
+    user_id: int | None
+    timestamp: datetime | None
+    snippet: str
+    rank: float
+
+
+@dataclass(frozen=True, slots=True)
+class SearchPage:
+    results: "list[SearchResult]"
+    page: int
+    has_more: bool
+
+
+def fetch_undeleted_messages(after_id: int, limit: int) -> "list[tuple[int, int]]":
+    """
+    Fetching the next chunk of messages not yet deleted in Telegram, ordered by id.
+
+    :param after_id: last id of the previous chunk
+    :param limit: chunk size
+    :return: list of (message id, chat id) pairs
+    """
+    table = MessageModel.__table__
+    statement = (
+        select(table.c.id, table.c.chat_id)
+        .where(table.c.deleted.is_(False), table.c.id > after_id)
+        .order_by(table.c.id)
+        .limit(limit)
+    )
+    with open_session() as session:
+        return [(row.id, row.chat_id) for row in session.execute(statement)]
+
+
+def mark_messages_deleted(ids: "Iterable[int]") -> None:
+    """
+    Marking messages as deleted.
+
+    :param ids: message ids
+    :return: None
+    """
+    ids = list(ids)
+    if not ids:
+        return
+    with open_session() as session, session.begin():
+        session.execute(update(MessageModel).where(MessageModel.__table__.c.id.in_(ids)).values(deleted=True))
+
+
+def _match_expression(query: str) -> str:
+    """
+    Turning free user input into an FTS5 query: every word is matched literally, a trailing "*" keeps prefix search.
+
+    :param query: user input
+    :return: FTS5 MATCH expression, empty when there is nothing to search for
+    """
+    terms = []
+    for term in _TERM.findall(query):
+        prefix = term.endswith("*")
+        term = term.rstrip("*")
+        if term:
+            terms.append(f'"{term}"*' if prefix else f'"{term}"')
+    return " ".join(terms)
+
+
+def search_messages(query: str, chat_id: int | None = None, page: int = 1, page_size: int = 5) -> "SearchPage":
+    """
+    Full-text search over the archive, deleted messages included, best matches first.
+
+    :param query: words to look for, "word*" matches by prefix
+    :param chat_id: restricting results to one chat
+    :param page: page number starting from 1
+    :param page_size: results per page
+    :return: page of ranked results with highlighted snippets
+    """
+    page = max(page, 1)
+    expression = _match_expression(query)
+    if not expression:
+        return SearchPage(results=[], page=page, has_more=False)
+    table = MessageModel.__table__
+    statement = text(_SEARCH).columns(
+        table.c.id,
+        table.c.chat_id,
+        table.c.user_id,
+        table.c.timestamp,
+        column("snippet", String),
+        column("rank", Float),
+    )
+    parameters = {"query": expression, "chat_id": chat_id, "limit": page_size + 1, "offset": (page - 1) * page_size}
+    with open_session() as session:
+        rows = session.execute(statement, parameters).all()
+    results = [
+        SearchResult(
+            id=row.id,
+            chat_id=row.chat_id,
+            user_id=row.user_id,
+            timestamp=row.timestamp,
+            snippet=row.snippet,
+            rank=row.rank,
+        )
+        for row in rows[:page_size]
+    ]
+    return SearchPage(results=results, page=page, has_more=len(rows) > page_size)
@@ -0,0 +1,178 @@
+from dataclasses import dataclass
+from datetime import UTC, date, datetime, time, timedelta
+from typing import TYPE_CHECKING, Literal
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.dialects.sqlite import insert as upsert
+
+from .config import PlayerDailyModel, PlayerEventModel, ServerDailyModel, ServerHourlyModel, open_session
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+    from sqlalchemy.dialects.sqlite import Insert
+
+
+@dataclass(frozen=True, slots=True)
+class Playtime:
+    player: str
+    seconds: float
+    sessions: int
+
+
+@dataclass(frozen=True, slots=True)
+class PlayerStats:
+    since: date
+    playtime: "list[Playtime]"
+    peak_online: int
+    peak_day: date | None
+
+
+@dataclass(frozen=True, slots=True)
+class SessionEvent:
+    server: str
+    player: str
+    kind: 'Literal["join", "leave"]'
+    at: datetime
+    # Players online after a join, join time of the closed session for a leave (None when it was not seen)
+    online: int = 0
+    joined_at: datetime | None = None
+
+
+def record_session_events(events: "Iterable[SessionEvent]") -> None:
+    """
+    Recording join and leave events in one transaction. Joins raise the peak concurrency of the day,
+    leaves add the closed session to the daily playtime, split at UTC midnight. Joins are also counted per
+    UTC hour for the activity forecast. The rollups are summed
+    up per day first, so a join/leave storm costs a few statements rather than a few per event.
+
+    :param events: events in the order they happened
+    :return: None
+    """
+    rows = []
+    peaks: "dict[tuple[str, date], int]" = {}
+    hourly: "dict[tuple[str, datetime], int]" = {}
+    playtime: "dict[tuple[str, date, str], tuple[float, int]]" = {}
+    for event in events:
+        rows.append({"server": event.server, "player": event.player, "kind": event.kind, "timestamp": event.at})
+        if event.kind == "join":
+            peak_key = (event.server, event.at.date())
+            peaks[peak_key] = max(peaks.get(peak_key, 0), event.online)
+            hour_key = (event.server, event.at.replace(minute=0, second=0, microsecond=0))
+            hourly[hour_key] = hourly.get(hour_key, 0) + 1
+        elif event.joined_at is not None:
+            for split_day, seconds, sessions in _split(event.joined_at, event.at):
+                key = (event.server, split_day, event.player)
+                total, count = playtime.get(key, (0.0, 0))
+                playtime[key] = (total + seconds, count + sessions)
+    if not rows:
+        return
+    with open_session() as session, session.begin():
+        session.execute(insert(PlayerEventModel), rows)
+        if peaks:
+            session.execute(
+                _PEAK,
+                [{"server": server, "day": day, "peak_online": online} for (server, day), online in peaks.items()],
+            )
+        if hourly:
+            session.execute(
+                _HOURLY,
+                [{"server": server, "hour": hour, "joins": joins} for (server, hour), joins in hourly.items()],
+            )
+        if playtime:
+            session.execute(
+                _PLAYTIME,
+                [
+                    {"server": server, "day": day, "player": player, "seconds": seconds, "sessions": sessions}
+                    for (server, day, player), (seconds, sessions) in playtime.items()
+                ],
+            )
+
+
+def _split(joined_at: datetime, left_at: datetime) -> "Iterator[tuple[date, float, int]]":
+    start = joined_at
+    while start < left_at:
+        end = min(left_at, datetime.combine(start.date() + timedelta(days=1), time(), tzinfo=UTC))
+        yield start.date(), (end - start).total_seconds(), 1 if start == joined_at else 0
+        start = end
+
+
+def _upserts() -> "tuple[Insert, Insert, Insert]":
+    peaks = ServerDailyModel.__table__
+    peak = upsert(ServerDailyModel)
+    peak = peak.on_conflict_do_update(
+        index_elements=[peaks.c.server, peaks.c.day],
+        set_={"peak_online": func.max(peaks.c.peak_online, peak.excluded.peak_online)},
+    )
+    daily = PlayerDailyModel.__table__
+    playtime = upsert(PlayerDailyModel)
+    playtime = playtime.on_conflict_do_update(
+        index_elements=[daily.c.server, daily.c.day, daily.c.player],
+        set_={
+            "seconds": daily.c.seconds + playtime.excluded.seconds,
+            "sessions": daily.c.sessions + playtime.excluded.sessions,
+        },
+    )
+    hours = ServerHourlyModel.__table__
+    hourly = upsert(ServerHourlyModel)
+    hourly = hourly.on_conflict_do_update(
+        index_elements=[hours.c.server, hours.c.hour],
+        set_={"joins": hours.c.joins + hourly.excluded.joins},
+    )
+    return peak, playtime, hourly
+
+
+_PEAK, _PLAYTIME, _HOURLY = _upserts()
+
+
+def fetch_player_stats(server: str, since: date, limit: int = 10) -> "PlayerStats":
+    """
+    Reading playtime leaders and peak concurrency from the daily rollups.
+
+    :param server: server name
+    :param since: first UTC day of the period
+    :param limit: number of players
+    :return: player statistics of the period
+    """
+    daily = PlayerDailyModel.__table__
+    peaks = ServerDailyModel.__table__
+    leaders = (
+        select(daily.c.player, func.sum(daily.c.seconds).label("seconds"), func.sum(daily.c.sessions).label("sessions"))
+        .where(daily.c.server == server, daily.c.day >= since)
+        .group_by(daily.c.player)
+        .order_by(func.sum(daily.c.seconds).desc())
+        .limit(limit)
+    )
+    peak = (
+        select(peaks.c.peak_online, peaks.c.day)
+        .where(peaks.c.server == server, peaks.c.day >= since)
+        .order_by(peaks.c.peak_online.desc(), peaks.c.day.desc())
+        .limit(1)
+    )
+    with open_session() as session:
+        playtime = [
+            Playtime(player=row.player, seconds=row.seconds, sessions=row.sessions) for row in session.execute(leaders)
+        ]
+        top = session.execute(peak).first()
+    return PlayerStats(
+        since=since,
+        playtime=playtime,
+        peak_online=top.peak_online if top is not None else 0,
+        peak_day=top.day if top is not None else None,
+    )
+
+
+def fetch_active_hours(server: str, since: datetime) -> "dict[datetime, int]":
+    """
+    Reading the hours with joins from the hourly rollup.
+
+    :param server: server name
+    :param since: aware start of the period
+    :return: joins by UTC hour start
+    """
+    hours = ServerHourlyModel.__table__
+    statement = select(hours.c.hour, hours.c.joins).where(
+        hours.c.server == server, hours.c.hour >= since.astimezone(UTC).replace(tzinfo=None), hours.c.joins > 0
+    )
+    with open_session() as session:
+        return {row.hour.replace(tzinfo=UTC): row.joins for row in session.execute(statement)}
@@ -0,0 +1,33 @@
+from datetime import UTC, datetime
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+
+from .config import TimerJobModel, open_session
+
+
+def load_timer_dues() -> "dict[str, datetime]":
+    """
+    Reading the next runs of the persisted timer jobs.
+
+    :return: UTC due time by job name
+    """
+    table = TimerJobModel.__table__
+    with open_session() as session:
+        return {row.name: row.due.replace(tzinfo=UTC) for row in session.execute(select(table.c.name, table.c.due))}
+
+
+def save_timer_due(name: str, due: datetime) -> None:
+    """
+    Storing the next run of a persisted timer job.
+
+    :param name: job name
+    :param due: UTC due time
+    :return: None
+    """
+    statement = insert(TimerJobModel).values(name=name, due=due.astimezone(UTC).replace(tzinfo=None))
+    statement = statement.on_conflict_do_update(
+        index_elements=[TimerJobModel.name], set_={"due": statement.excluded.due}
+    )
+    with open_session() as session, session.begin():
+        session.execute(statement)
@@ -0,0 +1,142 @@
+import asyncio
+import time
+from datetime import datetime
+from typing import TYPE_CHECKING, TypedDict
+
+from sqlalchemy.dialects.sqlite import insert
+
+from omnigram.config import config
+from omnigram.metrics import metrics
+
+from .config import MessageModel, open_session
+
+if TYPE_CHECKING:
+    from asyncio import Queue, Task
+
+
+class MessageRow(TypedDict):
+    id: int
+    chat_id: int
+    user_id: int | None
+    text: str | None
+    timestamp: datetime
+
+
+class MessageWriter:
+    """
+    Background writer, persisting messages in batches off the event loop
+    """
+
+    _queue: "Queue[MessageRow]"
+    _task: "Task | None" = None
+
+    def __init__(
+        self,
+        batch_size: int | None = None,
+        flush_interval: float | None = None,
+        attempts: int | None = None,
+        retry_delay: float | None = None,
+    ) -> None:
+        self.batch_size = batch_size or config.database.batch_size
+        self.flush_interval = flush_interval if flush_interval is not None else config.database.flush_interval
+        self.attempts = attempts or config.database.write_attempts
+        self.retry_delay = retry_delay if retry_delay is not None else config.database.write_retry_delay
+        self._queue = asyncio.Queue()
+        metrics.db_queue_depth.set_function(lambda: self.pending)
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    async def start(self) -> None:
+        """
+        Starting the background flushing task.
+
+        :return: None
+        """
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Flushing everything queued and stopping the background task.
+
+        :return: None
+        """
+        if self._task is not None and not self._task.done():
+            await self.flush()
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        elif not self._queue.empty():
+            rows = [self._queue.get_nowait() for _ in range(self._queue.qsize())]
+            await self._write_batch(rows)
+        self._task = None
+
+    def put(self, *rows: "MessageRow") -> None:
+        """
+        Queueing rows for writing, never waits on the database.
+
+        :param rows: message rows
+        :return: None
+        """
+        for row in rows:
+            self._queue.put_nowait(row)
+
+    async def flush(self) -> None:
+        """
+        Waiting until every queued row is written.
+
+        :return: None
+        """
+        await self._queue.join()
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            try:
+                await self._write_batch(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _write_batch(self, batch: "list[MessageRow]") -> None:
+        # A locked database is usually free again shortly, the batch is dropped only after every attempt failed
+        delay = self.retry_delay
+        for attempt in range(1, self.attempts + 1):
+            started = time.perf_counter()
+            try:
+                await asyncio.to_thread(self._write, batch)
+            except Exception as e:
+                print(f"Message write, attempt {attempt}/{self.attempts}:", e)
+                if attempt < self.attempts:
+                    await asyncio.sleep(delay)
+                    delay *= 2
+                    continue
+                metrics.db_write_lost_rows.inc(len(batch))
+            else:
+                metrics.db_write_rows.inc(len(batch))
+                return
+            finally:
+                metrics.db_write_seconds.observe(time.perf_counter() - started)
+
+    async def _collect(self) -> "list[MessageRow]":
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=timeout))
+            except TimeoutError:
+                break
+        return batch
+
+    @staticmethod
+    def _write(rows: "list[MessageRow]") -> None:
+        statement = insert(MessageModel).on_conflict_do_nothing(index_elements=[MessageModel.id])
+        with open_session() as session, session.begin():
+            session.execute(statement, rows)
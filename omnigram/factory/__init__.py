@@ -1,4 +1,13 @@
-from .minecraft_server import get_minecraft_server
+from .message_writer import get_message_writer
+from .minecraft_registry import get_minecraft_registry
+from .storage_maintenance import get_storage_maintenance
 from .telegram_handler import get_telegram_handler
+from .timer_service import get_timer_service
 
-__all__ = ["get_minecraft_server", "get_telegram_handler"]
+__all__ = [
+    "get_message_writer",
+    "get_minecraft_registry",
+    "get_storage_maintenance",
+    "get_telegram_handler",
+    "get_timer_service",
+]
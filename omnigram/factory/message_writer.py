@@ -0,0 +1,8 @@
+from functools import lru_cache
+
+from omnigram.database import MessageWriter
+
+
+@lru_cache
+def get_message_writer() -> "MessageWriter":
+    return MessageWriter()
@@ -0,0 +1,10 @@
+from functools import lru_cache
+
+from omnigram.minecraft import MinecraftRegistry
+
+from .timer_service import get_timer_service
+
+
+@lru_cache
+def get_minecraft_registry() -> "MinecraftRegistry":
+    return MinecraftRegistry.from_config(timers=get_timer_service())
@@ -0,0 +1,8 @@
+from functools import lru_cache
+
+from omnigram.database import StorageMaintenance
+
+
+@lru_cache
+def get_storage_maintenance() -> "StorageMaintenance":
+    return StorageMaintenance()
@@ -2,9 +2,15 @@ from functools import lru_cache
 
 from omnigram.telegram import TelegramHandler
 
-from .minecraft_server import get_minecraft_server
+from .message_writer import get_message_writer
+from .minecraft_registry import get_minecraft_registry
+from .timer_service import get_timer_service
 
 
 @lru_cache
 def get_telegram_handler() -> "TelegramHandler":
-    return TelegramHandler(minecraft_server=get_minecraft_server())
+    return TelegramHandler(
+        minecraft_registry=get_minecraft_registry(),
+        message_writer=get_message_writer(),
+        timers=get_timer_service(),
+    )
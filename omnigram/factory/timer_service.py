@@ -0,0 +1,8 @@
+from functools import lru_cache
+
+from omnigram.timers import TimerService
+
+
+@lru_cache
+def get_timer_service() -> "TimerService":
+    return TimerService()
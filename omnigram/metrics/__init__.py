@@ -0,0 +1,7 @@
+from .metrics import Metrics
+from .registry import Counter, Gauge, Histogram, MetricsRegistry
+from .server import MetricsServer
+
+metrics = Metrics()
+
+__all__ = ["Counter", "Gauge", "Histogram", "Metrics", "MetricsRegistry", "MetricsServer", "metrics"]
@@ -0,0 +1,123 @@
+from .registry import MetricsRegistry
+
+
+class Metrics:
+    """
+    Metrics of the bot hot paths
+    """
+
+    registry: "MetricsRegistry"
+
+    def __init__(self, registry: "MetricsRegistry | None" = None) -> None:
+        self.registry = registry or MetricsRegistry()
+        self.log_lines = self.registry.counter(
+            "omnigram_log_lines_total", "Server log lines read, by parsed event type", ("server", "event")
+        )
+        self.log_lines_dropped = self.registry.counter(
+            "omnigram_log_lines_dropped_total", "Plain log lines dropped by a lagging consumer", ("server", "reason")
+        )
+        self.log_queue_depth = self.registry.gauge(
+            "omnigram_log_queue_depth", "Log lines read but not handled yet", ("server",)
+        )
+        self.log_reader_restarts = self.registry.counter(
+            "omnigram_log_reader_restarts_total", "Log reader failures followed by a restart", ("server", "stream")
+        )
+        self.log_archive_lines = self.registry.counter(
+            "omnigram_log_archive_lines_total", "Server output lines, by archived or dropped", ("server", "outcome")
+        )
+        self.log_archive_bytes = self.registry.gauge(
+            "omnigram_log_archive_bytes", "Size of the compressed log archive", ("server",)
+        )
+        self.relay_messages = self.registry.counter(
+            "omnigram_relay_messages_total",
+            "Telegram messages for the game chat, by relayed, dropped or failed",
+            ("server", "outcome"),
+        )
+        self.relay_commands = self.registry.counter(
+            "omnigram_relay_commands_total", "tellraw commands written by the chat relay", ("server",)
+        )
+        self.relay_queue_depth = self.registry.gauge(
+            "omnigram_relay_queue_depth", "Telegram messages waiting for the chat relay", ("server",)
+        )
+        self.players_online = self.registry.gauge("omnigram_players_online", "Players online", ("server",))
+        self.server_uptime = self.registry.gauge(
+            "omnigram_server_uptime_seconds", "Seconds since the server process was spawned", ("server",)
+        )
+        self.server_hibernated = self.registry.gauge(
+            "omnigram_server_hibernated", "1 while the server process is frozen", ("server",)
+        )
+        self.activity_forecast = self.registry.gauge(
+            "omnigram_activity_forecast", "Forecast chance of players in the current hour", ("server",)
+        )
+        self.prewarm_launches = self.registry.counter(
+            "omnigram_prewarm_launches_total",
+            "Launches ahead of forecast players, by launched or resumed",
+            ("server", "action"),
+        )
+        self.server_exits = self.registry.counter(
+            "omnigram_server_exits_total", "Server process exits, by stopped, exited or crashed", ("server", "reason")
+        )
+        self.backup_seconds = self.registry.histogram(
+            "omnigram_backup_seconds",
+            "Duration of a world backup",
+            ("server",),
+            buckets=(0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0),
+        )
+        self.backup_bytes = self.registry.counter(
+            "omnigram_backup_bytes_total", "World bytes backed up, by copied or linked", ("server", "kind")
+        )
+        self.server_tps = self.registry.gauge(
+            "omnigram_server_tps", "Ticks per second over the last minute", ("server",)
+        )
+        self.server_mspt = self.registry.gauge(
+            "omnigram_server_mspt", "Average tick duration in milliseconds over the last seconds", ("server",)
+        )
+        self.server_lag_ticks = self.registry.counter(
+            "omnigram_server_lag_ticks_total", "Ticks skipped by an overloaded server", ("server",)
+        )
+        self.server_cpu_percent = self.registry.gauge(
+            "omnigram_server_cpu_percent", "CPU usage of the server process tree, percent of one core", ("server",)
+        )
+        self.server_memory_bytes = self.registry.gauge(
+            "omnigram_server_memory_bytes", "Resident memory of the server process tree", ("server",)
+        )
+        self.telegram_request_seconds = self.registry.histogram(
+            "omnigram_telegram_request_seconds", "Telegram Bot API call latency", ("method",)
+        )
+        self.telegram_request_errors = self.registry.counter(
+            "omnigram_telegram_request_errors_total", "Failed Telegram Bot API calls", ("method", "error")
+        )
+        self.handler_seconds = self.registry.histogram(
+            "omnigram_handler_seconds", "Update handler latency", ("handler",)
+        )
+        self.outbox_pending = self.registry.gauge("omnigram_outbox_pending", "Lines waiting to be sent to Telegram")
+        self.console_tail_lines = self.registry.counter(
+            "omnigram_console_tail_lines_total",
+            "Console lines of the live view, by shown, filtered or dropped",
+            ("server", "outcome"),
+        )
+        self.db_write_seconds = self.registry.histogram("omnigram_db_write_seconds", "Message batch write latency")
+        self.db_write_rows = self.registry.counter("omnigram_db_write_rows_total", "Message rows written")
+        self.db_write_lost_rows = self.registry.counter(
+            "omnigram_db_write_lost_rows_total", "Message rows dropped after every write attempt failed"
+        )
+        self.db_queue_depth = self.registry.gauge("omnigram_db_queue_depth", "Message rows waiting to be written")
+        self.db_pruned_rows = self.registry.counter(
+            "omnigram_db_pruned_rows_total", "Message rows past retention, by deleted or archived", ("mode",)
+        )
+        self.db_maintenance_seconds = self.registry.histogram(
+            "omnigram_db_maintenance_seconds", "Duration of a retention and compaction run"
+        )
+        self.db_file_bytes = self.registry.gauge("omnigram_db_file_bytes", "Size of the database file and its WAL")
+        self.timers_pending = self.registry.gauge("omnigram_timers_pending", "Timers scheduled and not fired yet")
+        self.timer_lateness = self.registry.histogram(
+            "omnigram_timer_lateness_seconds",
+            "Delay of timers firing past their deadline",
+            ("timer",),
+            buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0, 60.0),
+        )
+        self.event_loop_lag = self.registry.histogram(
+            "omnigram_event_loop_lag_seconds",
+            "Delay of event loop wakeups past their deadline",
+            buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+        )
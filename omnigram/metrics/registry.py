@@ -0,0 +1,164 @@
+import math
+from bisect import bisect_left
+from typing import TYPE_CHECKING, Self, TypeVar
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+M = TypeVar("M", bound="_Metric")
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names: "tuple[str, ...]", values: "tuple[str, ...]", extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values, strict=True)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: "tuple[str, ...]" = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = labels
+        self._children: "dict[tuple[str, ...], Self]" = {}
+
+    def _child(self) -> Self:
+        return type(self)(self.name, self.documentation)
+
+    def labels(self, *values: str, **labels: str) -> Self:
+        key = values or tuple(labels[name] for name in self.label_names)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = self._child()
+        return child
+
+    def render(self) -> "list[str]":
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        if self.label_names:
+            for key, child in sorted(self._children.items()):
+                lines.extend(child._samples(self.label_names, key))
+        else:
+            lines.extend(self._samples((), ()))
+        return lines
+
+    def _samples(self, names: "tuple[str, ...]", key: "tuple[str, ...]") -> "list[str]":
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+    value: float = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def _samples(self, names: "tuple[str, ...]", key: "tuple[str, ...]") -> "list[str]":
+        return [f"{self.name}{_format_labels(names, key)} {_format_value(self.value)}"]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+    value: float = 0.0
+    _function: "Callable[[], float] | None" = None
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set_function(self, function: "Callable[[], float]") -> None:
+        self._function = function
+
+    def get(self) -> float:
+        return self._function() if self._function is not None else self.value
+
+    def _samples(self, names: "tuple[str, ...]", key: "tuple[str, ...]") -> "list[str]":
+        return [f"{self.name}{_format_labels(names, key)} {_format_value(self.get())}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: "tuple[str, ...]" = (),
+        buckets: "tuple[float, ...]" = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labels)
+        self.buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def _child(self) -> Self:
+        return type(self)(self.name, self.documentation, buckets=self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def _samples(self, names: "tuple[str, ...]", key: "tuple[str, ...]") -> "list[str]":
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, math.inf), self._counts, strict=True):
+            cumulative += count
+            le = 'le="' + _format_value(bound) + '"'
+            lines.append(f"{self.name}_bucket{_format_labels(names, key, le)} {cumulative}")
+        labels = _format_labels(names, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(self.sum)}")
+        lines.append(f"{self.name}_count{labels} {self.count}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Registry of metrics rendered in the Prometheus text exposition format
+    """
+
+    def __init__(self) -> None:
+        self._metrics: "dict[str, _Metric]" = {}
+
+    def counter(self, name: str, documentation: str, labels: "tuple[str, ...]" = ()) -> "Counter":
+        return self._register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: "tuple[str, ...]" = ()) -> "Gauge":
+        return self._register(Gauge(name, documentation, labels))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labels: "tuple[str, ...]" = (),
+        buckets: "tuple[float, ...]" = DEFAULT_BUCKETS,
+    ) -> "Histogram":
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def render(self) -> str:
+        return "\n".join(line for metric in self._metrics.values() for line in metric.render()) + "\n"
+
+    def _register(self, metric: M) -> M:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
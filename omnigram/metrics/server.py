@@ -0,0 +1,53 @@
+import asyncio
+from typing import TYPE_CHECKING
+
+from aiohttp import web
+
+from omnigram.config import config
+
+if TYPE_CHECKING:
+    from asyncio import Task
+
+    from .metrics import Metrics
+
+
+class MetricsServer:
+    """
+    Local HTTP endpoint exposing metrics at /metrics, also measuring the event loop lag
+    """
+
+    _runner: "web.AppRunner | None" = None
+    _lag_task: "Task | None" = None
+
+    def __init__(self, metrics: "Metrics") -> None:
+        self.metrics = metrics
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host=config.metrics.host, port=config.metrics.port).start()
+        self._lag_task = asyncio.create_task(self._measure_loop_lag())
+
+    async def stop(self) -> None:
+        if self._lag_task is not None:
+            self._lag_task.cancel()
+            self._lag_task = None
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle(self, request: "web.Request") -> "web.Response":
+        return web.Response(
+            body=self.metrics.registry.render().encode(),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        )
+
+    async def _measure_loop_lag(self) -> None:
+        loop = asyncio.get_running_loop()
+        interval = config.metrics.loop_lag_interval
+        while True:
+            started = loop.time()
+            await asyncio.sleep(interval)
+            self.metrics.event_loop_lag.observe(max(loop.time() - started - interval, 0.0))
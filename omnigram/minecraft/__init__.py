@@ -1,3 +1,5 @@
+from .log_parser import parse_line
 from .minecraft_server import MinecraftServer
+from .registry import MinecraftRegistry
 
-__all__ = ["MinecraftServer"]
+__all__ = ["MinecraftRegistry", "MinecraftServer", "parse_line"]
@@ -0,0 +1,186 @@
+import asyncio
+import math
+from datetime import UTC, datetime, timedelta
+from typing import TYPE_CHECKING
+
+from omnigram.config import config
+from omnigram.database import fetch_active_hours
+from omnigram.metrics import metrics
+
+if TYPE_CHECKING:
+    from omnigram.timers import Timer
+
+    from .minecraft_server import MinecraftServer
+
+_HOUR = timedelta(hours=1)
+
+
+def _slot(hour: datetime) -> "tuple[int, int]":
+    # Local weekday and hour, players keep to the local clock
+    local = hour.astimezone()
+    return local.weekday(), local.hour
+
+
+def _hour_start(at: datetime) -> datetime:
+    return at.astimezone(UTC).replace(minute=0, second=0, microsecond=0)
+
+
+class ActivityForecast:
+    """
+    When players come to one server, learnt from the joins of the last weeks: the chance of players in an hour
+    of the week is the share of its past occurrences that had a join. The server is launched ahead of the hours
+    likely to bring players, and the idle delay is stretched when they are likely to return and cut when not.
+    """
+
+    _timer: "Timer | None" = None
+    # Weeks of history behind the histograms, the forecast is not trusted below activity_min_weeks
+    weeks: float = 0.0
+    # Hour start the server was last launched ahead of
+    _prewarmed: datetime | None = None
+
+    def __init__(self, server: "MinecraftServer", weeks: int | None = None) -> None:
+        self.server = server
+        self.history = weeks or config.minecraft.activity_weeks
+        # Occurrences of each (weekday, hour) in the history and how many of them had a join
+        self._seen: "dict[tuple[int, int], int]" = {}
+        self._active: "dict[tuple[int, int], int]" = {}
+        self._launches = metrics.prewarm_launches
+        metrics.activity_forecast.labels(server.name).set_function(lambda: self.probability(datetime.now(UTC)) or 0.0)
+
+    @property
+    def ready(self) -> bool:
+        return self.weeks >= config.minecraft.activity_min_weeks
+
+    async def start(self) -> None:
+        """
+        Loading the history and scheduling the checks ahead of every hour.
+
+        :return: None
+        """
+        if not config.minecraft.activity_forecast:
+            return
+        try:
+            await self.refresh()
+        except Exception as e:
+            print(f"[{self.server.name}] Activity forecast:", e)
+        self._schedule()
+
+    def stop(self) -> None:
+        """
+        Cancelling the next check.
+
+        :return: None
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    async def refresh(self) -> None:
+        """
+        Rebuilding the weekday/hour histograms from the hourly join rollup.
+
+        :return: None
+        """
+        now = datetime.now(UTC)
+        since = _hour_start(now - timedelta(weeks=self.history))
+        await self.server.players.flush()
+        hours = await asyncio.to_thread(fetch_active_hours, self.server.name, since)
+        seen: "dict[tuple[int, int], int]" = {}
+        active: "dict[tuple[int, int], int]" = {}
+        # The history starts with the first join, earlier hours say nothing about the players
+        hour = min(hours, default=_hour_start(now))
+        while hour < _hour_start(now):
+            slot = _slot(hour)
+            seen[slot] = seen.get(slot, 0) + 1
+            if hour in hours:
+                active[slot] = active.get(slot, 0) + 1
+            hour += _HOUR
+        self._seen, self._active = seen, active
+        self.weeks = sum(seen.values()) / (7 * 24)
+
+    def probability(self, at: datetime) -> float | None:
+        """
+        Chance of players in the hour of a moment.
+
+        :param at: aware moment
+        :return: share of the past occurrences of the hour with a join, None while the history is too short
+        """
+        if not self.ready:
+            return None
+        slot = _slot(_hour_start(at))
+        seen = self._seen.get(slot, 0)
+        return self._active.get(slot, 0) / seen if seen else 0.0
+
+    def chance(self, start: datetime, seconds: float) -> float | None:
+        """
+        Chance of players within a period, the hours taken as independent and weighted by their overlap.
+
+        :param start: aware start of the period
+        :param seconds: length of the period
+        :return: chance, None while the history is too short
+        """
+        if not self.ready:
+            return None
+        end = start + timedelta(seconds=seconds)
+        absent = 1.0
+        hour = _hour_start(start)
+        while hour < end:
+            overlap = (min(hour + _HOUR, end) - max(hour, start)) / _HOUR
+            absent *= 1.0 - (self.probability(hour) or 0.0) * overlap
+            hour += _HOUR
+        return 1.0 - absent
+
+    def idle_delay(self) -> "tuple[float, float | None]":
+        """
+        Idle delay scaled by the chance of players returning within the horizon, the configured one without
+        a forecast.
+
+        :return: delay in seconds and the chance it is based on
+        """
+        delay = config.minecraft.idle_suspend_delay
+        if not config.minecraft.activity_forecast:
+            return delay, None
+        chance = self.chance(datetime.now(UTC), config.minecraft.idle_return_horizon)
+        if chance is None:
+            return delay, None
+        low, high = config.minecraft.idle_delay_min_factor, config.minecraft.idle_delay_max_factor
+        return delay * (low + (high - low) * chance), chance
+
+    def _schedule(self) -> None:
+        # Each hour is checked prewarm_lead before it starts
+        lead = timedelta(seconds=config.minecraft.prewarm_lead)
+        now = datetime.now(UTC)
+        hour = _hour_start(now) + _HOUR
+        while hour - lead <= now:
+            hour += _HOUR
+
+        async def check() -> None:
+            await self._check(hour)
+
+        self._timer = self.server.timers.call_at(hour - lead, check, name=f"prewarm:{self.server.name}")
+
+    async def _check(self, hour: datetime) -> None:
+        self._timer = None
+        self._schedule()
+        await self.refresh()
+        probability = self.probability(hour)
+        if probability is None or probability < config.minecraft.prewarm_threshold:
+            return
+        state = self.server.state()
+        if state == "running" or self._prewarmed == hour:
+            return
+        self._prewarmed = hour
+        minutes = max(math.ceil((hour - datetime.now(UTC)).total_seconds() / 60), 0)
+        reason = f"🔮 Через {minutes} мин обычно приходят игроки (вероятность {probability:.0%})"
+        if state == "hibernated":
+            await self.server.resume()
+            self._launches.labels(self.server.name, "resumed").inc()
+            await self.server.send_message_to_telegram_console(f"{reason}, сервер разбужен заранее.")
+            return
+        await self.server.send_message_to_telegram_console(f"{reason}, сервер запускается заранее...")
+        self._launches.labels(self.server.name, "launched").inc()
+        ready = await self.server.launch_and_wait()
+        if ready is not None:
+            await self.server.send_message_to_telegram_console(f"✅ Сервер запущен за {ready.seconds:.1f} с.")
+        else:
+            await self.server.send_message_to_telegram_console("⚠️ Сервер не сообщил о завершении запуска.")
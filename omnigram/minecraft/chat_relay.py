@@ -0,0 +1,194 @@
+import asyncio
+import json
+import re
+import zlib
+from collections import deque
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+from omnigram.config import config
+from omnigram.metrics import metrics
+
+if TYPE_CHECKING:
+    from asyncio import Task
+
+    from .minecraft_server import MinecraftServer
+
+# Readable on the chat background, picked by the name so a user keeps a color
+_NAME_COLORS = ("gold", "yellow", "green", "aqua", "light_purple", "red", "blue", "dark_aqua", "dark_green")
+# Formatting codes and control characters other than the line break
+_UNSAFE = re.compile(r"§.?|[\x00-\x09\x0b-\x1f\x7f]")
+_NAME_LIMIT = 32
+_EXCERPT_LIMIT = 40
+# Below this the text of an oversized message is not shortened any further
+_MIN_TEXT = 16
+
+
+@dataclass(frozen=True, slots=True)
+class RelayMessage:
+    user: str
+    text: str = ""
+    # Author and text of the message replied to
+    reply_to: str | None = None
+    reply_text: str = ""
+    # Placeholder of a sticker, photo or other media, the caption being the text
+    attachment: str | None = None
+
+
+def _clean(text: str, limit: int) -> str:
+    text = _UNSAFE.sub("", text).strip()
+    return text if len(text) <= limit else f"{text[: limit - 1].rstrip()}…"
+
+
+def message_components(message: "RelayMessage", limit: int) -> "list[dict[str, Any]]":
+    """
+    JSON text components of one chat line: "<name> ↪ reply [attachment] text".
+
+    :param message: relayed message
+    :param limit: characters of the text kept
+    :return: components
+    """
+    user = _clean(message.user, _NAME_LIMIT) or "?"
+    components: "list[dict[str, Any]]" = [
+        {"text": "<"},
+        {"text": user, "color": _NAME_COLORS[zlib.crc32(user.encode()) % len(_NAME_COLORS)]},
+        {"text": "> "},
+    ]
+    if message.reply_to is not None:
+        excerpt = _clean(message.reply_text, _EXCERPT_LIMIT)
+        reply = f"↪ {_clean(message.reply_to, _NAME_LIMIT)}{f': {excerpt}' if excerpt else ''} "
+        components.append({"text": reply, "color": "gray", "italic": True})
+    text = _clean(message.text, limit)
+    if message.attachment is not None:
+        attachment = f"[{_clean(message.attachment, _NAME_LIMIT)}]"
+        components.append({"text": f"{attachment} " if text else attachment, "color": "aqua"})
+    if text:
+        components.append({"text": text})
+    return components
+
+
+def tellraw(lines: "list[list[dict[str, Any]]]") -> str:
+    """
+    One tellraw command showing the lines to every player. json.dumps escapes quotes, backslashes and line
+    breaks, so no text can end the command early.
+
+    :param lines: components of each line
+    :return: console command
+    """
+    # Later array elements inherit the style of the first, the empty string keeps them unstyled
+    components: "list[Any]" = [""]
+    for number, line in enumerate(lines):
+        if number:
+            components.append({"text": "\n"})
+        components.extend(line)
+    return f"tellraw @a {json.dumps(components, ensure_ascii=False, separators=(',', ':'))}"
+
+
+class ChatRelay:
+    """
+    Telegram to game chat of one server: a bounded queue drained by one worker, messages arriving within a short
+    window are written as one multi-line tellraw. Messages past the queue size are dropped and counted, players
+    see how many were missed.
+    """
+
+    _task: "Task | None" = None
+
+    def __init__(
+        self,
+        server: "MinecraftServer",
+        queue_size: int | None = None,
+        coalesce_window: float | None = None,
+        command_limit: int | None = None,
+        message_limit: int | None = None,
+    ) -> None:
+        self.server = server
+        self.queue_size = queue_size or config.minecraft.relay_queue_size
+        self.coalesce_window = (
+            coalesce_window if coalesce_window is not None else config.minecraft.relay_coalesce_window
+        )
+        self.command_limit = command_limit or config.minecraft.relay_command_limit
+        self.message_limit = message_limit or config.minecraft.relay_message_limit
+        self._queue: "deque[RelayMessage]" = deque()
+        self._wakeup = asyncio.Event()
+        # Dropped since the last write, told to the players with the next one
+        self._dropped = 0
+        self._messages = metrics.relay_messages
+        self._commands = metrics.relay_commands.labels(server.name)
+        metrics.relay_queue_depth.labels(server.name).set_function(lambda: len(self._queue))
+
+    @property
+    def pending(self) -> int:
+        return len(self._queue)
+
+    def offer(self, message: "RelayMessage") -> bool:
+        """
+        Queueing a message, never waits on the server.
+
+        :param message: relayed message
+        :return: False when the queue is full and the message was dropped
+        """
+        if len(self._queue) >= self.queue_size:
+            self._dropped += 1
+            self._messages.labels(self.server.name, "dropped").inc()
+            return False
+        self._queue.append(message)
+        self._wakeup.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._worker())
+        return True
+
+    async def stop(self) -> None:
+        """
+        Stopping the worker, queued messages are discarded.
+
+        :return: None
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._queue.clear()
+        self._dropped = 0
+
+    async def _worker(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            await asyncio.sleep(self.coalesce_window)
+            self._wakeup.clear()
+            while self._queue:
+                count, command = self._take()
+                try:
+                    sent = await self.server.send_command(command)
+                except Exception as e:
+                    print(f"[{self.server.name}] Chat relay:", e)
+                    sent = False
+                self._messages.labels(self.server.name, "relayed" if sent else "failed").inc(count)
+                if sent:
+                    self._commands.inc()
+
+    def _take(self) -> "tuple[int, str]":
+        lines: "list[list[dict[str, Any]]]" = []
+        if self._dropped:
+            lines.append([{"text": f"… пропущено сообщений из Telegram: {self._dropped}", "color": "gray"}])
+            self._dropped = 0
+        count = 0
+        while self._queue:
+            line = self._fit(self._queue[0])
+            if lines and len(tellraw([*lines, line]).encode()) > self.command_limit:
+                break
+            self._queue.popleft()
+            lines.append(line)
+            count += 1
+        return count, tellraw(lines)
+
+    def _fit(self, message: "RelayMessage") -> "list[dict[str, Any]]":
+        # A single message past the command limit is shortened until it fits
+        limit = self.message_limit
+        line = message_components(message, limit)
+        while limit > _MIN_TEXT and len(tellraw([line]).encode()) > self.command_limit:
+            limit //= 2
+            line = message_components(message, limit)
+        return line
@@ -0,0 +1,82 @@
+import asyncio
+from typing import TYPE_CHECKING, Any, TypeVar
+
+if TYPE_CHECKING:
+    from asyncio import Future
+    from collections.abc import Callable
+
+    from .log_parser import Event
+
+E = TypeVar("E")
+
+
+class EventWaiter:
+    """
+    Correlates commands with the log events answering them: every expectation is a future
+    resolved by the first matching parsed event
+    """
+
+    def __init__(self) -> None:
+        self._waiters: "list[tuple[type, Callable[[Any], bool] | None, Future[Any]]]" = []
+
+    def expect(self, event_type: "type[E]", predicate: "Callable[[E], bool] | None" = None) -> "Future[E]":
+        """
+        Registering an expectation, must be done before the command is sent.
+
+        :param event_type: expected event class
+        :param predicate: optional extra condition on the event
+        :return: future resolved with the event
+        """
+        future: "Future[E]" = asyncio.get_running_loop().create_future()
+        self._waiters.append((event_type, predicate, future))
+        return future
+
+    async def wait(self, future: "Future[E]", timeout: float) -> "E | None":
+        """
+        Waiting for an expectation to resolve.
+
+        :param future: future returned by expect
+        :param timeout: seconds to wait
+        :return: the event or None on timeout or cancellation
+        """
+        try:
+            return await asyncio.wait_for(future, timeout=timeout)
+        except TimeoutError:
+            return None
+        except asyncio.CancelledError:
+            task = asyncio.current_task()
+            if task is not None and task.cancelling():
+                raise
+            return None
+        finally:
+            future.cancel()
+
+    def resolve(self, event: "Event") -> None:
+        """
+        Resolving every pending expectation matched by the event.
+
+        :param event: parsed log event
+        :return: None
+        """
+        if not self._waiters:
+            return
+        pending = []
+        for waiter in self._waiters:
+            event_type, predicate, future = waiter
+            if future.done():
+                continue
+            if isinstance(event, event_type) and (predicate is None or predicate(event)):
+                future.set_result(event)
+            else:
+                pending.append(waiter)
+        self._waiters = pending
+
+    def cancel_all(self) -> None:
+        """
+        Cancelling every pending expectation, e.g. when the server process exits.
+
+        :return: None
+        """
+        for _, _, future in self._waiters:
+            future.cancel()
+        self._waiters = []
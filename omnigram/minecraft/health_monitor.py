@@ -0,0 +1,275 @@
+import asyncio
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from omnigram.config import config
+from omnigram.metrics import metrics
+
+from .log_parser import MsptEvent, TpsEvent
+
+if TYPE_CHECKING:
+    from asyncio import Task
+    from collections.abc import Callable
+
+    from .log_parser import TpsWarningEvent
+    from .minecraft_server import MinecraftServer
+
+
+@dataclass(frozen=True, slots=True)
+class HealthSample:
+    # time.monotonic() of the sample
+    at: float
+    tps: float | None
+    mspt: float | None
+    # Lag reported by "Can't keep up!" lines since the previous sample
+    lag_ms: int
+    cpu_percent: float | None
+    memory_bytes: int | None
+
+
+@dataclass(frozen=True, slots=True)
+class _Check:
+    label: str
+    breached: "Callable[[HealthSample], bool | None]"
+    describe: "Callable[[HealthSample], str]"
+
+
+def _below(value: float | None, threshold: float) -> bool | None:
+    return value < threshold if value is not None and threshold > 0 else None
+
+
+def _above(value: float | None, threshold: float) -> bool | None:
+    return value >= threshold if value is not None and threshold > 0 else None
+
+
+_CHECKS: "dict[str, _Check]" = {
+    "tps": _Check(
+        label="TPS",
+        breached=lambda sample: _below(sample.tps, config.minecraft.health_tps_alert),
+        describe=lambda sample: f"{sample.tps:.1f}",
+    ),
+    "mspt": _Check(
+        label="MSPT",
+        breached=lambda sample: _above(sample.mspt, config.minecraft.health_mspt_alert),
+        describe=lambda sample: f"{sample.mspt:.1f} мс",
+    ),
+    "lag": _Check(
+        label="Отставание",
+        breached=lambda sample: _above(sample.lag_ms, config.minecraft.health_lag_alert_ms),
+        describe=lambda sample: f"{sample.lag_ms / 1000:.1f} с",
+    ),
+    "cpu": _Check(
+        label="CPU",
+        breached=lambda sample: _above(sample.cpu_percent, config.minecraft.health_cpu_alert),
+        describe=lambda sample: f"{sample.cpu_percent:.0f}%",
+    ),
+    "memory": _Check(
+        label="Память",
+        breached=lambda sample: _above(
+            sample.memory_bytes / 2**20 if sample.memory_bytes is not None else None,
+            config.minecraft.health_memory_alert_mb,
+        ),
+        describe=lambda sample: f"{(sample.memory_bytes or 0) / 2**20:.0f} МБ",
+    ),
+}
+
+
+class HealthMonitor:
+    """
+    Rolling health history of one server: tick rate from "Can't keep up!" lines and Paper-style tps/mspt queries,
+    CPU and memory of the server process tree from /proc. Thresholds breached for a few samples in a row are
+    reported to the console topic, and so is the recovery.
+    """
+
+    _task: "Task | None" = None
+    # Previous CPU reading, (time.monotonic(), CPU seconds) of the process tree
+    _cpu: "tuple[float, float] | None" = None
+    # Whether tps/mspt are queried, disabled for the run when the server never answers them
+    tick_queries: bool = False
+    _tick_answered: bool = False
+
+    def __init__(self, server: "MinecraftServer", interval: float | None = None, history: int | None = None) -> None:
+        self.server = server
+        self.interval = interval or config.minecraft.health_interval
+        self.samples: "deque[HealthSample]" = deque(maxlen=history or config.minecraft.health_history)
+        self.alerts: "set[str]" = set()
+        self._lag_ms = 0
+        self._tps = metrics.server_tps.labels(server.name)
+        self._mspt = metrics.server_mspt.labels(server.name)
+        self._lag_ticks = metrics.server_lag_ticks.labels(server.name)
+        self._cpu_percent = metrics.server_cpu_percent.labels(server.name)
+        self._memory = metrics.server_memory_bytes.labels(server.name)
+        self.reset(tick_queries=config.minecraft.health_tick_queries)
+
+    async def start(self) -> None:
+        """
+        Starting the periodic sampling, servers not running are skipped.
+
+        :return: None
+        """
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        """
+        Stopping the periodic sampling.
+
+        :return: None
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def reset(self, tick_queries: bool) -> None:
+        """
+        Starting over after the server started or stopped, the history is kept.
+
+        :param tick_queries: whether the server is ready to answer tps/mspt queries
+        :return: None
+        """
+        self._cpu = None
+        self._lag_ms = 0
+        self.alerts.clear()
+        self.tick_queries = tick_queries and config.minecraft.health_tick_queries
+        self._tick_answered = False
+
+    @property
+    def alert_labels(self) -> "list[str]":
+        return [check.label for key, check in _CHECKS.items() if key in self.alerts]
+
+    def overloaded(self, event: "TpsWarningEvent") -> None:
+        """
+        Counting a "Can't keep up!" warning into the next sample.
+
+        :param event: parsed warning
+        :return: None
+        """
+        self._lag_ms += event.behind_ms
+        self._lag_ticks.inc(event.behind_ticks)
+
+    def window(self, seconds: float) -> "list[HealthSample]":
+        """
+        Samples of the last seconds, oldest first.
+
+        :param seconds: length of the window
+        :return: samples
+        """
+        since = time.monotonic() - seconds
+        return [sample for sample in self.samples if sample.at >= since]
+
+    async def sample(self) -> "HealthSample":
+        """
+        Taking a sample and adding it to the history.
+
+        :return: the sample
+        """
+        tps, mspt = await self._query_ticks()
+        pid = self.server.pid
+        usage = await asyncio.to_thread(_process_usage, pid) if pid is not None else None
+        now = time.monotonic()
+        cpu_percent = memory_bytes = None
+        if usage is not None:
+            cpu_seconds, memory_bytes = usage
+            if self._cpu is not None and now > self._cpu[0]:
+                cpu_percent = max(cpu_seconds - self._cpu[1], 0.0) / (now - self._cpu[0]) * 100
+            self._cpu = (now, cpu_seconds)
+        sample = HealthSample(
+            at=now, tps=tps, mspt=mspt, lag_ms=self._lag_ms, cpu_percent=cpu_percent, memory_bytes=memory_bytes
+        )
+        self._lag_ms = 0
+        self.samples.append(sample)
+        for gauge, value in (
+            (self._tps, tps),
+            (self._mspt, mspt),
+            (self._cpu_percent, cpu_percent),
+            (self._memory, memory_bytes),
+        ):
+            if value is not None:
+                gauge.set(value)
+        return sample
+
+    async def _query_ticks(self) -> "tuple[float | None, float | None]":
+        if not self.tick_queries:
+            return None, None
+        tps = await self.server.request("tps", expect=TpsEvent)
+        if tps is None:
+            # A vanilla server has no such command, a lagging Paper server may just answer late
+            if not self._tick_answered:
+                self.tick_queries = False
+            return None, None
+        self._tick_answered = True
+        mspt = await self.server.request("mspt", expect=MsptEvent)
+        return tps.tps_1m, mspt.average if mspt is not None else None
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            if not self.server.status():
+                continue
+            try:
+                await self.sample()
+                await self._check()
+            except Exception as e:
+                print(f"[{self.server.name}] Health:", e)
+
+    async def _check(self) -> None:
+        count = config.minecraft.health_alert_samples
+        recent = list(self.samples)[-count:]
+        if len(recent) < count:
+            return
+        latest = recent[-1]
+        for key, check in _CHECKS.items():
+            states = [check.breached(sample) for sample in recent]
+            if key not in self.alerts and all(state is True for state in states):
+                self.alerts.add(key)
+                await self.server.send_message_to_telegram_console(
+                    f"⚠️ {check.label}: {check.describe(latest)}, проблема держится {count} замера подряд."
+                )
+            elif key in self.alerts and all(state is False for state in states):
+                self.alerts.discard(key)
+                await self.server.send_message_to_telegram_console(
+                    f"✅ {check.label} в норме: {check.describe(latest)}."
+                )
+
+
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _process_usage(pid: int) -> "tuple[float, int] | None":
+    """
+    CPU seconds and resident memory of a process and its descendants, the server runs under sudo and make.
+
+    :param pid: root process id
+    :return: CPU seconds and bytes, None when /proc is not available or the process is gone
+    """
+    pids = [pid]
+    cpu_ticks = rss_pages = 0
+    found = False
+    while pids:
+        current = pids.pop()
+        try:
+            with open(f"/proc/{current}/stat") as file:
+                # The command name may hold spaces and parentheses, the fields after it are plain
+                fields = file.read().rpartition(")")[2].split()
+        except OSError:
+            continue
+        found = True
+        cpu_ticks += int(fields[11]) + int(fields[12])
+        rss_pages += int(fields[21])
+        try:
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as file:
+                    pids.extend(int(child) for child in file.read().split())
+        except OSError:
+            continue
+    if not found:
+        return None
+    return cpu_ticks / _CLOCK_TICKS, rss_pages * _PAGE_SIZE
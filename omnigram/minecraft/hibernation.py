@@ -0,0 +1,219 @@
+import asyncio
+import os
+import signal
+import subprocess
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from omnigram.config import config
+from omnigram.metrics import metrics
+
+if TYPE_CHECKING:
+    from asyncio import Task
+    from collections.abc import Awaitable, Callable
+
+    from .minecraft_server import MinecraftServer
+
+# /proc/net/tcp states of a connection attempt: established and SYN received
+_CONNECTING = {"01", "03"}
+_FREEZER_TIMEOUT = 5.0
+
+
+class Hibernation:
+    """
+    Freezing an idle server instead of stopping it: the process keeps the loaded world in memory and a resume
+    takes no cold start. The cgroup v2 freezer is used when the server runs in a cgroup the bot may write,
+    SIGSTOP on the process tree otherwise. The listening socket of a frozen server stays open and the kernel
+    still completes handshakes on it, so a connection attempt shows up in /proc/net/tcp and wakes the server.
+    """
+
+    # time.monotonic() of the freeze
+    frozen_at: float | None = None
+    _watch_task: "Task | None" = None
+
+    def __init__(
+        self,
+        server: "MinecraftServer",
+        woken: "Callable[[], Awaitable[None]]",
+        cgroup: str | None = None,
+        port: int | None = None,
+        poll_interval: float | None = None,
+    ) -> None:
+        self.server = server
+        self.woken = woken
+        cgroup = cgroup or server.settings.hibernate_cgroup
+        self.cgroup = Path(cgroup) if cgroup else None
+        self.port = port or server.settings.game_port
+        self.poll_interval = poll_interval or config.minecraft.hibernate_poll_interval
+        self._pids: "list[int]" = []
+        metrics.server_hibernated.labels(server.name).set_function(lambda: float(self.hibernated))
+
+    @property
+    def hibernated(self) -> bool:
+        return self.frozen_at is not None
+
+    def seconds(self) -> float:
+        return time.monotonic() - self.frozen_at if self.frozen_at is not None else 0.0
+
+    async def freeze(self) -> None:
+        """
+        Freezing the server processes and watching the game port for connection attempts.
+
+        :return: None
+        :raises RuntimeError: when the server is not running or could not be frozen
+        """
+        pid = self.server.pid
+        if pid is None:
+            raise RuntimeError("the server is not running")
+        if self.hibernated:
+            return
+        # Connections open before the freeze are not attempts to wake the server
+        known = await asyncio.to_thread(_connections, self.port)
+        if self.cgroup is not None:
+            try:
+                await self._set_frozen(True)
+            except BaseException:
+                await self._set_frozen(False)
+                raise
+        else:
+            self._pids = await asyncio.to_thread(process_tree, pid)
+            # Leaves first, so no parent notices a stopped child while still running
+            await signal_processes(list(reversed(self._pids)), signal.SIGSTOP)
+        self.frozen_at = time.monotonic()
+        self._watch_task = asyncio.create_task(self._watch(known))
+
+    async def thaw(self) -> float:
+        """
+        Letting the server processes continue.
+
+        :return: seconds the server was frozen
+        """
+        if self.frozen_at is None:
+            return 0.0
+        self._stop_watch()
+        if self.cgroup is not None:
+            await self._set_frozen(False)
+        else:
+            await signal_processes(self._pids, signal.SIGCONT)
+        seconds = self.seconds()
+        self.forget()
+        return seconds
+
+    def forget(self) -> None:
+        """
+        Dropping the state after the server process exited.
+
+        :return: None
+        """
+        self._stop_watch()
+        self.frozen_at = None
+        self._pids = []
+
+    def _stop_watch(self) -> None:
+        # The watcher itself wakes the server through thaw(), it is not cancelled from within
+        if self._watch_task is not None and self._watch_task is not asyncio.current_task():
+            self._watch_task.cancel()
+        self._watch_task = None
+
+    async def _set_frozen(self, frozen: bool) -> None:
+        assert self.cgroup is not None
+        await asyncio.to_thread((self.cgroup / "cgroup.freeze").write_text, "1" if frozen else "0")
+        # The freezer works asynchronously, cgroup.events tells when it is done
+        deadline = time.monotonic() + _FREEZER_TIMEOUT
+        while f"frozen {int(frozen)}" not in (await asyncio.to_thread((self.cgroup / "cgroup.events").read_text)):
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"{self.cgroup} did not {'freeze' if frozen else 'thaw'} in time")
+            await asyncio.sleep(0.05)
+
+    async def _watch(self, known: "set[str]") -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                attempts = await asyncio.to_thread(_connections, self.port) - known
+            except OSError as e:
+                print(f"[{self.server.name}] Hibernation:", e)
+                continue
+            if attempts:
+                break
+        try:
+            await self.woken()
+        except Exception as e:
+            print(f"[{self.server.name}] Hibernation:", e)
+
+
+def process_tree(pid: int) -> "list[int]":
+    """
+    A process and its descendants, parents before children.
+
+    :param pid: root process id
+    :return: process ids
+    """
+    tree = []
+    pending = [pid]
+    while pending:
+        current = pending.pop(0)
+        tree.append(current)
+        try:
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as file:
+                    pending.extend(int(child) for child in file.read().split())
+        except OSError:
+            continue
+    return tree
+
+
+async def signal_processes(pids: "list[int]", stage: "signal.Signals") -> None:
+    """
+    Signalling processes in the given order. Processes of another user, e.g. root under sudo, are signalled
+    through sudo like the server is spawned: from the first of them on, the rest go in order through one sudo kill.
+
+    :param pids: process ids in signalling order
+    :param stage: signal to send
+    :return: None
+    :raises RuntimeError: when sudo kill fails
+    """
+    for index, pid in enumerate(pids):
+        try:
+            os.kill(pid, stage)
+        except ProcessLookupError:
+            continue
+        except PermissionError:
+            denied = pids[index:]
+            break
+    else:
+        return
+    process = await asyncio.create_subprocess_exec(
+        "sudo",
+        "-S",
+        "kill",
+        f"-{stage.name.removeprefix('SIG')}",
+        *(str(pid) for pid in denied),
+        stdin=subprocess.PIPE,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    await process.communicate(f"{config.admin.sudo}\n".encode())
+    if process.returncode:
+        raise RuntimeError(f"sudo kill -{stage.name} exited with {process.returncode}")
+
+
+def _connections(port: int) -> "set[str]":
+    """
+    Remote ends of connections being opened or open to a local port.
+
+    :param port: local TCP port
+    :return: remote "address:port" in /proc/net/tcp notation
+    """
+    found = set()
+    for table in ("/proc/net/tcp", "/proc/net/tcp6"):
+        try:
+            with open(table) as file:
+                rows = file.read().splitlines()[1:]
+        except FileNotFoundError:
+            continue
+        for row in rows:
+            fields = row.split()
+            if len(fields) > 3 and fields[3] in _CONNECTING and int(fields[1].rpartition(":")[2], 16) == port:
+                found.add(fields[2])
+    return found
@@ -0,0 +1,301 @@
+import gzip
+import os
+import re
+import struct
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, BinaryIO
+
+from omnigram.config import config
+from omnigram.metrics import metrics
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+_SEGMENT = re.compile(r"\d{8}-\d{6}(?:-\d+)?")
+_DATA = ".log.gz"
+_INDEX = ".idx"
+# Per block: first and last line time, offset and compressed length in the segment, line count
+_RECORD = struct.Struct("<ddQII")
+
+
+@dataclass(frozen=True, slots=True)
+class ArchivedLine:
+    at: datetime
+    line: str
+
+
+@dataclass(frozen=True, slots=True)
+class _Block:
+    first: float
+    last: float
+    offset: int
+    length: int
+    lines: int
+
+
+class LogArchive:
+    """
+    Compressed archive of the server output. Lines are written by a background thread in blocks, each block an
+    independent gzip member, so a segment is a plain .gz file for zcat and a query decompresses only the blocks
+    whose time range, kept in a sidecar index, overlaps the requested one. Segments rotate by size and the oldest
+    are removed once the archive outgrows its limit.
+    """
+
+    _thread: "threading.Thread | None" = None
+    _segment: "BinaryIO | None" = None
+    _index: "BinaryIO | None" = None
+    _segment_name: str = ""
+    _stopping: bool = False
+
+    def __init__(
+        self,
+        server: str,
+        root: "Path",
+        block_size: int | None = None,
+        flush_interval: float | None = None,
+        segment_size: int | None = None,
+        max_size: int | None = None,
+        queue_size: int | None = None,
+    ) -> None:
+        self.server = server
+        self.root = root
+        self.block_size = block_size or config.minecraft.log_archive_block_kb * 1024
+        self.flush_interval = flush_interval or config.minecraft.log_archive_flush_interval
+        self.segment_size = segment_size or config.minecraft.log_archive_segment_mb * 2**20
+        self.max_size = max_size or config.minecraft.log_archive_max_mb * 2**20
+        self.queue_size = queue_size or config.minecraft.log_archive_queue_size
+        # Appended by the event loop and drained by the writer thread, both atomic, the thread is woken
+        # only when the queue stops being empty
+        self._queue: "deque[tuple[float, str]]" = deque()
+        self._wakeup = threading.Event()
+        # Timestamp text of the current second, (second, "2024-05-01T12:00:00", "+03:00")
+        self._stamp: "tuple[int, str, str]" = (-1, "", "")
+        self._lines = metrics.log_archive_lines
+        self._bytes = metrics.log_archive_bytes.labels(server)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """
+        Starting the writer thread, it appends to the newest segment unless that one is full.
+
+        :return: None
+        """
+        if self.running:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name=f"log-archive-{self.server}", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Writing the lines still queued and stopping the writer thread, blocks until it is done.
+
+        :return: None
+        """
+        thread = self._thread
+        if thread is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        thread.join()
+        self._thread = None
+        self._queue.clear()
+
+    def write(self, line: str, at: float | None = None) -> None:
+        """
+        Queueing a line for the archive, never blocks: a line is dropped and counted when the writer falls behind.
+
+        :param line: output line
+        :param at: time.time() of the line, now by default
+        :return: None
+        """
+        if self._thread is None:
+            return
+        if len(self._queue) >= self.queue_size:
+            self._lines.labels(self.server, "dropped").inc()
+            return
+        self._queue.append((at if at is not None else time.time(), line))
+        if len(self._queue) == 1:
+            self._wakeup.set()
+
+    def segments(self) -> "list[str]":
+        """
+        Names of the segments, oldest first.
+
+        :return: segment names
+        """
+        if not self.root.is_dir():
+            return []
+        return sorted(
+            entry.name.removesuffix(_DATA)
+            for entry in self.root.iterdir()
+            if entry.name.endswith(_DATA) and _SEGMENT.fullmatch(entry.name.removesuffix(_DATA))
+        )
+
+    def query(
+        self, since: datetime, until: datetime, pattern: str | None = None, limit: int | None = None
+    ) -> "list[ArchivedLine]":
+        """
+        Archived lines of a time range, oldest first. Blocking, run it in a thread.
+
+        :param since: aware start of the range
+        :param until: aware end of the range
+        :param pattern: case-insensitive regular expression the lines must contain
+        :param limit: most lines returned
+        :return: matching lines
+        :raises re.error: on an invalid pattern
+        """
+        regex = re.compile(pattern, re.IGNORECASE) if pattern else None
+        start, end = since.timestamp(), until.timestamp()
+        found: "list[ArchivedLine]" = []
+        for name in self.segments():
+            for text in self._read_blocks(name, start, end):
+                for row in text.splitlines():
+                    stamp, _, line = row.partition("\t")
+                    try:
+                        at = datetime.fromisoformat(stamp)
+                    except ValueError:
+                        continue
+                    if not start <= at.timestamp() <= end or (regex is not None and not regex.search(line)):
+                        continue
+                    found.append(ArchivedLine(at=at, line=line))
+                    if limit is not None and len(found) >= limit:
+                        return found
+        return found
+
+    def _read_blocks(self, name: str, start: float, end: float) -> "Iterator[str]":
+        try:
+            index = (self.root / f"{name}{_INDEX}").read_bytes()
+            segment = open(self.root / f"{name}{_DATA}", "rb")
+        except FileNotFoundError:
+            # Removed by the retention meanwhile
+            return
+        with segment:
+            # A record cut short by a crash or a concurrent write is ignored
+            usable = len(index) - len(index) % _RECORD.size
+            for record in _RECORD.iter_unpack(index[:usable]):
+                block = _Block(*record)
+                if block.last < start or block.first > end:
+                    continue
+                segment.seek(block.offset)
+                data = segment.read(block.length)
+                if len(data) < block.length:
+                    continue
+                yield gzip.decompress(data).decode(errors="replace")
+
+    def _run(self) -> None:
+        try:
+            self._open()
+        except OSError as e:
+            print(f"[{self.server}] Log archive:", e)
+            self._thread = None
+            return
+        rows: "list[str]" = []
+        first = last = 0.0
+        size = 0
+        deadline = 0.0
+        while True:
+            self._wakeup.clear()
+            while self._queue:
+                at, line = self._queue.popleft()
+                if not rows:
+                    first = at
+                    deadline = time.monotonic() + self.flush_interval
+                row = f"{self._format_time(at)}\t{line}\n"
+                rows.append(row)
+                last = at
+                size += len(row)
+                if size >= self.block_size:
+                    self._write_block(rows, first, last)
+                    rows, size = [], 0
+            if self._stopping:
+                break
+            if rows and time.monotonic() >= deadline:
+                # Lines become queryable at most flush_interval after they were read
+                self._write_block(rows, first, last)
+                rows, size = [], 0
+                continue
+            self._wakeup.wait(max(deadline - time.monotonic(), 0.0) if rows else None)
+        if rows:
+            self._write_block(rows, first, last)
+        self._close()
+
+    def _format_time(self, at: float) -> str:
+        # Local ISO time with milliseconds, formatted once per second
+        second = int(at)
+        if second != self._stamp[0]:
+            text = datetime.fromtimestamp(second, UTC).astimezone().isoformat()
+            self._stamp = (second, text[:19], text[19:])
+        return f"{self._stamp[1]}.{int((at - second) * 1000):03d}{self._stamp[2]}"
+
+    def _write_block(self, rows: "list[str]", first: float, last: float) -> None:
+        try:
+            assert self._segment is not None and self._index is not None
+            data = gzip.compress("".join(rows).encode(), compresslevel=6, mtime=0)
+            offset = self._segment.tell()
+            self._segment.write(data)
+            # The data is on disk before the index points at it
+            self._segment.flush()
+            self._index.write(_RECORD.pack(first, last, offset, len(data), len(rows)))
+            self._index.flush()
+            self._lines.labels(self.server, "archived").inc(len(rows))
+            self._bytes.inc(len(data) + _RECORD.size)
+            if offset + len(data) >= self.segment_size:
+                self._close()
+                self._open(rotate=True)
+        except OSError as e:
+            print(f"[{self.server}] Log archive:", e)
+            self._lines.labels(self.server, "dropped").inc(len(rows))
+
+    def _open(self, rotate: bool = False) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        existing = self.segments()
+        name = existing[-1] if existing and not rotate else ""
+        if not name or (self.root / f"{name}{_DATA}").stat().st_size >= self.segment_size:
+            name = stamp = datetime.now(UTC).strftime("%Y%m%d-%H%M%S")
+            suffix = 0
+            while name in existing:
+                suffix += 1
+                name = f"{stamp}-{suffix}"
+        self._segment_name = name
+        self._segment = open(self.root / f"{name}{_DATA}", "ab")
+        self._index = open(self.root / f"{name}{_INDEX}", "ab")
+        # A crash between the data and the index leaves a tail no index record points at, left as it is
+        self._apply_retention()
+
+    def _close(self) -> None:
+        for file in (self._segment, self._index):
+            if file is not None:
+                file.close()
+        self._segment = self._index = None
+
+    def _apply_retention(self) -> None:
+        sizes = {name: self._size(name) for name in self.segments()}
+        total = sum(sizes.values())
+        for name, size in sizes.items():
+            if total <= self.max_size or name == self._segment_name:
+                break
+            for suffix in (_DATA, _INDEX):
+                try:
+                    os.unlink(self.root / f"{name}{suffix}")
+                except FileNotFoundError:
+                    pass
+            total -= size
+        self._bytes.set(total)
+
+    def _size(self, name: str) -> int:
+        size = 0
+        for suffix in (_DATA, _INDEX):
+            try:
+                size += (self.root / f"{name}{suffix}").stat().st_size
+            except FileNotFoundError:
+                pass
+        return size
@@ -0,0 +1,162 @@
+import re
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+
+@dataclass(frozen=True, slots=True)
+class ChatEvent:
+    player: str
+    text: str
+
+
+@dataclass(frozen=True, slots=True)
+class JoinEvent:
+    player: str
+
+
+@dataclass(frozen=True, slots=True)
+class LeaveEvent:
+    player: str
+
+
+@dataclass(frozen=True, slots=True)
+class ListEvent:
+    online: int
+    max_players: int
+    players: tuple[str, ...]
+
+
+@dataclass(frozen=True, slots=True)
+class ServerEmptyEvent:
+    seconds: int
+
+
+@dataclass(frozen=True, slots=True)
+class DoneEvent:
+    seconds: float
+
+
+@dataclass(frozen=True, slots=True)
+class TpsWarningEvent:
+    behind_ms: int
+    behind_ticks: int
+
+
+@dataclass(frozen=True, slots=True)
+class SavedEvent:
+    pass
+
+
+@dataclass(frozen=True, slots=True)
+class TpsEvent:
+    tps_1m: float
+    tps_5m: float
+    tps_15m: float
+
+
+@dataclass(frozen=True, slots=True)
+class MsptEvent:
+    average: float
+    minimum: float
+    maximum: float
+
+
+Event = (
+    ChatEvent
+    | JoinEvent
+    | LeaveEvent
+    | ListEvent
+    | ServerEmptyEvent
+    | DoneEvent
+    | TpsWarningEvent
+    | TpsEvent
+    | MsptEvent
+    | SavedEvent
+)
+
+# Paper colors the tps and mspt replies with section sign codes, "*" marks a TPS capped at 20
+_C = r"(?:§.|\*)*"
+
+_EVENTS = (
+    r"(?P<chat>(?:\[Not Secure\] )?<(?P<chat_player>[^>\s]+)> (?P<chat_text>.*))"
+    r"|(?P<join>(?P<join_player>\S+?)\[[^\]]*\] logged in with entity id)"
+    r"|(?P<leave>(?P<leave_player>\S+) left the game)"
+    r"|(?P<list>There are (?P<list_online>\d+) of a max of (?P<list_max>\d+) players online:(?P<list_players>.*))"
+    r"|(?P<empty>Server empty for (?P<empty_seconds>\d+) seconds, pausing)"
+    r"|(?P<done>Done \((?P<done_seconds>[\d.]+)s\)!)"
+    r"|(?P<overload>Can't keep up! Is the server overloaded\? "
+    r"Running (?P<overload_ms>\d+)ms or (?P<overload_ticks>\d+) ticks behind)"
+    r"|(?P<saved>Saved the game)"
+    rf"|(?P<tps>{_C}TPS from last 1m, 5m, 15m: {_C}(?P<tps_1m>[\d.]+){_C}, {_C}(?P<tps_5m>[\d.]+){_C}, "
+    rf"{_C}(?P<tps_15m>[\d.]+))"
+    # The mspt reply is a header line and a line per period, the log shows them as separate lines
+    rf"|(?P<mspt>(?:{_C}Server tick times.*\n)?{_C}◴ {_C}(?P<mspt_avg>[\d.]+){_C}/{_C}(?P<mspt_min>[\d.]+){_C}/"
+    rf"{_C}(?P<mspt_max>[\d.]+))"
+)
+# Every server line looks like "[12:00:00] [Server thread/INFO]: <message>" (modded servers add more
+# bracketed prefixes), so the alternatives are anchored right after the first "]: " of the line.
+_PATTERN = re.compile(rf"\]: (?:{_EVENTS})")
+# Command replies received over RCON come without the log prefix.
+_REPLY_PATTERN = re.compile(rf"(?:{_EVENTS})")
+
+
+def _players(value: str) -> tuple[str, ...]:
+    return tuple(player for player in (item.strip() for item in value.split(",")) if player)
+
+
+_BUILDERS: "dict[str, Callable[[re.Match[str]], Event]]" = {
+    "chat": lambda match: ChatEvent(player=match["chat_player"], text=match["chat_text"]),
+    "join": lambda match: JoinEvent(player=match["join_player"]),
+    "leave": lambda match: LeaveEvent(player=match["leave_player"]),
+    "list": lambda match: ListEvent(
+        online=int(match["list_online"]),
+        max_players=int(match["list_max"]),
+        players=_players(match["list_players"]),
+    ),
+    "empty": lambda match: ServerEmptyEvent(seconds=int(match["empty_seconds"])),
+    "done": lambda match: DoneEvent(seconds=float(match["done_seconds"])),
+    "overload": lambda match: TpsWarningEvent(
+        behind_ms=int(match["overload_ms"]),
+        behind_ticks=int(match["overload_ticks"]),
+    ),
+    "saved": lambda match: SavedEvent(),
+    "tps": lambda match: TpsEvent(
+        tps_1m=float(match["tps_1m"]),
+        tps_5m=float(match["tps_5m"]),
+        tps_15m=float(match["tps_15m"]),
+    ),
+    "mspt": lambda match: MsptEvent(
+        average=float(match["mspt_avg"]),
+        minimum=float(match["mspt_min"]),
+        maximum=float(match["mspt_max"]),
+    ),
+}
+
+
+def parse_line(line: str) -> "Event | None":
+    """
+    Parsing a server log line into a typed event in a single regex pass.
+
+    :param line: decoded log line
+    :return: parsed event or None for lines of no interest
+    """
+    return _build(_PATTERN.search(line))
+
+
+def parse_reply(reply: str) -> "Event | None":
+    """
+    Parsing a command reply received without the log prefix.
+
+    :param reply: reply text
+    :return: parsed event or None
+    """
+    return _build(_REPLY_PATTERN.match(reply))
+
+
+def _build(match: "re.Match[str] | None") -> "Event | None":
+    if match is None or match.lastgroup is None:
+        return None
+    return _BUILDERS[match.lastgroup](match)
@@ -0,0 +1,162 @@
+import asyncio
+from typing import TYPE_CHECKING
+
+from omnigram.config import config
+from omnigram.metrics import metrics
+
+from .log_parser import parse_line
+
+if TYPE_CHECKING:
+    from asyncio import Queue, StreamReader, Task
+    from collections.abc import Awaitable, Callable
+
+    from .log_parser import Event
+
+
+class LogReader:
+    """
+    Server output pipeline: supervised reader tasks drain the process pipes into a bounded queue, one consumer
+    handles the lines. Lines carrying an event are never dropped, plain console output is sampled and then
+    dropped when the consumer falls behind, so a slow consumer never stalls the server on a full pipe.
+    """
+
+    _consumer: "Task | None" = None
+
+    def __init__(
+        self,
+        server: str,
+        consume: "Callable[[str, Event | None], Awaitable[None]]",
+        report: "Callable[[str], Awaitable[None]]",
+        closed: "Callable[[], Awaitable[None]]",
+        queue_size: int | None = None,
+        low_watermark: float | None = None,
+        sample_every: int | None = None,
+        chunk_size: int | None = None,
+        max_restarts: int | None = None,
+    ) -> None:
+        self.server = server
+        self.consume = consume
+        self.report = report
+        self.closed = closed
+        self.queue_size = queue_size or config.minecraft.log_queue_size
+        self.low_watermark = int(self.queue_size * (low_watermark or config.minecraft.log_low_watermark))
+        self.sample_every = sample_every or config.minecraft.log_sample_every
+        self.chunk_size = chunk_size or config.minecraft.log_line_limit
+        self.max_restarts = max_restarts or config.minecraft.log_reader_restarts
+        self._queue: "Queue[tuple[str, Event | None] | None]" = asyncio.Queue(maxsize=self.queue_size)
+        self._readers: "set[Task]" = set()
+        self._open = 0
+        self._sampled = 0
+        self._lines = metrics.log_lines
+        self._dropped = metrics.log_lines_dropped
+        self._restarts = metrics.log_reader_restarts
+        metrics.log_queue_depth.labels(server).set_function(self._queue.qsize)
+
+    def start(self, *streams: "tuple[str, StreamReader]") -> None:
+        """
+        Reading the named streams, e.g. ("stdout", process.stdout), until they all reach EOF.
+
+        :param streams: stream name and reader pairs
+        :return: None
+        """
+        for source, stream in streams:
+            self._open += 1
+            task = asyncio.create_task(self._supervise(source, stream))
+            self._readers.add(task)
+            task.add_done_callback(self._readers.discard)
+        if self._consumer is None or self._consumer.done():
+            self._consumer = asyncio.create_task(self._consume())
+
+    async def wait_closed(self) -> None:
+        """
+        Waiting until every stream reached EOF and every queued line is handled.
+
+        :return: None
+        """
+        if self._consumer is not None:
+            await asyncio.shield(self._consumer)
+
+    async def stop(self) -> None:
+        """
+        Cancelling the readers and the consumer, queued lines are discarded.
+
+        :return: None
+        """
+        tasks = [*self._readers, *([self._consumer] if self._consumer is not None else [])]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        self._open = 0
+
+    async def _supervise(self, source: str, stream: "StreamReader") -> None:
+        failures = 0
+        while True:
+            try:
+                await self._read(stream)
+                break
+            except Exception as e:
+                failures += 1
+                self._restarts.labels(self.server, source).inc()
+                if failures > self.max_restarts:
+                    await self.report(f"❌ Чтение {source} сервера остановлено после {failures} ошибок: {e!r}")
+                    break
+                attempt = f"{failures}/{self.max_restarts}"
+                await self.report(f"⚠️ Ошибка чтения {source} сервера: {e!r}, перезапуск {attempt}")
+                await asyncio.sleep(min(0.1 * 2**failures, 5.0))
+        await self._queue.put(None)
+
+    async def _read(self, stream: "StreamReader") -> None:
+        while True:
+            try:
+                line = await stream.readuntil(b"\n")
+            except asyncio.IncompleteReadError as e:
+                if e.partial:
+                    await self._offer(e.partial)
+                return
+            except asyncio.LimitOverrunError as e:
+                # A line longer than the stream limit, e.g. a giant stack trace: passed on in chunks
+                data = await stream.readexactly(e.consumed) if e.consumed else await stream.read(self.chunk_size)
+                for offset in range(0, len(data), self.chunk_size):
+                    await self._offer(data[offset : offset + self.chunk_size], oversized=True)
+                continue
+            await self._offer(line)
+
+    async def _offer(self, data: bytes, oversized: bool = False) -> None:
+        line = data.decode(errors="replace").strip()
+        if not line:
+            return
+        event = parse_line(line) if not oversized else None
+        self._lines.labels(self.server, type(event).__name__ if event is not None else "Other").inc()
+        if event is not None:
+            # Backpressure only for lines that matter
+            await self._queue.put((line, event))
+            return
+        depth = self._queue.qsize()
+        if depth >= self.low_watermark:
+            # Buffered pipe data is read without yielding, so the consumer gets a turn before anything is dropped
+            await asyncio.sleep(0)
+            depth = self._queue.qsize()
+        if depth >= self.queue_size:
+            self._dropped.labels(self.server, "full").inc()
+            return
+        if depth >= self.low_watermark:
+            self._sampled += 1
+            if self._sampled % self.sample_every:
+                self._dropped.labels(self.server, "sampled").inc()
+                return
+        self._queue.put_nowait((line, None))
+
+    async def _consume(self) -> None:
+        while self._open:
+            item = await self._queue.get()
+            if item is None:
+                self._open -= 1
+                continue
+            line, event = item
+            try:
+                await self.consume(line, event)
+            except Exception as e:
+                print(f"[{self.server}] Log line handling:", e)
+        await self.closed()
@@ -1,83 +1,314 @@
 import asyncio
+import html
 import subprocess
-from typing import TYPE_CHECKING
-
-from apscheduler.schedulers.asyncio import AsyncIOScheduler  # type: ignore
-from apscheduler.triggers.interval import IntervalTrigger  # type: ignore
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
 
 from omnigram.config import config
+from omnigram.metrics import metrics
 from omnigram.telegram import TelegramHandler
 
+from .activity_forecast import ActivityForecast
+from .chat_relay import ChatRelay, RelayMessage
+from .event_waiter import EventWaiter
+from .health_monitor import HealthMonitor
+from .hibernation import Hibernation
+from .log_archive import LogArchive
+from .log_parser import (
+    ChatEvent,
+    DoneEvent,
+    JoinEvent,
+    LeaveEvent,
+    ListEvent,
+    SavedEvent,
+    ServerEmptyEvent,
+    TpsWarningEvent,
+    parse_reply,
+)
+from .log_reader import LogReader
+from .player_tracker import PlayerTracker
+from .process_supervisor import ProcessSupervisor
+from .transport import RconClient, RconTransport, StdinTransport
+from .world_backup import WorldBackup
+
 if TYPE_CHECKING:
     from asyncio import Task
     from asyncio.streams import StreamReader
+    from asyncio.subprocess import Process
+    from collections.abc import Awaitable, Callable
+
+    from omnigram.config.minecraft import ServerSettings
+    from omnigram.telegram.console_tail import ConsoleTail
+    from omnigram.timers import Timer, TimerService
 
-    from apscheduler.job import Job  # type: ignore
+    from .event_waiter import E
+    from .log_parser import Event
+    from .transport import Transport
 
 
 class MinecraftServer:
     _server = None
     _launch_task: "Task | None" = None
-    _suspend_task_status: bool = False
-    _people_online: int = 0
-    _people_online_list: str
+    _started_at: float | None = None
     _telegram_handler: "TelegramHandler"
-    _idle_suspend_job: "Job | None" = None
+    console_tail: "ConsoleTail | None" = None
+    _idle_suspend_timer: "Timer | None" = None
+    # Delay of the pending idle suspend, scaled by the activity forecast
+    _idle_delay: float = 0.0
+    _event_handlers: "dict[type, Callable[[Any], Awaitable[None]]]"
+    _waiter: "EventWaiter"
+    _stdin: "StdinTransport"
+    _log_reader: "LogReader"
+    _supervisor: "ProcessSupervisor"
+    players: "PlayerTracker"
+    health: "HealthMonitor"
+    backups: "WorldBackup"
+    chat_relay: "ChatRelay"
+    log_archive: "LogArchive"
+    hibernation: "Hibernation"
+    forecast: "ActivityForecast"
+    name: str
+    settings: "ServerSettings"
+    transport: "Transport"
+
+    def __init__(
+        self,
+        timers: "TimerService",
+        name: str = "default",
+        settings: "ServerSettings | None" = None,
+        transport: "Transport | None" = None,
+    ) -> None:
+        self.name = name
+        self.settings = settings or config.minecraft.server_settings()[name]
+        self.timers = timers
+        self._waiter = EventWaiter()
+        self._stdin = StdinTransport()
+        self.players = PlayerTracker(server=name)
+        self.health = HealthMonitor(server=self)
+        self.backups = WorldBackup(server=self)
+        self.chat_relay = ChatRelay(server=self)
+        self.hibernation = Hibernation(server=self, woken=self._on_connection_attempt)
+        self.forecast = ActivityForecast(server=self)
+        archive_path = config.minecraft.log_archive_path
+        self.log_archive = LogArchive(
+            server=name,
+            root=Path(archive_path) / name if archive_path else Path(self.settings.path) / "log-archive",
+        )
+        self._log_reader = LogReader(
+            server=name,
+            consume=self._handle_line,
+            report=self.send_message_to_telegram_console,
+            closed=self._on_output_closed,
+        )
+        self._supervisor = ProcessSupervisor(
+            server=name,
+            spawn=self._spawn,
+            request_stop=lambda: self.send_command("stop"),
+            exited=self._on_exit,
+            report=self.send_message_to_telegram_console,
+        )
+        if transport is not None:
+            self.transport = transport
+        elif self.settings.transport == "rcon":
+            self.transport = RconTransport(
+                client=RconClient(
+                    host=self.settings.rcon_host,
+                    port=self.settings.rcon_port,
+                    password=self.settings.rcon_password,
+                )
+            )
+        else:
+            self.transport = self._stdin
+        self._event_handlers = {
+            ListEvent: self._on_list,
+            ServerEmptyEvent: self._on_server_empty,
+            ChatEvent: self._on_chat,
+            JoinEvent: self._on_join,
+            LeaveEvent: self._on_leave,
+            DoneEvent: self._on_done,
+            TpsWarningEvent: self._on_tps_warning,
+        }
+        metrics.server_uptime.labels(self.name).set_function(self.uptime)
+
+    @property
+    def console_topic(self) -> int:
+        return self.settings.topic_console or config.telegram.topic_mc_console
 
-    def __init__(self) -> None:
-        self.scheduler = AsyncIOScheduler()
+    @property
+    def chat_topic(self) -> int:
+        return self.settings.topic_chat or config.telegram.topic_mc_minecraft_chat
 
     def launch(self) -> None:
         if self._launch_task is None or self._launch_task.done():
             self._launch_task = asyncio.create_task(self._launch())
 
+    async def launch_and_wait(self, timeout: float | None = None) -> "DoneEvent | None":
+        ready = self._waiter.expect(DoneEvent)
+        self.launch()
+        # Not returned directly, mypy would infer the event type from the return type instead of the future
+        done = await self._waiter.wait(ready, timeout=timeout or config.minecraft.launch_timeout)
+        return done
+
     async def _launch(self) -> None:
         if not self._server:
-            self._server = await asyncio.create_subprocess_exec(
-                "sudo",
-                "-S",
-                "make",
-                config.minecraft.target,
-                cwd=config.minecraft.path,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-            )
+            await self._supervisor.start()
+
+    async def _spawn(self) -> "Process":
+        self._server = await asyncio.create_subprocess_exec(
+            "sudo",
+            "-S",
+            "make",
+            self.settings.target,
+            cwd=self.settings.path,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            limit=config.minecraft.log_line_limit,
+            # Out of the bot process group, so a Ctrl+C meant for the bot leaves the server to the staged stop
+            start_new_session=True,
+        )
+        self._started_at = time.monotonic()
+        # Tick queries wait for the end of the startup, a server still loading leaves them unanswered
+        self.health.reset(tick_queries=False)
 
-            async def send_password() -> None:
-                if self._server is not None and self._server.stdin is not None:
-                    self._server.stdin.write(f"{config.admin.sudo}\n".encode())
-                    await self._server.stdin.drain()
+        async def send_password() -> None:
+            if self._server is not None and self._server.stdin is not None:
+                self._server.stdin.write(f"{config.admin.sudo}\n".encode())
+                await self._server.stdin.drain()
 
-            await send_password()
-            if self._server is not None and self._server.stdout is not None and self._server.stderr is not None:
-                asyncio.create_task(self._read_stream(self._server.stdout))
-                asyncio.create_task(self._read_stream(self._server.stderr))
+        await send_password()
+        self._stdin.attach(self._server)
+        if self._server.stdout is not None and self._server.stderr is not None:
+            self._log_reader.start(("stdout", self._server.stdout), ("stderr", self._server.stderr))
+        return self._server
+
+    async def startup(self) -> None:
+        if config.minecraft.log_archive:
+            self.log_archive.start()
+        await self.transport.start()
+        await self.health.start()
+        await self.forecast.start()
+
+    async def shutdown(self) -> None:
+        self._cancel_idle_suspend()
+        self.forecast.stop()
+        await self.health.stop()
+        await self.chat_relay.stop()
+        await self._thaw_before_stop()
+        await self._supervisor.stop()
+        await self._log_reader.stop()
+        await asyncio.to_thread(self.log_archive.stop)
+        await self.players.stop()
+        await self.transport.close()
 
     async def command_suspend(self) -> None:
+        await self._backup_before_stop()
         await self._suspend()
 
     async def idle_suspend(self) -> None:
-        if not self._suspend_task_status:
-            await self.send_message_to_telegram_console("⏳ Сервер пуст, отключение через 5 минут.")
-            self._suspend_task_status = True
-            self._idle_suspend_job = self.scheduler.add_job(self._idle_suspend, IntervalTrigger(minutes=5))
+        if self._idle_suspend_timer is None:
+            delay, chance = self.forecast.idle_delay()
+            self._idle_delay = delay
+            reason = f" Игроки вернутся в течение часа с вероятностью {chance:.0%}." if chance is not None else ""
+            await self.send_message_to_telegram_console(
+                f"⏳ Сервер пуст, отключение через {round(delay / 60, 1):g} мин.{reason}"
+            )
+            self._idle_suspend_timer = self.timers.call_later(
+                delay, self._idle_suspend, name=f"idle_suspend:{self.name}"
+            )
+
+    def _cancel_idle_suspend(self) -> bool:
+        if self._idle_suspend_timer is None:
+            return False
+        self._idle_suspend_timer.cancel()
+        self._idle_suspend_timer = None
+        return True
 
     async def _idle_suspend(self) -> None:
-        await self.send_message_to_telegram_console("⏳ Завершается работа сервера после 5 минут простаивания...")
-        asyncio.create_task(self._suspend())
+        self._idle_suspend_timer = None
+        await self.send_message_to_telegram_console(
+            f"⏳ Завершается работа сервера после {round(self._idle_delay / 60, 1):g} мин простоя..."
+        )
+        await self._backup_before_stop()
+        if len(self.players):
+            # Somebody joined while the world was copied
+            await self.send_message_to_telegram_console("🥳 Игрок онлайн, сервер продолжит работу.")
+            return
+        if config.minecraft.idle_strategy == "hibernate" and await self.hibernate():
+            await self.send_message_to_telegram_console(
+                "💤 Сервер переведён в спящий режим, он проснётся по /launch или при подключении игрока."
+            )
+            return
+        await self._suspend()
         await self.send_message_to_telegram_console("✅ Сервер выключен.")
 
-    async def _suspend(self) -> None:
-        if self._server is not None and self._server.stdin is not None:
-            self._server.stdin.write("stop\n".encode())
-            await self._server.stdin.drain()
-            await asyncio.sleep(5)
-            await self._server.wait()
-            self._server = None
-            self._suspend_task_status = False
-            self._idle_suspend_job = None
+    async def hibernate(self) -> bool:
+        """
+        Saving the world and freezing the server process, a failed freeze leaves the server running.
+
+        :return: True when the server is hibernated
+        """
+        if self.hibernated:
+            return True
+        if not self.status() or self._server is None:
+            return False
+        saved = await self.request("save-all flush", expect=SavedEvent, timeout=config.minecraft.backup_save_timeout)
+        if saved is None:
+            await self.send_message_to_telegram_console("⚠️ Сервер не подтвердил сохранение, спящий режим отменён.")
+            return False
+        try:
+            await self.hibernation.freeze()
+        except Exception as e:
+            await self.send_message_to_telegram_console(f"⚠️ Не удалось перевести сервер в спящий режим: {e!r}")
+            return False
+        return True
+
+    async def resume(self) -> float:
+        """
+        Waking a hibernated server, it is suspended again after the idle delay unless a player joins.
+
+        :return: seconds the server was hibernated
+        """
+        seconds = await self.hibernation.thaw()
+        # The server catches up on the ticks it missed, readings across the freeze start over
+        self.health.reset(tick_queries=self.health.tick_queries)
+        if not len(self.players):
+            await self.idle_suspend()
+        return seconds
+
+    async def _on_connection_attempt(self) -> None:
+        started = time.perf_counter()
+        seconds = await self.resume()
+        await self.send_message_to_telegram_console(
+            f"🔔 Подключение к серверу, он проснулся за {time.perf_counter() - started:.2f} с "
+            f"после {seconds / 60:.0f} мин сна."
+        )
+
+    async def _thaw_before_stop(self) -> None:
+        # A frozen process does not read the stop command nor die of SIGTERM until it continues
+        if not self.hibernated:
+            return
+        try:
+            await self.hibernation.thaw()
+        except Exception as e:
+            print(f"[{self.name}] Hibernation:", e)
 
+    async def _backup_before_stop(self) -> None:
+        if not config.minecraft.backup_on_suspend or self._server is None:
+            return
+        try:
+            result = await self.backups.run()
+        except Exception as e:
+            await self.send_message_to_telegram_console(f"⚠️ Резервная копия перед отключением не создана: {e!r}")
+            return
+        await self.send_message_to_telegram_console(
+            f"💾 Резервная копия {result.name} создана за {result.seconds:.1f} с."
+        )
+
+    async def _suspend(self) -> None:
+        await self._thaw_before_stop()
+        await self._supervisor.stop()
         if self._launch_task and not self._launch_task.done():
             self._launch_task.cancel()
             try:
@@ -85,61 +316,159 @@ class MinecraftServer:
             except asyncio.CancelledError:
                 pass
 
+    async def _on_exit(self, code: int, expected: bool) -> None:
+        self._server = None
+        self._started_at = None
+        self._stdin.detach()
+        self.hibernation.forget()
+        self._cancel_idle_suspend()
+        self.players.reset()
+        if not expected:
+            await self.send_message_to_telegram_console(f"❌ Сервер неожиданно завершился, код выхода {code}.")
+
     async def on_player_join(self) -> None:
-        if self._suspend_task_status and self._idle_suspend_job is not None:
-            self.scheduler.remove_job(job_id=self._idle_suspend_job.id)
-            self._suspend_task_status = False
+        if self._cancel_idle_suspend():
             await self.send_message_to_telegram_console("🥳 Игрок онлайн, сервер продолжит работу.")
 
     async def send_message_to_telegram_console(self, text: str) -> "None":
-        print(text)
-        await self._telegram_handler.send_message_to_console(text=text)
+        print(f"[{self.name}] {text}")
+        await self._telegram_handler.send_message_to_console(text=text, server=self)
+
+    async def send_message_from_minecraft_to_telegram(self, player: str, text: str) -> None:
+        text = f"[{html.escape(player)}] {html.escape(text)}"
+
+        print(f"[{self.name}] {text}")
+        await self._telegram_handler.send_message_to_chat(text=text, server=self)
+
+    def send_message_to_minecraft(
+        self,
+        user: str,
+        text: str = "",
+        reply_to: str | None = None,
+        reply_text: str = "",
+        attachment: str | None = None,
+    ) -> bool:
+        """
+        Queueing a Telegram message for the game chat.
 
-    async def send_message_from_minecraft_to_telegram(self, text: str) -> None:
-        text = text.replace("<", "[")
-        text = text.replace(">", "]")
-        output = text.split()
-        output = output[5:]
-        text = " ".join(output)
+        :param user: author name
+        :param text: message text or caption
+        :param reply_to: author of the message replied to
+        :param reply_text: text of the message replied to
+        :param attachment: placeholder of the media, e.g. "Фото"
+        :return: False when the relay queue is full and the message was dropped
+        """
+        return self.chat_relay.offer(
+            RelayMessage(user=user, text=text, reply_to=reply_to, reply_text=reply_text, attachment=attachment)
+        )
 
-        print(text)
-        await self._telegram_handler.send_message_to_chat(text=text)
+    def _transport(self) -> "Transport":
+        # Commands fall back to stdin while e.g. RCON of a freshly spawned server is not up yet
+        if self.transport.connected or not self._stdin.connected:
+            return self.transport
+        return self._stdin
 
-    async def send_message_to_minecraft(self, user: str, text: str) -> None:
-        if self._server is not None and self._server.stdin is not None:
-            self._server.stdin.write(f'tellraw @a "<{user}>: {text}"\n'.encode())
-            await self._server.stdin.drain()
-            await asyncio.sleep(1)
+    async def send_command(self, command: str) -> bool:
+        return await self._transport().send(command)
+
+    async def request(self, command: str, expect: "type[E]", timeout: float | None = None) -> "E | None":
+        timeout = timeout or config.minecraft.command_timeout
+        transport = self._transport()
+        if transport.replies:
+            reply = await transport.execute(command, timeout=timeout)
+            event = parse_reply(reply) if reply is not None else None
+            if event is not None:
+                await self._dispatch(event)
+            return event if isinstance(event, expect) else None
+
+        response = self._waiter.expect(expect)
+        if not await transport.send(command):
+            response.cancel()
+            return None
+        # Not returned directly, see launch_and_wait
+        answer = await self._waiter.wait(response, timeout=timeout)
+        return answer
 
     async def _read_stream(self, stream: "StreamReader") -> None:
-        while True:
-            line = await stream.readline()
-            if not line:
-                break
-            output = line.decode().strip()
-            if "of a max of 20 players online" in output:
-                self._people_online = int(output.split()[5]) if output.split()[5] is not None else 0
-                self._people_online_list = " ".join(output.split()[13:]) if self._people_online > 0 else " "
-            elif "Server empty for 60 seconds, pausing" in output:
-                await self.idle_suspend()
-            elif "[Not Secure] <" in output:
-                await self.send_message_from_minecraft_to_telegram(text=output)
-            elif "logged in with entity id" in output:
-                await self.on_player_join()
-            print(output)
+        self._log_reader.start(("stream", stream))
+        await self._log_reader.wait_closed()
+
+    async def _handle_line(self, output: str, event: "Event | None") -> None:
+        if event is not None:
+            await self._dispatch(event)
+        self.log_archive.write(output)
+        if self.console_tail is not None:
+            self.console_tail.feed(output)
+        print(f"[{self.name}] {output}")
+
+    async def _on_output_closed(self) -> None:
+        self._waiter.cancel_all()
+        self.players.reset()
+        self.health.reset(tick_queries=True)
+
+    async def _dispatch(self, event: "Event") -> None:
+        self._waiter.resolve(event)
+        handler = self._event_handlers.get(type(event))
+        if handler is not None:
+            await handler(event)
+
+    async def _on_list(self, event: "ListEvent") -> None:
+        self.players.sync(players=event.players, max_players=event.max_players)
+
+    async def _on_server_empty(self, event: "ServerEmptyEvent") -> None:
+        await self.idle_suspend()
+
+    async def _on_chat(self, event: "ChatEvent") -> None:
+        await self.send_message_from_minecraft_to_telegram(player=event.player, text=event.text)
+
+    async def _on_join(self, event: "JoinEvent") -> None:
+        self.players.join(event.player)
+        await self.on_player_join()
+
+    async def _on_leave(self, event: "LeaveEvent") -> None:
+        self.players.leave(event.player)
+
+    async def _on_done(self, event: "DoneEvent") -> None:
+        # A freshly started server is empty, so the roster is accurate without asking
+        self.players.reset(synced=True)
+        self.health.reset(tick_queries=True)
+
+    async def _on_tps_warning(self, event: "TpsWarningEvent") -> None:
+        self.health.overloaded(event)
+
+    @property
+    def pid(self) -> int | None:
+        return self._server.pid if self._server is not None else None
+
+    def uptime(self) -> float:
+        return time.monotonic() - self._started_at if self._started_at is not None else 0.0
+
+    @property
+    def hibernated(self) -> bool:
+        return self.hibernation.hibernated
 
     def status(self) -> bool:
-        if self._server is not None:
+        if self.hibernated:
+            # Alive but frozen, it answers nothing until resumed
+            return False
+        if self._server is not None or self.transport.connected:
             return True
         return False
 
+    def state(self) -> str:
+        """
+        Running, hibernated or stopped.
+
+        :return: state name
+        """
+        if self.hibernated:
+            return "hibernated"
+        return "running" if self.status() else "stopped"
+
     async def list(self) -> "tuple[int | None, str | None]":
-        if self._server is not None and self._server.stdin is not None:
-            self._server.stdin.write("list\n".encode())
-            await self._server.stdin.drain()
-            await asyncio.sleep(1)
-            return self._people_online, self._people_online_list
-        return None, None
-
-    def __del__(self) -> None:
-        asyncio.run(self._suspend())
+        if not self.status():
+            return None, None
+        # Joins and leaves are only seen in the log of a process the bot spawned, otherwise the server is asked
+        if self._server is None or not self.players.synced:
+            await self.request("list", expect=ListEvent)
+        return len(self.players), ", ".join(self.players.players) or " "
@@ -0,0 +1,158 @@
+import asyncio
+import dataclasses
+from datetime import UTC, datetime, time, timedelta
+from typing import TYPE_CHECKING
+
+from omnigram.database import Playtime, SessionEvent, fetch_player_stats, record_session_events
+from omnigram.metrics import metrics
+
+if TYPE_CHECKING:
+    from asyncio import Task
+
+    from omnigram.database import PlayerStats
+
+
+class PlayerTracker:
+    """
+    Live roster of one server, persisting join/leave events and daily playtime rollups off the event loop.
+    The roster changes right away, the events are written in batches by a background task.
+    """
+
+    _task: "Task | None" = None
+    max_players: int = 0
+    # Whether the roster follows the log since the server start or a list reply, otherwise it has to be asked for
+    synced: bool = False
+
+    def __init__(self, server: str) -> None:
+        self.server = server
+        self._joined_at: "dict[str, datetime]" = {}
+        self._online = metrics.players_online.labels(server)
+        self._events: "list[SessionEvent]" = []
+        self._wakeup = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    @property
+    def players(self) -> "tuple[str, ...]":
+        return tuple(sorted(self._joined_at))
+
+    def __len__(self) -> int:
+        return len(self._joined_at)
+
+    def __contains__(self, player: object) -> bool:
+        return player in self._joined_at
+
+    def join(self, player: str) -> None:
+        """
+        Adding a player to the roster.
+
+        :param player: player name
+        :return: None
+        """
+        if player in self._joined_at:
+            return
+        at = self._joined_at[player] = datetime.now(UTC)
+        self._online.set(len(self))
+        self._record(SessionEvent(server=self.server, player=player, kind="join", at=at, online=len(self)))
+
+    def leave(self, player: str) -> None:
+        """
+        Removing a player from the roster and closing their session.
+
+        :param player: player name
+        :return: None
+        """
+        joined_at = self._joined_at.pop(player, None)
+        self._online.set(len(self))
+        self._record(
+            SessionEvent(server=self.server, player=player, kind="leave", at=datetime.now(UTC), joined_at=joined_at)
+        )
+
+    def sync(self, players: "tuple[str, ...]", max_players: int) -> None:
+        """
+        Reconciling the roster with a list reply, catching joins and leaves the log did not show.
+
+        :param players: players online
+        :param max_players: player limit of the server
+        :return: None
+        """
+        self.max_players = max_players
+        for player in set(self._joined_at) - set(players):
+            self.leave(player)
+        for player in players:
+            self.join(player)
+        self.synced = True
+
+    def reset(self, synced: bool = False) -> None:
+        """
+        Closing every open session, the server started or stopped.
+
+        :param synced: whether the empty roster is known to be accurate, true right after the server start
+        :return: None
+        """
+        for player in list(self._joined_at):
+            self.leave(player)
+        self.synced = synced
+
+    async def flush(self) -> None:
+        """
+        Waiting until every recorded event is written.
+
+        :return: None
+        """
+        await self._idle.wait()
+
+    async def stop(self) -> None:
+        """
+        Writing the recorded events and stopping the background task.
+
+        :return: None
+        """
+        if self._task is not None and not self._task.done():
+            await self.flush()
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def stats(self, days: int = 7, limit: int = 10) -> "PlayerStats":
+        """
+        Playtime leaders and peak concurrency of the last days from the rollups, sessions in progress included.
+
+        :param days: length of the period in UTC days, today included
+        :param limit: number of players
+        :return: player statistics
+        """
+        now = datetime.now(UTC)
+        since = now.date() - timedelta(days=max(days, 1) - 1)
+        start = datetime.combine(since, time(), tzinfo=UTC)
+        await self.flush()
+        stats = await asyncio.to_thread(fetch_player_stats, self.server, since, limit + len(self))
+        playtime = {entry.player: entry for entry in stats.playtime}
+        for player, joined_at in self._joined_at.items():
+            seconds = (now - max(joined_at, start)).total_seconds()
+            entry = playtime.get(player, Playtime(player=player, seconds=0.0, sessions=0))
+            playtime[player] = Playtime(player=player, seconds=entry.seconds + seconds, sessions=entry.sessions + 1)
+        leaders = sorted(playtime.values(), key=lambda entry: entry.seconds, reverse=True)[:limit]
+        return dataclasses.replace(stats, playtime=leaders)
+
+    def _record(self, event: "SessionEvent") -> None:
+        self._events.append(event)
+        self._idle.clear()
+        self._wakeup.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self._events:
+                batch, self._events = self._events, []
+                try:
+                    await asyncio.to_thread(record_session_events, batch)
+                except Exception as e:
+                    print(f"[{self.server}] Player session:", e)
+            self._idle.set()
@@ -0,0 +1,164 @@
+import asyncio
+import contextlib
+import signal
+import time
+from typing import TYPE_CHECKING
+
+from omnigram.config import config
+from omnigram.metrics import metrics
+
+from .hibernation import process_tree, signal_processes
+
+if TYPE_CHECKING:
+    from asyncio import Task
+    from asyncio.subprocess import Process
+    from collections.abc import Awaitable, Callable
+
+
+class ProcessSupervisor:
+    """
+    Owns the server process: notices its exit right away, stops it in stages (the stop command, SIGTERM, SIGKILL)
+    and restarts it with exponential backoff after a crash
+    """
+
+    process: "Process | None" = None
+    _watch_task: "Task | None" = None
+    _restart_task: "Task | None" = None
+    _stopping: bool = False
+    _started_at: float = 0.0
+    _failures: int = 0
+
+    def __init__(
+        self,
+        server: str,
+        spawn: "Callable[[], Awaitable[Process]]",
+        request_stop: "Callable[[], Awaitable[bool]]",
+        exited: "Callable[[int, bool], Awaitable[None]]",
+        report: "Callable[[str], Awaitable[None]]",
+        stop_timeout: float | None = None,
+        term_timeout: float | None = None,
+        kill_timeout: float | None = None,
+        restart: bool | None = None,
+        restart_delay: float | None = None,
+        restart_max_delay: float | None = None,
+        restart_attempts: int | None = None,
+        stable_after: float | None = None,
+    ) -> None:
+        self.server = server
+        self.spawn = spawn
+        self.request_stop = request_stop
+        self.exited = exited
+        self.report = report
+        self.stop_timeout = stop_timeout or config.minecraft.stop_timeout
+        self.term_timeout = term_timeout or config.minecraft.term_timeout
+        self.kill_timeout = kill_timeout or config.minecraft.kill_timeout
+        self.restart = restart if restart is not None else config.minecraft.restart_on_crash
+        self.restart_delay = restart_delay or config.minecraft.restart_delay
+        self.restart_max_delay = restart_max_delay or config.minecraft.restart_max_delay
+        self.restart_attempts = restart_attempts or config.minecraft.restart_attempts
+        self.stable_after = stable_after or config.minecraft.restart_stable_after
+        self._exits = metrics.server_exits
+
+    @property
+    def running(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    async def start(self) -> "Process":
+        """
+        Spawning the process unless it is running, a pending restart is dropped.
+
+        :return: the process
+        """
+        self._cancel_restart()
+        if self.process is not None and self.running:
+            return self.process
+        self._stopping = False
+        process = self.process = await self.spawn()
+        self._started_at = time.monotonic()
+        self._watch_task = asyncio.create_task(self._watch(process))
+        return process
+
+    async def stop(self) -> int | None:
+        """
+        Stopping the process: the stop command first, SIGTERM and then SIGKILL when a stage runs past its deadline.
+        Returns as soon as the process is gone and its exit is handled.
+
+        :return: exit code or None when nothing was running
+        """
+        self._cancel_restart()
+        process = self.process
+        if process is None or process.returncode is not None:
+            return None
+        self._stopping = True
+        stopped = await self.request_stop() and await self._wait(process, self.stop_timeout)
+        for stage, timeout in ((signal.SIGTERM, self.term_timeout), (signal.SIGKILL, self.kill_timeout)):
+            if stopped:
+                break
+            await self.report(f"⚠️ Сервер не остановился вовремя, отправляется {stage.name}.")
+            if stage is signal.SIGTERM:
+                # sudo relays SIGTERM to the server
+                with contextlib.suppress(ProcessLookupError):
+                    process.send_signal(stage)
+            else:
+                await self._kill_tree(process)
+            stopped = await self._wait(process, timeout)
+        if self._watch_task is not None:
+            await asyncio.shield(self._watch_task)
+        return process.returncode
+
+    async def _kill_tree(self, process: "Process") -> None:
+        # SIGKILL to sudo would end only sudo itself, the server under it would keep running with the world lock
+        pids = await asyncio.to_thread(process_tree, process.pid)
+        try:
+            await signal_processes(list(reversed(pids)), signal.SIGKILL)
+        except (OSError, RuntimeError) as e:
+            print(f"[{self.server}] Process kill:", e)
+            await self.report("❌ Не удалось завершить процессы сервера, он может продолжать работу.")
+
+    @staticmethod
+    async def _wait(process: "Process", timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(asyncio.shield(process.wait()), timeout=timeout)
+        except TimeoutError:
+            return False
+        return True
+
+    async def _watch(self, process: "Process") -> None:
+        code = await process.wait()
+        expected = self._stopping
+        uptime = time.monotonic() - self._started_at
+        if self.process is process:
+            self.process = None
+        self._exits.labels(self.server, "stopped" if expected else "crashed" if code else "exited").inc()
+        try:
+            await self.exited(code, expected)
+        except Exception as e:
+            print(f"[{self.server}] Process exit handling:", e)
+        # A clean exit nobody asked for is e.g. /stop typed in game, that is not a crash
+        if expected or code == 0 or not self.restart:
+            self._failures = 0
+            return
+        if uptime >= self.stable_after:
+            self._failures = 0
+        self._failures += 1
+        if self._failures > self.restart_attempts:
+            await self.report(f"❌ Сервер падает раз за разом, перезапуски остановлены после {self.restart_attempts}.")
+            self._failures = 0
+            return
+        delay = min(self.restart_delay * 2 ** (self._failures - 1), self.restart_max_delay)
+        await self.report(f"🔄 Перезапуск через {delay:g} с, попытка {self._failures}/{self.restart_attempts}.")
+        self._restart_task = asyncio.create_task(self._restart(delay))
+
+    async def _restart(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+        # Detached from the task, so start() does not cancel the restart running it
+        self._restart_task = None
+        try:
+            await self.start()
+        except Exception as e:
+            await self.report(f"❌ Не удалось перезапустить сервер: {e!r}")
+
+    def _cancel_restart(self) -> None:
+        if self._restart_task is not None and not self._restart_task.done():
+            self._restart_task.cancel()
+        self._restart_task = None
@@ -0,0 +1,64 @@
+import asyncio
+from typing import TYPE_CHECKING
+
+from omnigram.config import config
+
+from .minecraft_server import MinecraftServer
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from omnigram.timers import TimerService
+
+
+class MinecraftRegistry:
+    """
+    Named Minecraft servers managed by one bot process, with their Telegram topic routing
+    """
+
+    _servers: "dict[str, MinecraftServer]"
+
+    def __init__(self, servers: "dict[str, MinecraftServer]") -> None:
+        self._servers = servers
+
+    @classmethod
+    def from_config(cls, timers: "TimerService") -> "MinecraftRegistry":
+        return cls(
+            {
+                name: MinecraftServer(timers=timers, name=name, settings=settings)
+                for name, settings in config.minecraft.server_settings().items()
+            }
+        )
+
+    def __iter__(self) -> "Iterator[MinecraftServer]":
+        return iter(self._servers.values())
+
+    def __len__(self) -> int:
+        return len(self._servers)
+
+    @property
+    def names(self) -> "list[str]":
+        return list(self._servers)
+
+    def get(self, name: str) -> "MinecraftServer | None":
+        return self._servers.get(name)
+
+    @property
+    def console_topics(self) -> "set[int]":
+        return {server.console_topic for server in self}
+
+    @property
+    def chat_topics(self) -> "set[int]":
+        return {server.chat_topic for server in self}
+
+    def for_console_topic(self, topic: int | None) -> "list[MinecraftServer]":
+        return [server for server in self if server.console_topic == topic]
+
+    def for_chat_topic(self, topic: int | None) -> "list[MinecraftServer]":
+        return [server for server in self if server.chat_topic == topic]
+
+    async def startup(self) -> None:
+        await asyncio.gather(*(server.startup() for server in self))
+
+    async def shutdown(self) -> None:
+        await asyncio.gather(*(server.shutdown() for server in self))
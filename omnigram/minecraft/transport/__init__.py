@@ -0,0 +1,5 @@
+from .base import Transport
+from .rcon import RconClient, RconError, RconTransport
+from .stdin import StdinTransport
+
+__all__ = ["RconClient", "RconError", "RconTransport", "StdinTransport", "Transport"]
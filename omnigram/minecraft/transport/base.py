@@ -0,0 +1,39 @@
+from abc import ABC, abstractmethod
+
+
+class Transport(ABC):
+    """
+    Channel the bot uses to send console commands to the Minecraft server
+    """
+
+    replies: bool = False
+
+    @property
+    @abstractmethod
+    def connected(self) -> bool: ...
+
+    @abstractmethod
+    async def send(self, command: str) -> bool:
+        """
+        Sending a command without waiting for its result.
+
+        :param command: console command without the trailing newline
+        :return: whether the command was sent
+        """
+
+    async def execute(self, command: str, timeout: float) -> str | None:
+        """
+        Sending a command and returning its reply, for transports supporting direct replies.
+
+        :param command: console command
+        :param timeout: seconds to wait for the reply
+        :return: reply text or None
+        """
+        await self.send(command)
+        return None
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
@@ -0,0 +1,211 @@
+import asyncio
+import itertools
+import struct
+from typing import TYPE_CHECKING
+
+from omnigram.config import config
+
+from .base import Transport
+
+if TYPE_CHECKING:
+    from asyncio import Future, StreamReader, StreamWriter, Task
+
+TYPE_RESPONSE = 0
+TYPE_COMMAND = 2
+TYPE_LOGIN = 3
+
+_HEADER = struct.Struct("<iii")
+
+
+class RconError(Exception):
+    pass
+
+
+class RconClient:
+    """
+    Asyncio RCON client keeping one persistent connection, requests are pipelined and matched by request id.
+    A long reply comes in several packets sharing the request id, and nothing in them tells the last one, so every
+    command is followed by a packet of an invalid type: the server answers it after the whole reply.
+    """
+
+    _reader: "StreamReader | None" = None
+    _writer: "StreamWriter | None" = None
+    _reader_task: "Task | None" = None
+
+    def __init__(self, host: str, port: int, password: str) -> None:
+        self.host = host
+        self.port = port
+        self.password = password
+        self._ids = itertools.count(1)
+        self._pending: "dict[int, Future[str]]" = {}
+        self._fragments: "dict[int, list[str]]" = {}
+        # Request id of the sentinel packet sent after each command, mapped to the command
+        self._sentinels: "dict[int, int]" = {}
+        self._lock = asyncio.Lock()
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def connect(self) -> None:
+        """
+        Opening the connection and logging in, does nothing if already connected.
+
+        :return: None
+        """
+        async with self._lock:
+            if self.connected:
+                return
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+            self._reader_task = asyncio.create_task(self._read_packets(self._reader))
+            try:
+                login = self._request(TYPE_LOGIN, self.password)
+                await asyncio.wait_for(login, timeout=config.minecraft.command_timeout)
+            except BaseException:
+                await self._disconnect()
+                raise
+
+    async def execute(self, command: str, timeout: float) -> str:
+        """
+        Running a command and returning its reply.
+
+        :param command: console command
+        :param timeout: seconds to wait for the reply
+        :return: reply text
+        """
+        await self.connect()
+        return await asyncio.wait_for(self._request(TYPE_COMMAND, command), timeout=timeout)
+
+    async def close(self) -> None:
+        async with self._lock:
+            await self._disconnect()
+
+    def _request(self, packet_type: int, body: str) -> "Future[str]":
+        if self._writer is None:
+            raise RconError("RCON is not connected")
+        request_id = next(self._ids)
+        future: "Future[str]" = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        self._writer.write(_packet(request_id, packet_type, body))
+        sentinel = None
+        if packet_type == TYPE_COMMAND:
+            sentinel = next(self._ids)
+            self._sentinels[sentinel] = request_id
+            self._fragments[request_id] = []
+            self._writer.write(_packet(sentinel, TYPE_RESPONSE, ""))
+        future.add_done_callback(lambda _: self._forget(request_id, sentinel))
+        return future
+
+    def _forget(self, request_id: int, sentinel: int | None) -> None:
+        self._pending.pop(request_id, None)
+        self._fragments.pop(request_id, None)
+        if sentinel is not None:
+            self._sentinels.pop(sentinel, None)
+
+    async def _read_packets(self, reader: "StreamReader") -> None:
+        try:
+            while True:
+                length, request_id, _ = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+                data = await reader.readexactly(length - _HEADER.size + 4)
+                body = data[:-2].decode(errors="replace")
+                self._on_packet(request_id, body)
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            self._fail_pending(RconError(f"RCON connection lost: {e}"))
+        finally:
+            if self._writer is not None:
+                self._writer.close()
+
+    def _on_packet(self, request_id: int, body: str) -> None:
+        if request_id == -1:
+            self._fail_pending(RconError("RCON authentication failed"))
+            return
+        command = self._sentinels.pop(request_id, None)
+        if command is not None:
+            # Answered after the last packet of the command reply
+            future = self._pending.get(command)
+            if future is not None and not future.done():
+                future.set_result("".join(self._fragments.get(command, [])))
+            return
+        future = self._pending.get(request_id)
+        if future is None or future.done():
+            return
+        if request_id in self._fragments:
+            self._fragments[request_id].append(body)
+        else:
+            future.set_result(body)
+
+    def _fail_pending(self, error: Exception) -> None:
+        for future in list(self._pending.values()):
+            if not future.done():
+                future.set_exception(error)
+        self._pending.clear()
+        self._fragments.clear()
+        self._sentinels.clear()
+
+    async def _disconnect(self) -> None:
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except ConnectionError:
+                pass
+        self._fail_pending(RconError("RCON connection closed"))
+        self._reader = self._writer = self._reader_task = None
+
+
+def _packet(request_id: int, packet_type: int, body: str) -> bytes:
+    payload = body.encode() + b"\x00\x00"
+    return _HEADER.pack(_HEADER.size - 4 + len(payload), request_id, packet_type) + payload
+
+
+class RconTransport(Transport):
+    """
+    Transport over RCON, giving direct replies to commands and working with servers not spawned by the bot
+    """
+
+    replies = True
+    _task: "Task | None" = None
+
+    def __init__(self, client: "RconClient | None" = None) -> None:
+        self.client = client or RconClient(
+            host=config.minecraft.rcon_host,
+            port=config.minecraft.rcon_port,
+            password=config.minecraft.rcon_password,
+        )
+
+    @property
+    def connected(self) -> bool:
+        return self.client.connected
+
+    async def send(self, command: str) -> bool:
+        return await self.execute(command, timeout=config.minecraft.command_timeout) is not None
+
+    async def execute(self, command: str, timeout: float) -> str | None:
+        try:
+            return await self.client.execute(command, timeout=timeout)
+        except (OSError, RconError, TimeoutError) as e:
+            print("RCON:", e)
+            return None
+
+    async def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._keep_connected())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.client.close()
+
+    async def _keep_connected(self) -> None:
+        delay = 1.0
+        while True:
+            if not self.client.connected:
+                try:
+                    await self.client.connect()
+                    delay = 1.0
+                except (OSError, RconError, TimeoutError):
+                    delay = min(delay * 2, config.minecraft.rcon_reconnect_delay)
+            await asyncio.sleep(delay)
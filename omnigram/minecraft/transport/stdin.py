@@ -0,0 +1,32 @@
+from typing import TYPE_CHECKING
+
+from .base import Transport
+
+if TYPE_CHECKING:
+    from asyncio.subprocess import Process
+
+
+class StdinTransport(Transport):
+    """
+    Transport writing commands to the stdin of a server process spawned by the bot,
+    replies are only available through the server log
+    """
+
+    _process: "Process | None" = None
+
+    def attach(self, process: "Process") -> None:
+        self._process = process
+
+    def detach(self) -> None:
+        self._process = None
+
+    @property
+    def connected(self) -> bool:
+        return self._process is not None and self._process.stdin is not None and self._process.returncode is None
+
+    async def send(self, command: str) -> bool:
+        if self._process is None or self._process.stdin is None:
+            return False
+        self._process.stdin.write(f"{command}\n".encode())
+        await self._process.stdin.drain()
+        return True
@@ -0,0 +1,253 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import UTC, date, datetime, timedelta
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from omnigram.config import config
+from omnigram.metrics import metrics
+
+from .log_parser import SavedEvent
+
+if TYPE_CHECKING:
+    from .minecraft_server import MinecraftServer
+
+_SNAPSHOT = re.compile(r"\d{8}-\d{6}(?:-\d+)?")
+_MANIFEST = ".manifest.json"
+_OBJECTS = ".objects"
+_CHUNK = 1 << 20
+# Held open by a running server and of no use in a restore
+_SKIP = {"session.lock"}
+
+
+@dataclass(frozen=True, slots=True)
+class BackupResult:
+    name: str
+    files: int
+    # Files with content not stored by an earlier snapshot
+    copied: int
+    copied_bytes: int
+    total_bytes: int
+    seconds: float
+    # Snapshots dropped by the retention
+    removed: int
+
+
+class _RateLimiter:
+    """
+    Byte rate limit shared by the copy threads
+    """
+
+    def __init__(self, bytes_per_second: float) -> None:
+        self.rate = bytes_per_second
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def consume(self, size: int) -> None:
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(self._next, now)
+            self._next = start + size / self.rate
+        if start > now:
+            time.sleep(start - now)
+
+
+class WorldBackup:
+    """
+    Incremental world snapshots of one server. Every file is stored once in a content-addressed store and
+    hardlinked into the snapshots, so a snapshot reads only files changed since the previous one and writes
+    only content not stored yet. A running server is told to flush and hold its saves during the copy.
+    """
+
+    def __init__(
+        self,
+        server: "MinecraftServer",
+        root: "Path | None" = None,
+        worlds: "list[Path] | None" = None,
+        workers: int | None = None,
+        rate_mb: float | None = None,
+        keep_last: int | None = None,
+        keep_daily: int | None = None,
+    ) -> None:
+        self.server = server
+        settings = server.settings
+        path = Path(settings.path)
+        self.root = root or (Path(settings.backup_path) if settings.backup_path else path / "backups")
+        self.worlds = worlds or [path / world for world in settings.worlds]
+        self.workers = workers or config.minecraft.backup_workers
+        self.rate_mb = rate_mb if rate_mb is not None else config.minecraft.backup_rate_mb
+        self.keep_last = keep_last if keep_last is not None else config.minecraft.backup_keep_last
+        self.keep_daily = keep_daily if keep_daily is not None else config.minecraft.backup_keep_daily
+        self._lock = asyncio.Lock()
+        self._seconds = metrics.backup_seconds.labels(server.name)
+        self._bytes = metrics.backup_bytes
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def snapshots(self) -> "list[str]":
+        """
+        Names of the complete snapshots, oldest first.
+
+        :return: snapshot names
+        """
+        if not self.root.is_dir():
+            return []
+        return sorted(entry.name for entry in self.root.iterdir() if _SNAPSHOT.fullmatch(entry.name))
+
+    async def run(self) -> "BackupResult":
+        """
+        Taking a snapshot, then applying the retention. A running server saves everything first and does not
+        write the world until the copy is done.
+
+        :return: backup summary
+        """
+        async with self._lock:
+            live = self.server.status()
+            try:
+                if live:
+                    await self.server.send_command("save-off")
+                    saved = await self.server.request(
+                        "save-all flush", expect=SavedEvent, timeout=config.minecraft.backup_save_timeout
+                    )
+                    if saved is None:
+                        raise TimeoutError("the server did not confirm save-all flush")
+                result = await asyncio.to_thread(self._snapshot)
+            finally:
+                if live:
+                    await self.server.send_command("save-on")
+        self._seconds.observe(result.seconds)
+        self._bytes.labels(self.server.name, "copied").inc(result.copied_bytes)
+        self._bytes.labels(self.server.name, "linked").inc(result.total_bytes - result.copied_bytes)
+        return result
+
+    def _snapshot(self) -> "BackupResult":
+        started = time.perf_counter()
+        objects = self.root / _OBJECTS
+        objects.mkdir(parents=True, exist_ok=True)
+        existing = self.snapshots()
+        previous = self._manifest(existing[-1]) if existing else {}
+        name = stamp = datetime.now(UTC).strftime("%Y%m%d-%H%M%S")
+        suffix = 0
+        while name in existing:
+            suffix += 1
+            name = f"{stamp}-{suffix}"
+        partial = self.root / f".{name}.partial"
+        shutil.rmtree(partial, ignore_errors=True)
+
+        files = [
+            (Path(directory) / file, Path(directory, file).relative_to(world.parent).as_posix())
+            for world in self.worlds
+            if world.is_dir()
+            for directory, _, names in os.walk(world)
+            for file in names
+            if file not in _SKIP
+        ]
+        limiter = _RateLimiter(self.rate_mb * 2**20)
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="backup") as pool:
+            entries = list(
+                pool.map(lambda file: self._backup_file(file[0], file[1], partial, previous, limiter), files)
+            )
+        manifest = {relative: [size, mtime, digest] for relative, size, mtime, digest, _ in entries}
+        partial.mkdir(parents=True, exist_ok=True)
+        (partial / _MANIFEST).write_text(json.dumps(manifest))
+        # Complete snapshots appear atomically, a crash leaves a partial one that the next run discards
+        partial.rename(self.root / name)
+        removed = self._apply_retention()
+        return BackupResult(
+            name=name,
+            files=len(entries),
+            copied=sum(1 for *_, copied in entries if copied),
+            copied_bytes=sum(entry[1] for entry in entries if entry[4]),
+            total_bytes=sum(entry[1] for entry in entries),
+            seconds=time.perf_counter() - started,
+            removed=removed,
+        )
+
+    def _backup_file(
+        self,
+        source: "Path",
+        relative: str,
+        partial: "Path",
+        previous: "dict[str, list]",
+        limiter: "_RateLimiter",
+    ) -> "tuple[str, int, int, str, bool]":
+        stat = source.stat()
+        known = previous.get(relative)
+        copied = False
+        if known is not None and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+            # Unchanged since the previous snapshot: neither read nor hashed
+            digest = known[2]
+        else:
+            digest, copied = self._store(source, limiter)
+        target = partial / relative
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.link(self._object(digest), target)
+        return relative, stat.st_size, stat.st_mtime_ns, digest, copied
+
+    def _store(self, source: "Path", limiter: "_RateLimiter") -> "tuple[str, bool]":
+        # Hashed while copied, so changed files are read once; content already stored is dropped
+        hasher = hashlib.blake2b(digest_size=20)
+        descriptor, temporary = tempfile.mkstemp(dir=self.root / _OBJECTS, prefix=".tmp-")
+        try:
+            with os.fdopen(descriptor, "wb") as target, open(source, "rb") as file:
+                while chunk := file.read(_CHUNK):
+                    limiter.consume(len(chunk))
+                    hasher.update(chunk)
+                    target.write(chunk)
+            digest = hasher.hexdigest()
+            stored = self._object(digest)
+            stored.parent.mkdir(exist_ok=True)
+            try:
+                # Linking rather than renaming keeps the first copy when two threads store the same content
+                os.link(temporary, stored)
+            except FileExistsError:
+                return digest, False
+            return digest, True
+        finally:
+            if os.path.exists(temporary):
+                os.unlink(temporary)
+
+    def _object(self, digest: str) -> "Path":
+        return self.root / _OBJECTS / digest[:2] / digest
+
+    def _manifest(self, name: str) -> "dict[str, list]":
+        try:
+            return json.loads((self.root / name / _MANIFEST).read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def _apply_retention(self) -> int:
+        snapshots = self.snapshots()
+        keep = set(snapshots[-self.keep_last :]) if self.keep_last > 0 else set()
+        since = datetime.now(UTC).date() - timedelta(days=self.keep_daily)
+        days: "set[date]" = set()
+        for name in reversed(snapshots):
+            day = datetime.strptime(name[:8], "%Y%m%d").date()
+            if day > since and day not in days:
+                days.add(day)
+                keep.add(name)
+        removed = [name for name in snapshots if name not in keep]
+        for name in removed:
+            shutil.rmtree(self.root / name, ignore_errors=True)
+        for entry in self.root.glob(".*.partial"):
+            shutil.rmtree(entry, ignore_errors=True)
+        # Objects no snapshot links to any more have a single link left, the store's own
+        for directory, _, names in os.walk(self.root / _OBJECTS):
+            for file in names:
+                path = os.path.join(directory, file)
+                if file.startswith(".tmp-") or os.stat(path).st_nlink == 1:
+                    os.unlink(path)
+        return len(removed)
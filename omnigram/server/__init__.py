@@ -1,3 +1,4 @@
 from .app import serve
+from .context import AppContext
 
-__all__ = ["serve"]
+__all__ = ["AppContext", "serve"]
@@ -1,11 +1,15 @@
 from aiogram import Dispatcher
 
-from omnigram.factory import get_telegram_handler
-from omnigram.telegram import TelegramHandler
+from .context import AppContext
+from .webhook import start_webhook
 
 
 async def serve() -> None:
+    context = AppContext.create()
     dispatcher: "Dispatcher" = Dispatcher()
-    telegram_handler: "TelegramHandler" = get_telegram_handler()
-    telegram_handler.register(dispatcher=dispatcher)
-    await dispatcher.start_polling(telegram_handler.bot)
+    context.register(dispatcher=dispatcher)
+
+    if context.config.telegram.mode == "webhook":
+        await start_webhook(dispatcher=dispatcher, bot=context.telegram_handler.bot)
+    else:
+        await dispatcher.start_polling(context.telegram_handler.bot)
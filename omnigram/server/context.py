@@ -0,0 +1,89 @@
+import asyncio
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from omnigram.config import get_config
+from omnigram.database import create_schema
+from omnigram.factory import (
+    get_message_writer,
+    get_minecraft_registry,
+    get_storage_maintenance,
+    get_telegram_handler,
+    get_timer_service,
+)
+from omnigram.metrics import MetricsServer, metrics
+
+if TYPE_CHECKING:
+    from aiogram import Dispatcher
+
+    from omnigram.config import Config
+    from omnigram.database import MessageWriter, StorageMaintenance
+    from omnigram.minecraft import MinecraftRegistry
+    from omnigram.telegram import TelegramHandler
+    from omnigram.timers import TimerService
+
+
+@dataclass
+class AppContext:
+    """
+    Everything serve() runs: the config, parsed once, and the components built from it. Building the context
+    connects to nothing, the database is set up and the components are started on the dispatcher startup.
+    """
+
+    config: "Config"
+    timers: "TimerService"
+    telegram_handler: "TelegramHandler"
+    message_writer: "MessageWriter"
+    minecraft_registry: "MinecraftRegistry"
+    storage_maintenance: "StorageMaintenance"
+    metrics_server: "MetricsServer | None" = None
+
+    @classmethod
+    def create(cls) -> "AppContext":
+        """
+        Parsing the config and building the components.
+
+        :return: the context
+        """
+        config = get_config()
+        return cls(
+            config=config,
+            # The one timer service, jobs scheduled while building the components are armed on startup
+            timers=get_timer_service(),
+            telegram_handler=get_telegram_handler(),
+            message_writer=get_message_writer(),
+            minecraft_registry=get_minecraft_registry(),
+            storage_maintenance=get_storage_maintenance(),
+            metrics_server=MetricsServer(metrics=metrics) if config.metrics.enabled else None,
+        )
+
+    async def setup_database(self) -> None:
+        """
+        Creating and migrating the schema, the first startup step.
+
+        :return: None
+        """
+        await asyncio.to_thread(create_schema)
+
+    def register(self, dispatcher: "Dispatcher") -> None:
+        """
+        Registering the handlers and the startup and shutdown steps, in order.
+
+        :param dispatcher: aiogram dispatcher
+        :return: None
+        """
+        self.telegram_handler.register(dispatcher=dispatcher)
+        dispatcher.startup.register(self.setup_database)
+        dispatcher.startup.register(self.timers.start)
+        dispatcher.startup.register(self.message_writer.start)
+        dispatcher.startup.register(self.storage_maintenance.start)
+        dispatcher.startup.register(self.minecraft_registry.startup)
+        dispatcher.shutdown.register(self.timers.stop)
+        dispatcher.shutdown.register(self.minecraft_registry.shutdown)
+        dispatcher.shutdown.register(self.telegram_handler.stop_console_tails)
+        dispatcher.shutdown.register(self.telegram_handler.outbox.stop)
+        dispatcher.shutdown.register(self.message_writer.stop)
+        dispatcher.shutdown.register(self.storage_maintenance.stop)
+        if self.metrics_server is not None:
+            dispatcher.startup.register(self.metrics_server.start)
+            dispatcher.shutdown.register(self.metrics_server.stop)
@@ -0,0 +1,102 @@
+import asyncio
+import contextlib
+import secrets
+import signal
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any
+
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from omnigram.config import config
+
+if TYPE_CHECKING:
+    from aiogram import Bot, Dispatcher
+
+
+class ConcurrentRequestHandler(SimpleRequestHandler):
+    """
+    Webhook request handler answering Telegram right away and processing updates in the background,
+    at most `concurrency` at a time
+    """
+
+    def __init__(self, dispatcher: "Dispatcher", bot: "Bot", secret_token: str, concurrency: int) -> None:
+        super().__init__(dispatcher=dispatcher, bot=bot, handle_in_background=True, secret_token=secret_token)
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    @property
+    def pending(self) -> int:
+        return len(self._background_feed_update_tasks)
+
+    async def _background_feed_update(self, bot: "Bot", update: "dict[str, Any]") -> None:
+        async with self._semaphore:
+            await super()._background_feed_update(bot=bot, update=update)
+
+
+@lru_cache
+def webhook_secret() -> str:
+    """
+    Secret token Telegram sends with every update, a random one for the process when none is configured, so the
+    webhook never accepts updates from anybody who finds the URL.
+
+    :return: secret token
+    """
+    return config.telegram.webhook_secret or secrets.token_urlsafe(32)
+
+
+def build_webhook_app(
+    dispatcher: "Dispatcher", bot: "Bot", secret_token: str
+) -> "tuple[web.Application, ConcurrentRequestHandler]":
+    """
+    Building the aiohttp application receiving webhook updates.
+
+    :param dispatcher: aiogram "Dispatcher" model
+    :param bot: aiogram "Bot" model
+    :param secret_token: token requests must carry in X-Telegram-Bot-Api-Secret-Token
+    :return: application and its request handler
+    """
+    app = web.Application()
+    # Dispatcher shutdown must run before the request handler closes the bot session
+    setup_application(app, dispatcher, bot=bot)
+    handler = ConcurrentRequestHandler(
+        dispatcher=dispatcher,
+        bot=bot,
+        secret_token=secret_token,
+        concurrency=config.telegram.webhook_concurrency,
+    )
+    handler.register(app, path=config.telegram.webhook_path)
+    return app, handler
+
+
+async def start_webhook(dispatcher: "Dispatcher", bot: "Bot") -> None:
+    """
+    Registering the webhook in Telegram and serving updates until cancelled.
+
+    :param dispatcher: aiogram "Dispatcher" model
+    :param bot: aiogram "Bot" model
+    :return: None
+    """
+
+    async def set_webhook() -> None:
+        await bot.set_webhook(
+            url=f"{config.telegram.webhook_url.rstrip('/')}{config.telegram.webhook_path}",
+            secret_token=webhook_secret(),
+            allowed_updates=dispatcher.resolve_used_update_types(),
+            max_connections=config.telegram.webhook_concurrency,
+        )
+
+    dispatcher.startup.register(set_webhook)
+    app, _ = build_webhook_app(dispatcher=dispatcher, bot=bot, secret_token=webhook_secret())
+    runner = web.AppRunner(app)
+    await runner.setup()
+    # Like polling, SIGINT and SIGTERM end serving, so the dispatcher shutdown stops the servers in stages
+    stopped = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        with contextlib.suppress(NotImplementedError):
+            loop.add_signal_handler(signum, stopped.set)
+    try:
+        await web.TCPSite(runner, host=config.telegram.webhook_host, port=config.telegram.webhook_port).start()
+        await stopped.wait()
+    finally:
+        await runner.cleanup()
@@ -0,0 +1,85 @@
+import asyncio
+from typing import TYPE_CHECKING
+
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import ChatMemberAdministrator, ChatMemberOwner
+
+from omnigram.config import config
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+    from aiogram.types import ChatMemberUpdated
+
+
+class AdminCache:
+    """
+    Per-chat cache of administrators, filled with one get_chat_administrators call and kept fresh by TTL
+    and chat_member updates
+    """
+
+    bot: "Bot"
+
+    def __init__(self, bot: "Bot", ttl: float | None = None) -> None:
+        self.bot = bot
+        self.ttl = ttl if ttl is not None else config.telegram.admin_cache_ttl
+        self._admins: "dict[int, set[int]]" = {}
+        self._expires: "dict[int, float]" = {}
+        self._refreshing: "dict[int, asyncio.Task[None]]" = {}
+
+    async def is_admin(self, chat_id: int, user_id: int) -> bool:
+        """
+        Checking the user is an administrator or the owner of the chat. A stale cache is answered from
+        right away and refreshed in the background, the user alone is asked about while the list can't be loaded.
+
+        :param chat_id: chat id
+        :param user_id: user id
+        :return: whether the user is an administrator
+        """
+        admins = self._admins.get(chat_id)
+        if admins is None:
+            await self._refresh(chat_id)
+            admins = self._admins.get(chat_id)
+            if admins is None:
+                return await self._is_member_admin(chat_id, user_id)
+        elif asyncio.get_running_loop().time() >= self._expires.get(chat_id, 0):
+            self._refresh_in_background(chat_id)
+        return user_id in admins
+
+    async def on_chat_member(self, update: "ChatMemberUpdated") -> None:
+        """
+        Chat member update handler, applying promotions and demotions to the cache.
+
+        :param update: aiogram "ChatMemberUpdated" model
+        :return: None
+        """
+        admins = self._admins.get(update.chat.id)
+        if admins is None:
+            return
+        if isinstance(update.new_chat_member, (ChatMemberAdministrator, ChatMemberOwner)):
+            admins.add(update.new_chat_member.user.id)
+        else:
+            admins.discard(update.new_chat_member.user.id)
+
+    async def _is_member_admin(self, chat_id: int, user_id: int) -> bool:
+        try:
+            member = await self.bot.get_chat_member(chat_id=chat_id, user_id=user_id)
+        except TelegramAPIError as e:
+            print("Chat member:", e)
+            return False
+        return isinstance(member, (ChatMemberAdministrator, ChatMemberOwner))
+
+    def _refresh_in_background(self, chat_id: int) -> None:
+        task = self._refreshing.get(chat_id)
+        if task is None or task.done():
+            self._refreshing[chat_id] = asyncio.create_task(self._refresh(chat_id))
+
+    async def _refresh(self, chat_id: int) -> None:
+        try:
+            members = await self.bot.get_chat_administrators(chat_id=chat_id)
+        except TelegramAPIError as e:
+            print("Chat administrators:", e)
+            return
+        self._admins[chat_id] = {
+            member.user.id for member in members if isinstance(member, (ChatMemberAdministrator, ChatMemberOwner))
+        }
+        self._expires[chat_id] = asyncio.get_running_loop().time() + self.ttl
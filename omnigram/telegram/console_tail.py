@@ -0,0 +1,168 @@
+import asyncio
+import html
+import re
+from collections import deque
+from typing import TYPE_CHECKING
+
+from aiogram.exceptions import TelegramAPIError, TelegramRetryAfter
+
+from omnigram.config import config
+from omnigram.metrics import metrics
+
+from .outbox import MESSAGE_LIMIT
+
+if TYPE_CHECKING:
+    from asyncio import Task
+    from collections.abc import Callable
+
+    from aiogram import Bot
+    from aiogram.types import Message
+
+    from .outbox import TokenBucket
+
+
+class ConsoleTail:
+    """
+    Live view of a server console: buffered lines are shown by editing one rolling message at a capped rate
+    """
+
+    enabled: bool = False
+    _task: "Task | None" = None
+    _message_id: int | None = None
+
+    def __init__(
+        self,
+        bot: "Bot",
+        server: str,
+        chat_id: int,
+        message_thread_id: int | None,
+        on_sent: "Callable[[Message], None]",
+        bucket: "Callable[[int], TokenBucket]",
+        header: str = "",
+        interval: float | None = None,
+        buffer_size: int | None = None,
+        include: "list[str] | None" = None,
+        exclude: "list[str] | None" = None,
+    ) -> None:
+        self.bot = bot
+        self.chat_id = chat_id
+        self.message_thread_id = message_thread_id
+        self.on_sent = on_sent
+        self.bucket = bucket
+        self.header = header
+        self.interval = interval or config.telegram.console_tail_interval
+        include = include if include is not None else config.telegram.console_tail_include
+        exclude = exclude if exclude is not None else config.telegram.console_tail_exclude
+        self._include = re.compile("|".join(include)) if include else None
+        self._exclude = re.compile("|".join(exclude)) if exclude else None
+        # Lines not shown yet; when edits fall behind the oldest ones are dropped
+        self._pending: "deque[str]" = deque(maxlen=buffer_size or config.telegram.console_tail_buffer)
+        # Lines of the rolling message
+        self._shown: "list[str]" = []
+        self._wakeup = asyncio.Event()
+        self._lines = metrics.console_tail_lines
+        self._server = server
+
+    def feed(self, line: str) -> None:
+        """
+        Buffering a console line, never waits on the Telegram API.
+
+        :param line: decoded log line
+        :return: None
+        """
+        if not self.enabled:
+            return
+        if (self._include is not None and not self._include.search(line)) or (
+            self._exclude is not None and self._exclude.search(line)
+        ):
+            self._lines.labels(self._server, "filtered").inc()
+            return
+        if len(self._pending) == self._pending.maxlen:
+            self._lines.labels(self._server, "dropped").inc()
+        self._pending.append(line)
+        self._wakeup.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    async def disable(self) -> None:
+        """
+        Stopping the view, buffered lines are shown first and the next enable starts a new message.
+
+        :return: None
+        """
+        self.enabled = False
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self._flush()
+        self._task = None
+        self._message_id = None
+        self._shown = []
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            await self._flush()
+            # The rate cap: whatever arrives meanwhile is shown by the next single edit
+            await asyncio.sleep(self.interval)
+
+    async def _flush(self) -> None:
+        while self._pending:
+            lines = list(self._pending)
+            self._pending.clear()
+            dropped = 0
+            if self._message_id is not None and self._fits(self._shown + lines):
+                shown = self._shown + lines
+            else:
+                # Starting a new message with the newest lines that fit, the previous one stays as it is
+                self._message_id = None
+                shown = []
+                for line in reversed(lines):
+                    if self._fits([line, *shown]):
+                        shown.insert(0, line)
+                    else:
+                        dropped += 1
+                if not shown:
+                    shown = [lines[-1][: MESSAGE_LIMIT - len(self.header) - 1]]
+                    dropped -= 1
+            if await self._show(shown):
+                self._shown = shown
+            else:
+                self._shown = []
+                dropped = len(lines)
+            self._lines.labels(self._server, "shown").inc(len(lines) - dropped)
+            self._lines.labels(self._server, "dropped").inc(dropped)
+
+    def _fits(self, lines: "list[str]") -> bool:
+        return len(self.header) + sum(len(line) + 1 for line in lines) <= MESSAGE_LIMIT
+
+    async def _show(self, lines: "list[str]") -> bool:
+        body = "\n".join(lines)
+        text = f"{html.escape(self.header)}<pre>{html.escape(body)}</pre>"
+        while True:
+            await self.bucket(self.chat_id).acquire()
+            try:
+                if self._message_id is None:
+                    response = await self.bot.send_message(
+                        chat_id=self.chat_id, message_thread_id=self.message_thread_id, text=text
+                    )
+                    self._message_id = response.message_id
+                    self.on_sent(response)
+                else:
+                    await self.bot.edit_message_text(chat_id=self.chat_id, message_id=self._message_id, text=text)
+                return True
+            except TelegramRetryAfter as e:
+                self.bucket(self.chat_id).drain()
+                await asyncio.sleep(e.retry_after)
+            except TelegramAPIError as e:
+                print("Console tail:", e)
+                # The rolling message may have been deleted, e.g. by /clear, so the next lines start a new one
+                self._message_id = None
+                return False
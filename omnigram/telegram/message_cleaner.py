@@ -0,0 +1,100 @@
+import asyncio
+from collections import defaultdict
+from typing import TYPE_CHECKING
+
+from aiogram.exceptions import TelegramAPIError, TelegramBadRequest, TelegramRetryAfter
+
+from omnigram.config import config
+from omnigram.database import fetch_undeleted_messages, mark_messages_deleted
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+
+BULK_DELETE_LIMIT = 100
+
+
+class MessageCleaner:
+    """
+    Class for bulk deleting saved messages from Telegram chats
+    """
+
+    bot: "Bot"
+
+    def __init__(
+        self,
+        bot: "Bot",
+        chunk_size: int | None = None,
+        concurrency: int | None = None,
+        retries: int | None = None,
+    ) -> None:
+        self.bot = bot
+        self.chunk_size = chunk_size or config.telegram.delete_chunk_size
+        self.retries = retries if retries is not None else config.telegram.delete_retries
+        self._semaphore = asyncio.Semaphore(concurrency or config.telegram.delete_concurrency)
+
+    async def run(self) -> int:
+        """
+        Deleting all messages not yet deleted, chunk by chunk.
+
+        :return: number of messages deleted or refused for good
+        """
+        total = 0
+        after_id = 0
+        while True:
+            rows = await asyncio.to_thread(fetch_undeleted_messages, after_id, self.chunk_size)
+            if not rows:
+                break
+            after_id = rows[-1][0]
+
+            by_chat: "defaultdict[int, list[int]]" = defaultdict(list)
+            for message_id, chat_id in rows:
+                by_chat[chat_id].append(message_id)
+
+            results = await asyncio.gather(
+                *(
+                    self._delete_batch(chat_id=chat_id, message_ids=ids[i : i + BULK_DELETE_LIMIT])
+                    for chat_id, ids in by_chat.items()
+                    for i in range(0, len(ids), BULK_DELETE_LIMIT)
+                )
+            )
+            deleted = [message_id for batch in results for message_id in batch]
+            await asyncio.to_thread(mark_messages_deleted, deleted)
+            total += len(deleted)
+        return total
+
+    async def _delete_batch(self, chat_id: int, message_ids: "list[int]") -> "list[int]":
+        async with self._semaphore:
+            for _ in range(self.retries + 1):
+                try:
+                    await self.bot.delete_messages(chat_id=chat_id, message_ids=message_ids)
+                    return message_ids
+                except TelegramRetryAfter as e:
+                    await asyncio.sleep(e.retry_after)
+                except TelegramBadRequest as e:
+                    print("Messages delete:", e)
+                    return await self._delete_one_by_one(chat_id=chat_id, message_ids=message_ids)
+                except TelegramAPIError as e:
+                    print("Messages delete:", e)
+                    return []
+            return []
+
+    async def _delete_one_by_one(self, chat_id: int, message_ids: "list[int]") -> "list[int]":
+        deleted = []
+        for message_id in message_ids:
+            for _ in range(self.retries + 1):
+                try:
+                    await self.bot.delete_message(chat_id=chat_id, message_id=message_id)
+                    deleted.append(message_id)
+                    break
+                except TelegramRetryAfter as e:
+                    await asyncio.sleep(e.retry_after)
+                except TelegramBadRequest as e:
+                    # Gone, too old or a service message: the refusal is final, the message is not fetched again
+                    if "message to delete not found" not in e.message:
+                        print("Message delete:", e)
+                    deleted.append(message_id)
+                    break
+                except TelegramAPIError as e:
+                    print("Message delete:", e)
+                    break
+        return deleted
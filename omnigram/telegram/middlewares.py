@@ -0,0 +1,59 @@
+import time
+from typing import TYPE_CHECKING, Any
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramAPIError
+
+from omnigram.metrics import metrics
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+
+    from aiogram import Bot
+    from aiogram.client.session.middlewares.base import NextRequestMiddlewareType
+    from aiogram.methods import Response, TelegramMethod
+    from aiogram.methods.base import TelegramType
+    from aiogram.types import TelegramObject
+
+
+class RequestMetricsMiddleware(BaseRequestMiddleware):
+    """
+    Bot session middleware timing every Telegram Bot API call
+    """
+
+    async def __call__(
+        self,
+        make_request: "NextRequestMiddlewareType[TelegramType]",
+        bot: "Bot",
+        method: "TelegramMethod[TelegramType]",
+    ) -> "Response[TelegramType]":
+        name = type(method).__name__
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except TelegramAPIError as e:
+            metrics.telegram_request_errors.labels(name, type(e).__name__).inc()
+            raise
+        finally:
+            metrics.telegram_request_seconds.labels(name).observe(time.perf_counter() - started)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """
+    Dispatcher middleware timing the handlers registered by TelegramHandler
+    """
+
+    async def __call__(
+        self,
+        handler: "Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]]",
+        event: "TelegramObject",
+        data: "dict[str, Any]",
+    ) -> Any:
+        handler_object = data.get("handler")
+        name = getattr(getattr(handler_object, "callback", None), "__name__", "unknown")
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            metrics.handler_seconds.labels(name).observe(time.perf_counter() - started)
@@ -0,0 +1,201 @@
+import asyncio
+import re
+from collections import deque
+from typing import TYPE_CHECKING
+
+from aiogram.exceptions import TelegramAPIError, TelegramRetryAfter
+
+from omnigram.config import config
+from omnigram.metrics import metrics
+
+if TYPE_CHECKING:
+    from asyncio import Task
+    from collections.abc import Callable
+
+    from aiogram import Bot
+    from aiogram.types import Message
+
+MESSAGE_LIMIT = 4096
+
+# Markup a message must not be cut inside: a tag or an entity
+_MARKUP = re.compile(r"<(/?)([a-zA-Z-]+)[^>]*>|&#?\w+;")
+
+
+def split_html(text: str, limit: int) -> "tuple[str, str]":
+    """
+    Cutting HTML text to a length at the last line break, else space, outside tags and entities. Tags open at the
+    cut are closed at the end of the head and opened again at the start of the rest, so both parse on their own.
+
+    :param text: HTML text longer than the limit
+    :param limit: longest head
+    :return: head and the rest
+    """
+    # Cuts at a line break, at a space and anywhere outside markup, with the (name, tag) pairs open there
+    cuts: "dict[str, tuple[int, list[tuple[str, str]]]]" = {}
+    opened: "list[tuple[str, str]]" = []
+    position = 0
+    while position < len(text):
+        markup = _MARKUP.match(text, position)
+        end = markup.end() if markup is not None else position + 1
+        if end + sum(len(name) + 3 for name, _ in opened) > limit:
+            break
+        if markup is None:
+            if text[position] == "\n":
+                cuts["line"] = (position, list(opened))
+            elif text[position].isspace():
+                cuts["space"] = (position, list(opened))
+        elif markup[2] and markup[1]:
+            if opened and opened[-1][0] == markup[2].lower():
+                opened.pop()
+        elif markup[2]:
+            opened.append((markup[2].lower(), markup[0]))
+        position = end
+        cuts["any"] = (position, list(opened))
+    kind = next((kind for kind in ("line", "space", "any") if kind in cuts), None)
+    cut, tags = cuts[kind] if kind is not None else (limit, [])
+    head = text[:cut] + "".join(f"</{name}>" for name, _ in reversed(tags))
+    # The line break or space the text is cut at is dropped
+    rest = text[cut + 1 :] if kind in ("line", "space") else text[cut:]
+    return head, "".join(tag for _, tag in tags) + rest
+
+
+class TokenBucket:
+    """
+    Token bucket limiting the rate of API calls to a chat
+    """
+
+    def __init__(self, rate: float, capacity: int) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = asyncio.get_running_loop().time()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = asyncio.get_running_loop().time()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def drain(self) -> None:
+        self._tokens = 0
+        self._updated = asyncio.get_running_loop().time()
+
+
+class _Topic:
+    def __init__(self) -> None:
+        self.lines: "deque[str]" = deque()
+        self.wakeup = asyncio.Event()
+        self.task: "Task | None" = None
+
+
+class Outbox:
+    """
+    Outbound Telegram message queue with per-chat rate limiting and coalescing of lines sent to the same topic
+    """
+
+    bot: "Bot"
+
+    def __init__(
+        self,
+        bot: "Bot",
+        on_sent: "Callable[[Message], None]",
+        rate_per_minute: int | None = None,
+        burst: int | None = None,
+        coalesce_window: float | None = None,
+    ) -> None:
+        self.bot = bot
+        self.on_sent = on_sent
+        self.rate_per_minute = rate_per_minute or config.telegram.send_rate_per_minute
+        self.burst = burst or config.telegram.send_burst
+        self.coalesce_window = coalesce_window if coalesce_window is not None else config.telegram.send_coalesce_window
+        self._topics: "dict[tuple[int, int | None], _Topic]" = {}
+        self._buckets: "dict[int, TokenBucket]" = {}
+        self._closing = False
+        metrics.outbox_pending.set_function(lambda: self.pending)
+
+    @property
+    def pending(self) -> int:
+        return sum(len(topic.lines) for topic in self._topics.values())
+
+    def send(self, chat_id: int, text: str, message_thread_id: int | None = None) -> None:
+        """
+        Queueing text for sending, never waits on the Telegram API.
+
+        :param chat_id: chat id
+        :param text: message text
+        :param message_thread_id: topic id
+        :return: None
+        """
+        key = (chat_id, message_thread_id)
+        topic = self._topics.get(key)
+        if topic is None:
+            topic = self._topics[key] = _Topic()
+        topic.lines.append(text)
+        topic.wakeup.set()
+        if topic.task is None or topic.task.done():
+            topic.task = asyncio.create_task(self._worker(key, topic))
+
+    async def stop(self, timeout: float = 30) -> None:
+        """
+        Sending everything queued and stopping the workers.
+
+        :param timeout: seconds to wait for the queue to drain
+        :return: None
+        """
+        self._closing = True
+        tasks = [topic.task for topic in self._topics.values() if topic.task is not None and not topic.task.done()]
+        for topic in self._topics.values():
+            topic.wakeup.set()
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=timeout)
+            for task in pending:
+                task.cancel()
+
+    async def _worker(self, key: "tuple[int, int | None]", topic: "_Topic") -> None:
+        chat_id, message_thread_id = key
+        while topic.lines or not self._closing:
+            await topic.wakeup.wait()
+            if not self._closing:
+                await asyncio.sleep(self.coalesce_window)
+            topic.wakeup.clear()
+            while topic.lines:
+                text = self._take(topic.lines)
+                await self.bucket(chat_id).acquire()
+                await self._deliver(chat_id=chat_id, message_thread_id=message_thread_id, text=text)
+
+    @staticmethod
+    def _take(lines: "deque[str]") -> str:
+        text = lines.popleft()
+        if len(text) > MESSAGE_LIMIT:
+            text, rest = split_html(text, MESSAGE_LIMIT)
+            lines.appendleft(rest)
+            return text
+        while lines and len(text) + 1 + len(lines[0]) <= MESSAGE_LIMIT:
+            text = f"{text}\n{lines.popleft()}"
+        return text
+
+    def bucket(self, chat_id: int) -> "TokenBucket":
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._buckets[chat_id] = TokenBucket(rate=self.rate_per_minute / 60, capacity=self.burst)
+        return bucket
+
+    async def _deliver(self, chat_id: int, message_thread_id: int | None, text: str) -> None:
+        while True:
+            try:
+                response = await self.bot.send_message(chat_id=chat_id, message_thread_id=message_thread_id, text=text)
+            except TelegramRetryAfter as e:
+                self.bucket(chat_id).drain()
+                await asyncio.sleep(e.retry_after)
+                continue
+            except TelegramAPIError as e:
+                print("Message send:", e)
+                return
+            self.on_sent(response)
+            return
@@ -0,0 +1,91 @@
+import re
+from typing import TYPE_CHECKING, TypedDict
+
+if TYPE_CHECKING:
+    from collections.abc import Collection
+
+    from aiogram.types import Message
+
+# Game chat relayed to Telegram by the bot, "[player] text"
+_RELAYED = re.compile(r"\[(?P<player>[^\]\n]+)\] (?P<text>[^\n]*)")
+
+
+class RelayFields(TypedDict):
+    user: str
+    text: str
+    reply_to: str | None
+    reply_text: str
+    attachment: str | None
+
+
+def attachment_placeholder(message: "Message") -> str | None:
+    """
+    Short description of the media of a message, shown in the game chat in its place.
+
+    :param message: aiogram "Message" model
+    :return: placeholder or None for a plain text message
+    """
+    if message.sticker is not None:
+        return f"Стикер {message.sticker.emoji}" if message.sticker.emoji else "Стикер"
+    if message.photo:
+        return "Фото"
+    if message.animation is not None:
+        return "GIF"
+    if message.video is not None:
+        return "Видео"
+    if message.video_note is not None:
+        return "Видеосообщение"
+    if message.voice is not None:
+        return "Голосовое сообщение"
+    if message.audio is not None:
+        return "Аудио"
+    if message.document is not None:
+        return f"Файл {message.document.file_name}" if message.document.file_name else "Файл"
+    if message.poll is not None:
+        return f"Опрос: {message.poll.question}"
+    if message.location is not None:
+        return "Геопозиция"
+    if message.contact is not None:
+        return "Контакт"
+    return None
+
+
+def _unlabel(text: str, servers: "Collection[str]") -> str:
+    # With several servers the relayed chat starts with "[server] ", see TelegramHandler._label
+    label, separator, rest = text.partition("] ")
+    return rest if separator and label.startswith("[") and label[1:] in servers else text
+
+
+def relay_fields(message: "Message", servers: "Collection[str]" = ()) -> "RelayFields | None":
+    """
+    What of a chat topic message goes to the game chat: the author, the text or caption, a placeholder of the
+    media and the message replied to.
+
+    :param message: aiogram "Message" model
+    :param servers: names of the servers labelling the relayed chat, empty when it is not labelled
+    :return: fields of MinecraftServer.send_message_to_minecraft, None when there is nothing to show
+    """
+    if message.from_user is None:
+        return None
+    text = message.text or message.caption or ""
+    attachment = attachment_placeholder(message)
+    if not text and attachment is None:
+        return None
+    reply_to, reply_text = None, ""
+    reply = message.reply_to_message
+    # Every message of a forum topic replies to the topic creation, that is not a reply
+    if reply is not None and reply.forum_topic_created is None and reply.message_id != message.message_thread_id:
+        reply_text = reply.text or reply.caption or attachment_placeholder(reply) or ""
+        relayed = (
+            _RELAYED.match(_unlabel(reply_text, servers))
+            if reply.from_user is not None and reply.from_user.is_bot
+            else None
+        )
+        if relayed is not None:
+            # A reply to the game chat relayed by the bot goes to the player
+            reply_to, reply_text = relayed["player"], relayed["text"]
+        elif reply.from_user is not None:
+            reply_to = reply.from_user.full_name
+    return RelayFields(
+        user=message.from_user.full_name, text=text, reply_to=reply_to, reply_text=reply_text, attachment=attachment
+    )
@@ -1,24 +1,43 @@
 import asyncio
-from typing import TYPE_CHECKING, cast
+import dataclasses
+import html
+import re
+import time
+from datetime import datetime, timedelta
+from datetime import time as day_time
+from typing import TYPE_CHECKING
 
 from aiogram import Bot
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
-from aiogram.filters import Command
-from apscheduler.schedulers.asyncio import AsyncIOScheduler  # type: ignore
-from apscheduler.triggers.cron import CronTrigger  # type: ignore
+from aiogram.exceptions import TelegramAPIError
+from aiogram.filters import Command, CommandObject
+from aiogram.types import BufferedInputFile
 
 from omnigram.config import config
-from omnigram.database import MessageModel, get_session
-
+from omnigram.database import HIGHLIGHT_END, HIGHLIGHT_START, MessageRow, search_messages
+
+from .admin_cache import AdminCache
+from .console_tail import ConsoleTail
+from .message_cleaner import MessageCleaner
+from .middlewares import HandlerMetricsMiddleware, RequestMetricsMiddleware
+from .outbox import Outbox
+from .relay_fields import relay_fields
 from .validators import validate_admin, validate_console, validate_minecraft_chat
 
 if TYPE_CHECKING:
     from aiogram import Dispatcher
     from aiogram.types import Message
-    from sqlalchemy.orm.session import Session
 
-    from omnigram.minecraft import MinecraftServer
+    from omnigram.database import MessageWriter, SearchPage
+    from omnigram.minecraft import MinecraftRegistry, MinecraftServer
+    from omnigram.timers import TimerService
+
+# Relative moments of /logs, e.g. 30m for half an hour ago
+_AGO = re.compile(r"(?P<amount>\d+)(?P<unit>[smhd])")
+_AGO_UNITS = {"s": "seconds", "m": "minutes", "h": "hours", "d": "days"}
+# Longest /logs answer sent as a message, longer ones are sent as a file
+_LOGS_INLINE = 3500
 
 
 class TelegramHandler:
@@ -26,23 +45,50 @@ class TelegramHandler:
     Class for handling messages in Telegram bot
     """
 
-    minecraft_server: "MinecraftServer"
+    minecraft_registry: "MinecraftRegistry"
+    message_writer: "MessageWriter"
+    message_cleaner: "MessageCleaner"
+    outbox: "Outbox"
+    admin_cache: "AdminCache"
+    console_tails: "dict[str, ConsoleTail]"
     bot: "Bot"
-    scheduler: "AsyncIOScheduler"
-
-    def __init__(self, minecraft_server: "MinecraftServer"):
-        self.bot = Bot(
+    timers: "TimerService"
+
+    def __init__(
+        self,
+        minecraft_registry: "MinecraftRegistry",
+        message_writer: "MessageWriter",
+        timers: "TimerService",
+        bot: "Bot | None" = None,
+    ):
+        self.bot = bot or Bot(
             token=config.telegram.token,
             default=DefaultBotProperties(parse_mode=ParseMode.HTML),
         )
-        self.minecraft_server = minecraft_server
-        self.minecraft_server._telegram_handler = self
-        self.scheduler = AsyncIOScheduler()
-        self.scheduler.add_job(
-            self.delete_messages,
-            CronTrigger(hour=0, minute=0),
-        )
-        self.scheduler.start()
+        self.bot.session.middleware(RequestMetricsMiddleware())
+        self.minecraft_registry = minecraft_registry
+        for minecraft_server in self.minecraft_registry:
+            minecraft_server._telegram_handler = self
+        self.message_writer = message_writer
+        self.message_cleaner = MessageCleaner(bot=self.bot)
+        self.outbox = Outbox(bot=self.bot, on_sent=self._save_messages)
+        self.admin_cache = AdminCache(bot=self.bot)
+        self.console_tails = {}
+        for minecraft_server in self.minecraft_registry:
+            console_tail = ConsoleTail(
+                bot=self.bot,
+                server=minecraft_server.name,
+                chat_id=config.telegram.group_mc,
+                message_thread_id=minecraft_server.console_topic,
+                on_sent=lambda message: self._save_messages(message, archive=False),
+                bucket=self.outbox.bucket,
+                header=self._label(minecraft_server),
+            )
+            if config.telegram.console_tail:
+                console_tail.enable()
+            minecraft_server.console_tail = self.console_tails[minecraft_server.name] = console_tail
+        self.timers = timers
+        self.timers.daily(day_time(hour=0, minute=0), self.delete_messages, name="delete_messages")
 
     def register(self, dispatcher: "Dispatcher") -> None:
         """
@@ -51,67 +97,128 @@ class TelegramHandler:
         :param dispatcher: aiogram "Dispatcher" model
         :return: None
         """
+        dispatcher.message.middleware(HandlerMetricsMiddleware())
+        dispatcher.chat_member.middleware(HandlerMetricsMiddleware())
         dispatcher.message.register(self.command_help, Command(commands=["help"]))
         dispatcher.message.register(self.command_launch, Command(commands=["launch"]))
         dispatcher.message.register(self.command_suspend, Command(commands=["suspend"]))
         dispatcher.message.register(self.commant_status, Command(commands=["status"]))
         dispatcher.message.register(self.command_list, Command(commands=["list"]))
         dispatcher.message.register(self.command_clear, Command(commands=["clear"]))
+        dispatcher.message.register(self.command_search, Command(commands=["search"]))
+        dispatcher.message.register(self.command_stats, Command(commands=["stats"]))
+        dispatcher.message.register(self.command_health, Command(commands=["health"]))
+        dispatcher.message.register(self.command_backup, Command(commands=["backup"]))
+        dispatcher.message.register(self.command_tail, Command(commands=["tail"]))
+        dispatcher.message.register(self.command_logs, Command(commands=["logs"]))
         dispatcher.message.register(self.command_undifined)
+        dispatcher.chat_member.register(self.admin_cache.on_chat_member)
+
+    async def send_message_to_console(
+        self,
+        text: str,
+        message: "Message | None" = None,
+        server: "MinecraftServer | None" = None,
+    ) -> None:
+        """
+        Queueing a message to the console topic, the triggering message is saved right away.
 
-    async def send_message_to_console(self, text: str, message: "Message | None" = None) -> None:
-        messages = []
-        response = await self.bot.send_message(
-            chat_id=config.telegram.group_mc, message_thread_id=config.telegram.topic_mc_console, text=text
-        )
-        messages.append(response)
-        messages.append(message) if message is not None else None
-        self._save_messages(*messages)
+        :param text: message text
+        :param message: aiogram "Message" model the bot is answering
+        :param server: server the message is about, routes it to its console topic
+        :return: None
+        """
+        if message is not None and message.message_thread_id is not None:
+            topic = message.message_thread_id
+        elif server is not None:
+            topic = server.console_topic
+        else:
+            topic = config.telegram.topic_mc_console
+        self.outbox.send(chat_id=config.telegram.group_mc, message_thread_id=topic, text=self._label(server) + text)
+        if message is not None:
+            self._save_messages(message)
+
+    async def send_message_to_chat(self, text: str, server: "MinecraftServer | None" = None) -> None:
+        """
+        Queueing a message to the minecraft chat topic.
+
+        :param text: message text
+        :param server: server the message comes from, routes it to its chat topic
+        :return: None
+        """
+        topic = server.chat_topic if server is not None else config.telegram.topic_mc_minecraft_chat
+        self.outbox.send(chat_id=config.telegram.group_mc, message_thread_id=topic, text=self._label(server) + text)
+
+    def _label(self, server: "MinecraftServer | None") -> str:
+        if server is None or len(self.minecraft_registry) < 2:
+            return ""
+        return f"[{server.name}] "
+
+    async def _resolve_server(self, message: "Message", command: "CommandObject | None") -> "MinecraftServer | None":
+        """
+        Resolving the server a command is about: the name given as the first argument, otherwise the only
+        server of the console topic. Answers with a hint when it can't be resolved.
 
-    async def send_message_to_chat(self, text: str) -> None:
-        response = await self.bot.send_message(
-            chat_id=config.telegram.group_mc, message_thread_id=config.telegram.topic_mc_minecraft_chat, text=text
+        :param message: aiogram "Message" model
+        :param command: aiogram "CommandObject" model
+        :return: the server or None
+        """
+        name = command.args.split()[0] if command is not None and command.args else None
+        if name is not None:
+            server = self.minecraft_registry.get(name)
+            if server is None:
+                names = ", ".join(self.minecraft_registry.names)
+                await self.send_message_to_console(
+                    message=message, text=f"⚠️ Неизвестный сервер: {name}\nℹ️ Доступные серверы: {names}"
+                )
+            return server
+
+        servers = self.minecraft_registry.for_console_topic(message.message_thread_id)
+        if len(servers) == 1:
+            return servers[0]
+        await self.send_message_to_console(
+            message=message,
+            text=f"ℹ️ Укажите сервер после команды, доступные серверы: {', '.join(server.name for server in servers)}",
         )
-        self._save_messages(response)
+        return None
 
-    @staticmethod
-    def _save_messages(*messages: "Message", session: "Session" = next(get_session())) -> None:
+    def _save_messages(self, *messages: "Message", archive: bool = True) -> None:
         """
-        Saving messages to database.
+        Queueing messages for saving to database, written in batches by the message writer.
 
         :param messages: aiogram "Message" model tuple
-        :param session: sync database session
+        :param archive: keeping the text searchable, otherwise only the id is saved for cleaning
         :return: None
         """
-        for message in messages:
-            message_already_exists = session.query(MessageModel).filter_by(id=message.message_id).first()
-            if not message_already_exists:
-                user_id = message.from_user.id if message.from_user else None
-                item: MessageModel = MessageModel(
+        self.message_writer.put(
+            *(
+                MessageRow(
                     id=message.message_id,
                     chat_id=message.chat.id,
-                    user_id=user_id,
-                    text=message.text,
+                    user_id=message.from_user.id if message.from_user else None,
+                    text=message.text if archive else None,
                     timestamp=message.date,
                 )
-                session.add(item)
-                session.commit()
+                for message in messages
+            )
+        )
 
-    async def delete_messages(self, session: "Session" = next(get_session())) -> None:
+    async def stop_console_tails(self) -> None:
         """
-        Deleting messages from console-chat, logic deleting from the database.
+        Showing the lines still buffered by the console views and stopping them.
 
-        :param session: sync database session
         :return: None
         """
-        messages = session.query(MessageModel).filter(MessageModel.deleted.is_(False)).all()
-        for message in messages:
-            try:
-                await self.bot.delete_message(chat_id=cast(int, message.chat_id), message_id=cast(int, message.id))
-            except Exception as e:
-                print("Message delete:", e)
-        session.query(MessageModel).filter(~MessageModel.deleted).update({MessageModel.deleted: True})
-        session.commit()
+        await asyncio.gather(*(console_tail.disable() for console_tail in self.console_tails.values()))
+
+    async def delete_messages(self) -> None:
+        """
+        Deleting messages from console-chat in bulk, logic deleting from the database.
+
+        :return: None
+        """
+        await self.message_writer.flush()
+        await self.message_cleaner.run()
 
     @validate_console()
     async def command_help(self, message: "Message") -> None:
@@ -123,71 +230,370 @@ class TelegramHandler:
         """
         text = (
             "ℹ️ Доступные команды:\n"
-            "/launch — запускает сервер;\n"
-            "/status — проверяет, запущен ли сервер;\n"
+            "/launch — запускает или будит сервер;\n"
+            "/status — проверяет, запущен ли сервер или спит;\n"
             "/list — выводит количество людей, играющих на сервере в данный момент;\n"
             "/suspend — выключает сервер (требуются права администратора);\n"
             "/clear — удаляет все сообщения в чате;\n"
+            "/backup — создаёт резервную копию мира (требуются права администратора);\n"
+            "/tail — включает или выключает трансляцию консоли сервера (требуются права администратора);\n"
+            "/logs &lt;с&gt; &lt;по&gt; [шаблон] — ищет в архиве логов сервера, "
+            "время как 12:30, 2h, 2024-05-01T12:00 или now (требуются права администратора);\n"
+            "/stats [дни] — выводит время игры и пик онлайна за последние дни (по умолчанию 7);\n"
+            "/health — выводит TPS, MSPT, нагрузку и память сервера за последний час;\n"
+            "/search [страница] &lt;запрос&gt; — ищет по архиву сообщений, word* ищет по началу слова;\n"
             "/help — выводит список доступных команд;"
         )
+        if len(self.minecraft_registry) > 1:
+            text += (
+                "\n\nℹ️ После команды можно указать сервер, например: /launch "
+                f"{self.minecraft_registry.names[0]}\n"
+                f"Доступные серверы: {', '.join(self.minecraft_registry.names)}"
+            )
         await self.send_message_to_console(message=message, text=text)
 
     @validate_console()
-    async def command_launch(self, message: "Message") -> None:
+    async def command_launch(self, message: "Message", command: "CommandObject | None" = None) -> None:
         """
         Launch command handler.
 
         :param message: aiogram "Message" model
+        :param command: aiogram "CommandObject" model, optional server name as the argument
         :return: None
         """
-        await self.send_message_to_console(message=message, text="⏳ Начинается запуск сервера, ожидайте...")
-        self.minecraft_server.launch()
-        await asyncio.sleep(6)
-        await self.send_message_to_console(message=message, text="✅ Сервер запущен, приятной игры!")
+        minecraft_server = await self._resolve_server(message=message, command=command)
+        if minecraft_server is None:
+            return
+        if minecraft_server.status():
+            await self.send_message_to_console(message=message, server=minecraft_server, text="Сервер уже работает ✅")
+            return
+        if minecraft_server.hibernated:
+            started = time.perf_counter()
+            await minecraft_server.resume()
+            await self.send_message_to_console(
+                message=message,
+                server=minecraft_server,
+                text=f"✅ Сервер проснулся за {time.perf_counter() - started:.2f} с, приятной игры!",
+            )
+            return
+        await self.send_message_to_console(
+            message=message, server=minecraft_server, text="⏳ Начинается запуск сервера, ожидайте..."
+        )
+        ready = await minecraft_server.launch_and_wait()
+        if ready is not None:
+            await self.send_message_to_console(
+                message=message,
+                server=minecraft_server,
+                text=f"✅ Сервер запущен за {ready.seconds:.1f} с, приятной игры!",
+            )
+        else:
+            await self.send_message_to_console(
+                message=message, server=minecraft_server, text="⚠️ Сервер не сообщил о завершении запуска."
+            )
 
     @validate_console()
     @validate_admin()
-    async def command_suspend(self, message: "Message") -> None:
+    async def command_suspend(self, message: "Message", command: "CommandObject | None" = None) -> None:
         """
         Suspend command handler - Admin rights are mandated
 
         :param message: aiogram "Message" model
+        :param command: aiogram "CommandObject" model, optional server name as the argument
         :return: None
         """
-        await self.send_message_to_console(message=message, text="⏳ Завершается работа сервера...")
-        await self.minecraft_server.command_suspend()
-        await self.send_message_to_console(message=message, text="✅ Сервер выключен.")
+        minecraft_server = await self._resolve_server(message=message, command=command)
+        if minecraft_server is None:
+            return
+        await self.send_message_to_console(
+            message=message, server=minecraft_server, text="⏳ Завершается работа сервера..."
+        )
+        await minecraft_server.command_suspend()
+        await self.send_message_to_console(message=message, server=minecraft_server, text="✅ Сервер выключен.")
 
     @validate_console()
-    async def commant_status(self, message: "Message") -> None:
+    async def commant_status(self, message: "Message", command: "CommandObject | None" = None) -> None:
         """
-        Status command handler.
+        Status command handler. Without a server name reports every server of the topic.
 
         :param message: aiogram "Message" model
+        :param command: aiogram "CommandObject" model, optional server name as the argument
         :return: None
         """
-        if self.minecraft_server.status():
-            await self.send_message_to_console(message=message, text="Сервер работает ✅")
+        if command is not None and command.args:
+            minecraft_server = await self._resolve_server(message=message, command=command)
+            servers = [minecraft_server] if minecraft_server is not None else []
         else:
-            await self.send_message_to_console(message=message, text="Сервер не работает ❌")
+            servers = self.minecraft_registry.for_console_topic(message.message_thread_id)
+        for minecraft_server in servers:
+            state = minecraft_server.state()
+            if state == "running":
+                text = "Сервер работает ✅"
+            elif state == "hibernated":
+                minutes = minecraft_server.hibernation.seconds() / 60
+                text = f"Сервер спит 💤 ({minutes:.0f} мин), /launch или подключение игрока разбудит его"
+            else:
+                text = "Сервер не работает ❌"
+            await self.send_message_to_console(message=message, server=minecraft_server, text=text)
 
     @validate_console()
-    async def command_list(self, message: "Message") -> None:
+    async def command_list(self, message: "Message", command: "CommandObject | None" = None) -> None:
         """
         List command handler. Lists number of people online.
 
         :param message: aiogram "Message" model
+        :param command: aiogram "CommandObject" model, optional server name as the argument
         :return: None
         """
-        if self.minecraft_server.status():
-            number, names = await self.minecraft_server.list()
-            if number == "0" or number is None:
-                await self.send_message_to_console(message=message, text="👻 В данный момент сервер пуст.")
+        minecraft_server = await self._resolve_server(message=message, command=command)
+        if minecraft_server is None:
+            return
+        if minecraft_server.status():
+            number, names = await minecraft_server.list()
+            if not number:
+                await self.send_message_to_console(
+                    message=message, server=minecraft_server, text="👻 В данный момент сервер пуст."
+                )
             else:
-                await self.send_message_to_console(message=message, text=f"✅ Игроков на сервере: {number}.")
-                await self.send_message_to_console(message=message, text=f"{names}")
+                await self.send_message_to_console(
+                    message=message, server=minecraft_server, text=f"✅ Игроков на сервере: {number}."
+                )
+                await self.send_message_to_console(message=message, server=minecraft_server, text=f"{names}")
+        else:
+            await self.send_message_to_console(
+                message=message, server=minecraft_server, text="⚠️ В данный момент сервер не работает."
+            )
+
+    @validate_console()
+    async def command_stats(self, message: "Message", command: "CommandObject | None" = None) -> None:
+        """
+        Stats command handler. Playtime leaders and peak concurrency from the daily rollups.
+
+        :param message: aiogram "Message" model
+        :param command: aiogram "CommandObject" model, "[server] [days]" as the arguments
+        :return: None
+        """
+        arguments = command.args.split() if command is not None and command.args else []
+        days = int(arguments.pop()) if arguments and arguments[-1].isdigit() else 7
+        if arguments and command is not None:
+            command = dataclasses.replace(command, args=arguments[0])
+        else:
+            command = None
+        minecraft_server = await self._resolve_server(message=message, command=command)
+        if minecraft_server is None:
+            return
+        stats = await minecraft_server.players.stats(days=days)
+        lines = [f"📊 Статистика с {stats.since:%d.%m.%Y}:"]
+        if stats.peak_day is not None:
+            lines.append(f"Пик онлайна: {stats.peak_online} ({stats.peak_day:%d.%m.%Y})")
+        if minecraft_server.status() and minecraft_server.players.synced:
+            lines.append(f"Сейчас онлайн: {len(minecraft_server.players)}")
+        if stats.playtime:
+            lines.append("")
+            lines.extend(
+                f"{number}. {html.escape(entry.player)} — {entry.seconds / 3600:.1f} ч, сессий: {entry.sessions}"
+                for number, entry in enumerate(stats.playtime, start=1)
+            )
+        else:
+            lines.append("Никто не играл за этот период.")
+        await self.send_message_to_console(message=message, server=minecraft_server, text="\n".join(lines))
+
+    @validate_console()
+    async def command_health(self, message: "Message", command: "CommandObject | None" = None) -> None:
+        """
+        Health command handler. Latest readings and extremes of the last hour from the health history.
+
+        :param message: aiogram "Message" model
+        :param command: aiogram "CommandObject" model, optional server name as the argument
+        :return: None
+        """
+        minecraft_server = await self._resolve_server(message=message, command=command)
+        if minecraft_server is None:
+            return
+        await self.send_message_to_console(
+            message=message, server=minecraft_server, text=self._format_health(minecraft_server)
+        )
+
+    @staticmethod
+    def _format_health(minecraft_server: "MinecraftServer") -> str:
+        health = minecraft_server.health
+        samples = health.window(3600)
+        lines = [] if minecraft_server.status() else ["⚠️ В данный момент сервер не работает."]
+        if not samples:
+            lines.append(f"🩺 Замеров пока нет, они снимаются раз в {health.interval:g} с.")
+            return "\n".join(lines)
+        minutes = max(round((time.monotonic() - samples[0].at) / 60), 1)
+        lines.append(f"🩺 Состояние сервера за {minutes} мин, замеров: {len(samples)}")
+        tps = [sample.tps for sample in samples if sample.tps is not None]
+        if tps:
+            lines.append(f"TPS: {tps[-1]:.1f} (мин. {min(tps):.1f})")
+        mspt = [sample.mspt for sample in samples if sample.mspt is not None]
+        if mspt:
+            lines.append(f"MSPT: {mspt[-1]:.1f} мс (макс. {max(mspt):.1f} мс)")
+        lags = [sample.lag_ms for sample in samples if sample.lag_ms]
+        if lags:
+            lines.append(f"Отставания: в {len(lags)} замерах, всего {sum(lags) / 1000:.1f} с")
         else:
-            await self.send_message_to_console(message=message, text="⚠️ В данный момент сервер не работает.")
+            lines.append("Отставаний нет")
+        cpu = [sample.cpu_percent for sample in samples if sample.cpu_percent is not None]
+        if cpu:
+            lines.append(f"CPU: {cpu[-1]:.0f}% (макс. {max(cpu):.0f}%)")
+        memory = [sample.memory_bytes for sample in samples if sample.memory_bytes is not None]
+        if memory:
+            lines.append(f"Память: {memory[-1] / 2**30:.2f} ГБ (макс. {max(memory) / 2**30:.2f} ГБ)")
+        if health.alerts:
+            lines.append(f"⚠️ Проблемы: {', '.join(health.alert_labels)}")
+        return "\n".join(lines)
+
+    @validate_console()
+    @validate_admin()
+    async def command_backup(self, message: "Message", command: "CommandObject | None" = None) -> None:
+        """
+        Backup command handler. Takes an incremental world snapshot - Admin rights are mandated
+
+        :param message: aiogram "Message" model
+        :param command: aiogram "CommandObject" model, optional server name as the argument
+        :return: None
+        """
+        minecraft_server = await self._resolve_server(message=message, command=command)
+        if minecraft_server is None:
+            return
+        if minecraft_server.backups.running:
+            await self.send_message_to_console(
+                message=message, server=minecraft_server, text="⏳ Резервная копия уже создаётся."
+            )
+            return
+        await self.send_message_to_console(
+            message=message, server=minecraft_server, text="💾 Создаётся резервная копия мира..."
+        )
+        try:
+            result = await minecraft_server.backups.run()
+        except Exception as e:
+            await self.send_message_to_console(
+                message=message, server=minecraft_server, text=f"❌ Не удалось создать резервную копию: {e!r}"
+            )
+            return
+        lines = [
+            f"✅ Резервная копия {result.name} создана за {result.seconds:.1f} с.",
+            f"Файлов: {result.files}, {result.total_bytes / 2**20:.1f} МБ",
+            f"Новых: {result.copied}, {result.copied_bytes / 2**20:.1f} МБ",
+        ]
+        if result.removed:
+            lines.append(f"Удалено старых копий: {result.removed}")
+        await self.send_message_to_console(message=message, server=minecraft_server, text="\n".join(lines))
+
+    @validate_console()
+    @validate_admin()
+    async def command_tail(self, message: "Message", command: "CommandObject | None" = None) -> None:
+        """
+        Tail command handler. Toggles the live console view of the server - Admin rights are mandated
+
+        :param message: aiogram "Message" model
+        :param command: aiogram "CommandObject" model, optional server name as the argument
+        :return: None
+        """
+        minecraft_server = await self._resolve_server(message=message, command=command)
+        if minecraft_server is None:
+            return
+        console_tail = self.console_tails[minecraft_server.name]
+        if console_tail.enabled:
+            await console_tail.disable()
+            text = "📜 Трансляция консоли выключена."
+        else:
+            console_tail.enable()
+            text = "📜 Трансляция консоли включена."
+        await self.send_message_to_console(message=message, server=minecraft_server, text=text)
+
+    @validate_console()
+    @validate_admin()
+    async def command_logs(self, message: "Message", command: "CommandObject | None" = None) -> None:
+        """
+        Logs command handler. Server output of a time range from the log archive, optionally filtered by a
+        regular expression - Admin rights are mandated
+
+        :param message: aiogram "Message" model
+        :param command: aiogram "CommandObject" model, "[server] <from> <to> [pattern]" as the arguments
+        :return: None
+        """
+        arguments = command.args.strip() if command is not None and command.args else ""
+        first, _, rest = arguments.partition(" ")
+        if command is not None and self.minecraft_registry.get(first) is not None:
+            command, arguments = dataclasses.replace(command, args=first), rest.strip()
+        else:
+            command = None
+        minecraft_server = await self._resolve_server(message=message, command=command)
+        if minecraft_server is None:
+            return
+        parts = arguments.split(maxsplit=2)
+        now = datetime.now().astimezone()
+        since = self._parse_moment(parts[0], now) if len(parts) > 0 else None
+        until = self._parse_moment(parts[1], now) if len(parts) > 1 else None
+        if since is None or until is None:
+            await self.send_message_to_console(
+                message=message,
+                server=minecraft_server,
+                text="ℹ️ Использование: /logs &lt;с&gt; &lt;по&gt; [шаблон], например: /logs 2h now Exception",
+            )
+            return
+        pattern = parts[2] if len(parts) > 2 else None
+        limit = config.minecraft.log_archive_query_limit
+        try:
+            found = await asyncio.to_thread(minecraft_server.log_archive.query, since, until, pattern, limit)
+        except re.error as e:
+            await self.send_message_to_console(
+                message=message, server=minecraft_server, text=f"⚠️ Неверный шаблон: {html.escape(str(e))}"
+            )
+            return
+        if not found:
+            await self.send_message_to_console(message=message, server=minecraft_server, text="📜 Ничего не найдено.")
+            return
+        text = "\n".join(f"{entry.at:%d.%m %H:%M:%S} {entry.line}" for entry in found)
+        summary = f"📜 Строк: {len(found)}{', показаны первые' if len(found) >= limit else ''}"
+        if len(text) <= _LOGS_INLINE:
+            await self.send_message_to_console(
+                message=message, server=minecraft_server, text=f"{summary}\n<pre>{html.escape(text)}</pre>"
+            )
+            return
+        await self.outbox.bucket(config.telegram.group_mc).acquire()
+        try:
+            response = await self.bot.send_document(
+                chat_id=config.telegram.group_mc,
+                message_thread_id=message.message_thread_id,
+                document=BufferedInputFile(
+                    text.encode(), filename=f"{minecraft_server.name}-{since:%Y%m%d-%H%M}-{until:%Y%m%d-%H%M}.log"
+                ),
+                caption=self._label(minecraft_server) + summary,
+            )
+        except TelegramAPIError as e:
+            await self.send_message_to_console(
+                message=message, server=minecraft_server, text=f"❌ Не удалось отправить логи: {e!r}"
+            )
+            return
+        self._save_messages(message)
+        self._save_messages(response, archive=False)
+
+    @staticmethod
+    def _parse_moment(value: str, now: "datetime") -> "datetime | None":
+        """
+        A moment of /logs: now, a relative one like 30m, 2h or 1d ago, a time of today or an ISO date and time.
+
+        :param value: argument
+        :param now: aware current time
+        :return: aware moment or None when it can't be parsed
+        """
+        if value.lower() == "now":
+            return now
+        ago = _AGO.fullmatch(value.lower())
+        if ago is not None:
+            return now - timedelta(**{_AGO_UNITS[ago["unit"]]: int(ago["amount"])})
+        try:
+            return datetime.combine(now.date(), day_time.fromisoformat(value)).astimezone()
+        except ValueError:
+            pass
+        try:
+            moment = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+        return moment if moment.tzinfo is not None else moment.astimezone()
 
     @validate_console()
     async def command_clear(self, message: "Message") -> None:
@@ -200,6 +606,48 @@ class TelegramHandler:
         await self.delete_messages()
         await message.delete()
 
+    @validate_console()
+    async def command_search(self, message: "Message", command: "CommandObject | None" = None) -> None:
+        """
+        Search command handler. Full-text search over the message archive, a leading number selects the page.
+
+        :param message: aiogram "Message" model
+        :param command: aiogram "CommandObject" model, "[page] query" as the arguments
+        :return: None
+        """
+        query = command.args.strip() if command is not None and command.args else ""
+        page = 1
+        first, _, rest = query.partition(" ")
+        if first.isdigit() and rest.strip():
+            page, query = int(first), rest.strip()
+        if not query:
+            text = "ℹ️ Укажите запрос, например: /search алмазы"
+        else:
+            found = await asyncio.to_thread(
+                search_messages,
+                query=query,
+                chat_id=message.chat.id,
+                page=page,
+                page_size=config.database.search_page_size,
+            )
+            text = self._format_search(query=query, found=found)
+        # Neither the query nor the results are archived as text, or every search would show up in the next one
+        response = await message.answer(text)
+        self._save_messages(message, response, archive=False)
+
+    @staticmethod
+    def _format_search(query: str, found: "SearchPage") -> str:
+        if not found.results:
+            return "🔎 Ничего не найдено." if found.page == 1 else "🔎 Больше результатов нет."
+        lines = [f"🔎 Результаты, страница {found.page}:"]
+        for result in found.results:
+            snippet = html.escape(result.snippet).replace(HIGHLIGHT_START, "<b>").replace(HIGHLIGHT_END, "</b>")
+            date = f"{result.timestamp:%d.%m.%Y %H:%M} " if result.timestamp is not None else ""
+            lines.append(f"<i>{date}</i>{snippet}")
+        if found.has_more:
+            lines.append(f"Дальше: /search {found.page + 1} {html.escape(query)}")
+        return "\n\n".join(lines)
+
     async def command_undifined(self, message: "Message") -> None:
         """
         Undefined command handler. Redirecting to another function.
@@ -207,9 +655,9 @@ class TelegramHandler:
         :param message: aiogram "Message" model
         :return: None
         """
-        if message.message_thread_id == config.telegram.topic_mc_console:
+        if message.message_thread_id in self.minecraft_registry.console_topics:
             return await self.command_invalid(message=message)
-        elif message.message_thread_id == config.telegram.topic_mc_minecraft_chat:
+        elif message.message_thread_id in self.minecraft_registry.chat_topics:
             return await self.minecraft_chat_listener(message=message)
 
     @validate_minecraft_chat()
@@ -220,14 +668,20 @@ class TelegramHandler:
         :param message: aiogram "Message" model
         :return: None
         """
-        if message.from_user is not None:
-            user = message.from_user.full_name
-            text = message.text
-            if text is not None:
-                if self.minecraft_server.status():
-                    await self.minecraft_server.send_message_to_minecraft(user=user, text=text)
-                else:
-                    await message.answer("⚠️ В данный момент сервер не работает.")
+        # Relayed chat carries a server label only with several servers, see _label
+        labelled = self.minecraft_registry.names if len(self.minecraft_registry) >= 2 else []
+        fields = relay_fields(message, servers=labelled)
+        if fields is None:
+            return
+        servers = [
+            minecraft_server
+            for minecraft_server in self.minecraft_registry.for_chat_topic(message.message_thread_id)
+            if minecraft_server.status()
+        ]
+        for minecraft_server in servers:
+            minecraft_server.send_message_to_minecraft(**fields)
+        if not servers:
+            await message.answer("⚠️ В данный момент сервер не работает.")
 
     @validate_console()
     async def command_invalid(self, message: "Message") -> None:
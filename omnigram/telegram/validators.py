@@ -1,16 +1,14 @@
 # mypy: ignore-errors
 from functools import wraps
 
-from aiogram.types import ChatMemberAdministrator, ChatMemberOwner, Message
-
-from omnigram.config import config
+from aiogram.types import Message
 
 
 def validate_console():
     def decorator(func):
         @wraps(func)
         async def wrapper(self, message: "Message", *args, **kwargs):
-            if message.message_thread_id == config.telegram.topic_mc_console:
+            if message.message_thread_id in self.minecraft_registry.console_topics:
                 return await func(self, message, *args, **kwargs)
 
         return wrapper
@@ -22,7 +20,7 @@ def validate_minecraft_chat():
     def decorator(func):
         @wraps(func)
         async def wrapper(self, message: "Message", *args, **kwargs):
-            if message.message_thread_id == config.telegram.topic_mc_minecraft_chat:
+            if message.message_thread_id in self.minecraft_registry.chat_topics:
                 return await func(self, message, *args, **kwargs)
 
         return wrapper
@@ -34,12 +32,10 @@ def validate_admin():
     def decorator(func):
         @wraps(func)
         async def wrapper(self, message: "Message", *args, **kwargs):
-            if message.from_user:
-                user = await self.bot.get_chat_member(message.chat.id, message.from_user.id)
-                if isinstance(user, (ChatMemberAdministrator, ChatMemberOwner)):
-                    return await func(self, message, *args, **kwargs)
+            if message.from_user and await self.admin_cache.is_admin(message.chat.id, message.from_user.id):
+                return await func(self, message, *args, **kwargs)
             response = await message.answer("⚠️ У Вас нет прав на использование этой команды")
-            self.save_messages(response)
+            self._save_messages(response)
 
         return wrapper
 
@@ -0,0 +1,3 @@
+from .timer_service import Timer, TimerService
+
+__all__ = ["Timer", "TimerService"]
@@ -0,0 +1,199 @@
+import asyncio
+from datetime import UTC, datetime, time, timedelta
+from typing import TYPE_CHECKING
+
+from omnigram.database import load_timer_dues, save_timer_due
+from omnigram.metrics import metrics
+
+if TYPE_CHECKING:
+    from asyncio import AbstractEventLoop, Task, TimerHandle
+    from collections.abc import Awaitable, Callable
+
+# Far deadlines are armed in steps and checked against the wall clock, which the loop clock does not follow
+_MAX_DELAY = 3600.0
+_EARLY = 0.5
+
+
+class Timer:
+    """
+    Handle of a scheduled callback
+    """
+
+    _handle: "TimerHandle | None" = None
+    # Loop time the timer was armed for, the lateness is measured against it
+    deadline: float = 0.0
+
+    def __init__(
+        self,
+        service: "TimerService",
+        name: str,
+        callback: "Callable[[], Awaitable[None]]",
+        due: datetime,
+        repeat: "Callable[[datetime], datetime] | None" = None,
+        persist: bool = False,
+    ) -> None:
+        self.service = service
+        self.name = name
+        self.callback = callback
+        self.due = due
+        self.repeat = repeat
+        self.persist = persist
+
+    @property
+    def pending(self) -> bool:
+        return self in self.service._timers
+
+    def cancel(self) -> None:
+        """
+        Dropping the timer, a run already in progress is not interrupted.
+
+        :return: None
+        """
+        self.service._timers.discard(self)
+        self._disarm()
+
+    def _disarm(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+
+class TimerService:
+    """
+    The one timer service of the bot: one-shot deadlines, daily jobs whose next run survives restarts and
+    cancelable handles on the event loop, with metrics of pending timers and how late they fired.
+    Timers may be scheduled before start, they are armed once the service starts.
+    """
+
+    _loop: "AbstractEventLoop | None" = None
+
+    def __init__(self) -> None:
+        self._timers: "set[Timer]" = set()
+        self._running: "set[Task]" = set()
+        self._lateness = metrics.timer_lateness
+        metrics.timers_pending.set_function(lambda: len(self._timers))
+
+    async def start(self) -> None:
+        """
+        Arming the scheduled timers, persisted jobs missed while the bot was down run right away.
+
+        :return: None
+        """
+        self._loop = asyncio.get_running_loop()
+        if any(timer.persist for timer in self._timers):
+            dues = await asyncio.to_thread(load_timer_dues)
+            for timer in self._timers:
+                if timer.persist and timer.name in dues:
+                    timer.due = min(timer.due, dues[timer.name])
+        for timer in self._timers:
+            self._arm(timer)
+
+    async def stop(self) -> None:
+        """
+        Disarming the timers and cancelling the callbacks in progress.
+
+        :return: None
+        """
+        for timer in self._timers:
+            timer._disarm()
+        for task in self._running:
+            task.cancel()
+        await asyncio.gather(*self._running, return_exceptions=True)
+        self._loop = None
+
+    def call_later(self, delay: float, callback: "Callable[[], Awaitable[None]]", name: str) -> "Timer":
+        """
+        Running a callback once after a delay.
+
+        :param delay: seconds
+        :param callback: coroutine function
+        :param name: timer name for the metrics
+        :return: cancelable handle
+        """
+        return self.call_at(datetime.now(UTC) + timedelta(seconds=delay), callback, name=name)
+
+    def call_at(self, due: datetime, callback: "Callable[[], Awaitable[None]]", name: str) -> "Timer":
+        """
+        Running a callback once at a wall-clock time.
+
+        :param due: aware due time
+        :param callback: coroutine function
+        :param name: timer name for the metrics
+        :return: cancelable handle
+        """
+        return self._add(Timer(service=self, name=name, callback=callback, due=due))
+
+    def daily(self, at: time, callback: "Callable[[], Awaitable[None]]", name: str, persist: bool = True) -> "Timer":
+        """
+        Running a callback every day at a local time.
+
+        :param at: local time of the day
+        :param callback: coroutine function
+        :param name: job name, the key of the persisted next run
+        :param persist: keeping the next run in the database, so a run missed while the bot was down is made up
+        :return: cancelable handle
+        """
+
+        def next_due(after: datetime) -> datetime:
+            return _next_daily(after, at)
+
+        timer = Timer(
+            service=self,
+            name=name,
+            callback=callback,
+            due=next_due(datetime.now(UTC)),
+            repeat=next_due,
+            persist=persist,
+        )
+        return self._add(timer)
+
+    def _add(self, timer: "Timer") -> "Timer":
+        self._timers.add(timer)
+        if self._loop is not None:
+            self._arm(timer)
+        return timer
+
+    def _arm(self, timer: "Timer") -> None:
+        if self._loop is None:
+            return
+        timer._disarm()
+        delay = min(max((timer.due - datetime.now(UTC)).total_seconds(), 0.0), _MAX_DELAY)
+        timer.deadline = self._loop.time() + delay
+        timer._handle = self._loop.call_at(timer.deadline, self._fire, timer)
+
+    def _fire(self, timer: "Timer") -> None:
+        timer._handle = None
+        if self._loop is None or timer not in self._timers:
+            return
+        now = datetime.now(UTC)
+        if (timer.due - now).total_seconds() > _EARLY:
+            self._arm(timer)
+            return
+        self._lateness.labels(timer.name).observe(max(self._loop.time() - timer.deadline, 0.0))
+        self._timers.discard(timer)
+        task = self._loop.create_task(self._run(timer))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+        if timer.repeat is not None:
+            timer.due = timer.repeat(max(timer.due, now))
+            self._add(timer)
+
+    async def _run(self, timer: "Timer") -> None:
+        try:
+            await timer.callback()
+        except Exception as e:
+            print(f"Timer {timer.name}:", e)
+        if timer.persist:
+            # Stored after the run, so a run cut short by a restart is made up
+            try:
+                await asyncio.to_thread(save_timer_due, timer.name, timer.due)
+            except Exception as e:
+                print(f"Timer {timer.name}:", e)
+
+
+def _next_daily(after: datetime, at: time) -> datetime:
+    local = after.astimezone()
+    due = datetime.combine(local.date(), at, tzinfo=local.tzinfo)
+    if due <= local:
+        due += timedelta(days=1)
+    return due.astimezone(UTC)
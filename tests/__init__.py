@@ -0,0 +1,10 @@
+import os
+
+# The settings the bot cannot start without, the tests touch no Telegram chat nor database
+for name, value in {
+    "TG_GROUP_MC": "0",
+    "TG_TOPIC_MC_CONSOLE": "0",
+    "TG_TOPIC_MC_MINECRAFT_CHAT": "0",
+    "ADM_SUDO": "0",
+}.items():
+    os.environ.setdefault(name, value)
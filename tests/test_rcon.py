@@ -0,0 +1,143 @@
+import asyncio
+import struct
+import unittest
+
+from omnigram.minecraft.transport.rcon import TYPE_COMMAND, TYPE_LOGIN, TYPE_RESPONSE, RconClient, RconError
+
+_HEADER = struct.Struct("<iii")
+# Minecraft splits replies into packets of this many bytes
+_FRAGMENT = 4096
+
+
+class FakeRconServer:
+    """
+    Local RCON server answering like Minecraft: replies are split into 4096-byte packets sharing the request id,
+    a packet of an unknown type gets "Unknown request" back. Commands in "silent" are never answered.
+    """
+
+    def __init__(self, password: str = "secret") -> None:
+        self.password = password
+        self.replies: "dict[str, str]" = {}
+        self.commands: "list[str]" = []
+        self.silent: "set[str]" = set()
+        self._server: "asyncio.Server | None" = None
+        self._writers: "list[asyncio.StreamWriter]" = []
+        self._handlers: "set[asyncio.Task]" = set()
+
+    @property
+    def port(self) -> int:
+        assert self._server is not None
+        return self._server.sockets[0].getsockname()[1]
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+
+    async def stop(self) -> None:
+        self.drop_connections()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def drop_connections(self) -> None:
+        for writer in self._writers:
+            writer.close()
+        self._writers.clear()
+
+    async def _serve(self, reader: "asyncio.StreamReader", writer: "asyncio.StreamWriter") -> None:
+        self._writers.append(writer)
+        task = asyncio.current_task()
+        assert task is not None
+        self._handlers.add(task)
+        task.add_done_callback(self._handlers.discard)
+        try:
+            while True:
+                length, request_id, packet_type = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+                body = (await reader.readexactly(length - _HEADER.size + 4))[:-2].decode()
+                if packet_type == TYPE_LOGIN:
+                    self._send(writer, request_id if body == self.password else -1, TYPE_COMMAND, b"")
+                elif packet_type == TYPE_COMMAND:
+                    self.commands.append(body)
+                    if body in self.silent:
+                        # Hanging on the command, also leaves the following sentinel unanswered
+                        await reader.read()
+                        break
+                    reply = self.replies.get(body, "").encode()
+                    for start in range(0, max(len(reply), 1), _FRAGMENT):
+                        self._send(writer, request_id, TYPE_RESPONSE, reply[start : start + _FRAGMENT])
+                else:
+                    self._send(writer, request_id, TYPE_RESPONSE, f"Unknown request {packet_type:x}".encode())
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _send(writer: "asyncio.StreamWriter", request_id: int, packet_type: int, payload: bytes) -> None:
+        data = payload + b"\x00\x00"
+        writer.write(_HEADER.pack(_HEADER.size - 4 + len(data), request_id, packet_type) + data)
+
+
+class RconClientTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.server = FakeRconServer()
+        await self.server.start()
+        self.client = RconClient(host="127.0.0.1", port=self.server.port, password="secret")
+
+    async def asyncTearDown(self) -> None:
+        await self.client.close()
+        await self.server.stop()
+
+    async def test_short_reply(self) -> None:
+        self.server.replies["list"] = "There are 0 of a max of 20 players online: "
+        self.assertEqual(await self.client.execute("list", timeout=1), "There are 0 of a max of 20 players online: ")
+        self.assertTrue(self.client.connected)
+
+    async def test_empty_reply(self) -> None:
+        self.assertEqual(await self.client.execute("save-all", timeout=1), "")
+
+    async def test_reply_of_exactly_one_fragment(self) -> None:
+        self.server.replies["big"] = "x" * _FRAGMENT
+        self.assertEqual(await self.client.execute("big", timeout=1), "x" * _FRAGMENT)
+
+    async def test_reply_of_several_fragments(self) -> None:
+        for size in (_FRAGMENT * 2, _FRAGMENT * 3 + 17):
+            self.server.replies["big"] = "".join(chr(ord("a") + i % 26) for i in range(size))
+            self.assertEqual(await self.client.execute("big", timeout=1), self.server.replies["big"])
+
+    async def test_pipelined_commands(self) -> None:
+        for number in range(20):
+            self.server.replies[f"echo {number}"] = str(number) * (number * 500)
+        replies = await asyncio.gather(*(self.client.execute(f"echo {number}", timeout=1) for number in range(20)))
+        self.assertEqual(replies, [str(number) * (number * 500) for number in range(20)])
+
+    async def test_wrong_password(self) -> None:
+        client = RconClient(host="127.0.0.1", port=self.server.port, password="wrong")
+        with self.assertRaises(RconError):
+            await client.execute("list", timeout=1)
+        self.assertFalse(client.connected)
+        self.assertEqual(self.server.commands, [])
+
+    async def test_connection_lost(self) -> None:
+        self.server.silent.add("stop")
+        command = asyncio.create_task(self.client.execute("stop", timeout=5))
+        while "stop" not in self.server.commands:
+            await asyncio.sleep(0.01)
+        self.server.drop_connections()
+        with self.assertRaises(RconError):
+            await command
+
+    async def test_reconnect(self) -> None:
+        await self.client.execute("list", timeout=1)
+        self.server.drop_connections()
+        for _ in range(100):
+            if not self.client.connected:
+                break
+            await asyncio.sleep(0.01)
+        self.server.replies["list"] = "back"
+        self.assertEqual(await self.client.execute("list", timeout=1), "back")
+
+
+if __name__ == "__main__":
+    unittest.main()